@@ -32,6 +32,8 @@ class BrushTask(object):
     _scheduler = None
     _brush_tasks = {}
     _torrents_cache = []
+    # 各任务上次完整处理的RSS中最新的种子链接，解析RSS时遇到即停止
+    _rss_watermarks = {}
     _qb_client = "qbittorrent"
     _tr_client = "transmission"
 
@@ -52,6 +54,8 @@ class BrushTask(object):
         self.load_brushtasks()
         # 清理缓存
         self._torrents_cache = []
+        self._rss_watermarks = {}
+        self.rsshelper.reset_rss_validator(validator_key="brush:")
         # 启动RSS任务
         if self._brush_tasks:
             self._scheduler = BackgroundScheduler(timezone=Config().get_timezone())
@@ -201,13 +205,22 @@ class BrushTask(object):
                                            dlcount=rss_rule.get("dlcount")):
             return
 
-        rss_result = self.rsshelper.parse_rssxml(url=rss_url, proxy=site_proxy)
+        # 上次已完整处理过的种子及更早的种子不再解析
+        watermark = self._rss_watermarks.get(taskid)
+        rss_result = self.rsshelper.parse_rssxml(
+            url=rss_url,
+            proxy=site_proxy,
+            stop_func=lambda item: watermark and item.get("enclosure") == watermark,
+            validator_key=f"brush:{taskid}")
         if rss_result is None:
             # RSS链接过期
             log.error(f"【Brush】{task_name} RSS链接已过期，请重新获取！")
             return
         if len(rss_result) == 0:
-            log.warn("【Brush】%s RSS未下载到数据" % site_name)
+            if watermark or self.rsshelper.is_rss_not_modified(validator_key=f"brush:{taskid}", url=rss_url):
+                log.info("【Brush】%s RSS没有新的种子" % site_name)
+            else:
+                log.warn("【Brush】%s RSS未下载到数据" % site_name)
             return
         else:
             log.info("【Brush】%s RSS获取数据：%s" % (site_name, len(rss_result)))
@@ -280,6 +293,12 @@ class BrushTask(object):
             except Exception as err:
                 ExceptionUtils.exception_traceback(err)
                 continue
+        else:
+            # 所有种子均已处理，记录最新的种子，下次解析到此为止
+            self._rss_watermarks[taskid] = rss_result[0].get("enclosure")
+        if self._rss_watermarks.get(taskid) != rss_result[0].get("enclosure"):
+            # 还有未处理的种子，下次需要重新下载完整的RSS
+            self.rsshelper.reset_rss_validator(validator_key=f"brush:{taskid}", url=rss_url)
         log.info("【Brush】任务 %s 本次添加了 %s 个下载" % (task_name, success_count))
 
     def remove_tasks_torrents(self):
@@ -3,7 +3,6 @@ import os
 import threading
 import time
 
-from cachetools import cached, TTLCache
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.pool import QueuePool
@@ -38,26 +37,53 @@ class MediaDb:
         with lock:
             BaseMedia.metadata.create_all(_Engine)
 
-    def insert(self, server_type, iteminfo, seasoninfo):
-        if not server_type or not iteminfo:
+    def get_item_signatures(self, server_type):
+        """
+        获取已同步项目的变更签名
+        :return: 项目ID与变更签名的字典
+        """
+        if not server_type:
+            return {}
+        items = self.session.query(MEDIASYNCITEMS.ITEM_ID, MEDIASYNCITEMS.NOTE).filter(
+            MEDIASYNCITEMS.SERVER == server_type).all()
+        return {str(item.ITEM_ID): item.NOTE for item in items}
+
+    def replace_items(self, server_type, items, delete_ids=None, empty=False, batch_size=500):
+        """
+        在同一个事务中删除并批量写入同步项目，提交前不影响已有数据的查询
+        :param server_type: 媒体服务器类型
+        :param items: (项目信息, 剧集信息)的列表
+        :param delete_ids: 需要删除的项目ID
+        :param empty: 是否先清空该媒体服务器的所有项目
+        :param batch_size: 每批写入的数量
+        """
+        if not server_type:
             return False
         try:
-            self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type,
-                                                      MEDIASYNCITEMS.ITEM_ID == iteminfo.get("id")).delete()
-            self.session.flush()
-            self.session.add(MEDIASYNCITEMS(
-                SERVER=server_type,
-                LIBRARY=iteminfo.get("library"),
-                ITEM_ID=iteminfo.get("id"),
-                ITEM_TYPE=iteminfo.get("type"),
-                TITLE=iteminfo.get("title"),
-                ORGIN_TITLE=iteminfo.get("originalTitle"),
-                YEAR=iteminfo.get("year"),
-                TMDBID=iteminfo.get("tmdbid"),
-                IMDBID=iteminfo.get("imdbid"),
-                PATH=iteminfo.get("path"),
-                JSON=json.dumps(seasoninfo)
-            ))
+            if empty:
+                self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type).delete()
+            elif delete_ids:
+                delete_ids = list(delete_ids)
+                for i in range(0, len(delete_ids), batch_size):
+                    self.session.query(MEDIASYNCITEMS).filter(
+                        MEDIASYNCITEMS.SERVER == server_type,
+                        MEDIASYNCITEMS.ITEM_ID.in_(delete_ids[i:i + batch_size])).delete(synchronize_session=False)
+            for i in range(0, len(items), batch_size):
+                self.session.add_all([MEDIASYNCITEMS(
+                    SERVER=server_type,
+                    LIBRARY=iteminfo.get("library"),
+                    ITEM_ID=iteminfo.get("id"),
+                    ITEM_TYPE=iteminfo.get("type"),
+                    TITLE=iteminfo.get("title"),
+                    ORGIN_TITLE=iteminfo.get("originalTitle"),
+                    YEAR=iteminfo.get("year"),
+                    TMDBID=iteminfo.get("tmdbid"),
+                    IMDBID=iteminfo.get("imdbid"),
+                    PATH=iteminfo.get("path"),
+                    NOTE=iteminfo.get("modified"),
+                    JSON=json.dumps(seasoninfo)
+                ) for iteminfo, seasoninfo in items[i:i + batch_size]])
+                self.session.flush()
             self.session.commit()
             return True
         except Exception as e:
@@ -102,28 +128,13 @@ class MediaDb:
             self.session.rollback()
         return False
 
-    @cached(cache=TTLCache(maxsize=128, ttl=60))
-    def query(self, server_type, title, year, tmdbid):
-        if not server_type or not title:
-            return {}
-
-        if tmdbid:
-            item = self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type,
-                                                             MEDIASYNCITEMS.TMDBID == tmdbid).first()
-            if item:
-                return item
-
-        if year:
-            item = self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type,
-                                                             MEDIASYNCITEMS.TITLE == title,
-                                                             MEDIASYNCITEMS.YEAR == year).first()
-        else:
-            item = self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type,
-                                                             MEDIASYNCITEMS.TITLE == title).first()
-        if item:
-            if tmdbid and (not item.TMDBID or item.TMDBID != str(tmdbid)):
-                return {}
-        return item
+    def get_items(self, server_type):
+        """
+        获取媒体服务器的所有同步项目
+        """
+        if not server_type:
+            return []
+        return self.session.query(MEDIASYNCITEMS).filter(MEDIASYNCITEMS.SERVER == server_type).all()
 
     def get_statistics(self, server_type):
         if not server_type:
@@ -248,6 +248,8 @@ class RSSMOVIES(Base):
     STATE = Column(Text)
     DESC = Column(Text)
     NOTE = Column(Text)
+    LAST_SEARCH = Column(Text)
+    SEARCH_SIGN = Column(Text)
 
     def as_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
@@ -299,6 +301,8 @@ class RSSTVS(Base):
     STATE = Column(Text)
     DESC = Column(Text)
     NOTE = Column(Text)
+    LAST_SEARCH = Column(Text)
+    SEARCH_SIGN = Column(Text)
 
     def as_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
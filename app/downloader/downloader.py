@@ -944,17 +944,16 @@ class Downloader:
         if meta_info.type != MediaType.MOVIE:
             # 是否存在的标志
             return_flag = False
-            # 搜索电视剧的信息
-            tv_info = self.media.get_tmdb_info(mtype=MediaType.TV, tmdbid=meta_info.tmdb_id)
-            if tv_info:
+            # 各季的总集数，传入的总集数已覆盖所有检查季时不再查询TMDB
+            season_episodes = {}
+            if not search_season or [season for season in search_season if not total_ep.get(season)]:
+                season_episodes = self.media.get_tmdb_seasons_episodes_num(tmdbid=meta_info.tmdb_id)
+            if season_episodes is not None:
                 # 传入检查季
                 total_seasons = []
                 if search_season:
                     for season in search_season:
-                        if total_ep.get(season):
-                            episode_num = total_ep.get(season)
-                        else:
-                            episode_num = self.media.get_tmdb_season_episodes_num(tv_info=tv_info, season=season)
+                        episode_num = total_ep.get(season) or season_episodes.get(season)
                         if not episode_num:
                             log.info("【Downloader】%s 第%s季 不存在" % (meta_info.get_title_string(), season))
                             message_list.append("%s 第%s季 不存在" % (meta_info.get_title_string(), season))
@@ -964,7 +963,8 @@ class Downloader:
                             "【Downloader】%s 第%s季 共有 %s 集" % (meta_info.get_title_string(), season, episode_num))
                 else:
                     # 共有多少季，每季有多少季
-                    total_seasons = self.media.get_tmdb_tv_seasons(tv_info=tv_info)
+                    total_seasons = [{"season_number": season, "episode_count": episode_count}
+                                     for season, episode_count in sorted(season_episodes.items(), reverse=True)]
                     log.info(
                         "【Downloader】%s %s 共有 %s 季" % (
                             meta_info.type.value, meta_info.get_title_string(), len(total_seasons)))
@@ -974,18 +974,19 @@ class Downloader:
                 if not total_seasons:
                     return_flag = None
                 else:
+                    # 媒体库中已存在的季集，整部剧只查询一次
+                    exists_seasons = self.mediaserver.get_exists_episodes(meta_info)
                     # 查询缺少多少集
                     for season in total_seasons:
                         season_number = season.get("season_number")
                         episode_count = season.get("episode_count")
                         if not season_number or not episode_count:
                             continue
-                        # 检查Emby
-                        no_exists_episodes = self.mediaserver.get_no_exists_episodes(meta_info,
-                                                                                     season_number,
-                                                                                     episode_count)
-                        # 没有配置Emby
-                        if no_exists_episodes is None:
+                        if exists_seasons is not None:
+                            no_exists_episodes = list(set(range(1, episode_count + 1)).difference(
+                                exists_seasons.get(season_number) or set()))
+                        else:
+                            # 没有配置媒体服务器
                             no_exists_episodes = self.filetransfer.get_no_exists_medias(meta_info,
                                                                                         season_number,
                                                                                         episode_count)
@@ -5,15 +5,15 @@ import re
 import shutil
 import traceback
 from enum import Enum
-from threading import Lock
 from time import sleep
 
 import log
 from app.conf import ModuleConf
 from app.helper import DbHelper, ProgressHelper
-from app.helper import ThreadHelper
+from app.helper import ThreadHelper, TransferHelper
 from app.media import Media, Category, Scraper
 from app.media.meta import MetaInfo
+from app.mediaserver.media_index import MediaIndex
 from app.message import Message
 from app.plugins import EventManager
 from app.utils import EpisodeFormat, PathUtils, StringUtils, SystemUtils, ExceptionUtils, NumberUtils
@@ -22,8 +22,6 @@ from app.utils.types import MediaType, SyncType, RmtMode, EventType, ProgressKey
 from config import RMT_AUDIO_TRACK_EXT, RMT_SUBEXT, RMT_MEDIAEXT, RMT_FAVTYPE, RMT_MIN_FILESIZE, DEFAULT_MOVIE_FORMAT, \
     DEFAULT_TV_FORMAT, Config
 
-lock = Lock()
-
 
 @singleton
 class FileTransfer:
@@ -154,31 +152,35 @@ class FileTransfer:
         :param target_file: 目标文件路径
         :param rmt_mode: RmtMode转移方式
         """
-        with lock:
-            if rmt_mode == RmtMode.LINK:
-                # 更链接
-                retcode, retmsg = SystemUtils.link(file_item, target_file)
-            elif rmt_mode == RmtMode.SOFTLINK:
-                # 软链接
-                retcode, retmsg = SystemUtils.softlink(file_item, target_file)
-            elif rmt_mode == RmtMode.MOVE:
-                # 移动
-                retcode, retmsg = SystemUtils.move(file_item, target_file)
-            elif rmt_mode == RmtMode.RCLONE:
-                # Rclone移动
-                retcode, retmsg = SystemUtils.rclone_move(file_item, target_file)
-            elif rmt_mode == RmtMode.RCLONECOPY:
-                # Rclone复制
-                retcode, retmsg = SystemUtils.rclone_copy(file_item, target_file)
-            elif rmt_mode == RmtMode.MINIO:
-                # Minio移动
-                retcode, retmsg = SystemUtils.minio_move(file_item, target_file)
-            elif rmt_mode == RmtMode.MINIOCOPY:
-                # Minio复制
-                retcode, retmsg = SystemUtils.minio_copy(file_item, target_file)
-            else:
-                # 复制
-                retcode, retmsg = SystemUtils.copy(file_item, target_file)
+        if rmt_mode == RmtMode.LINK:
+            # 更链接
+            func = SystemUtils.link
+        elif rmt_mode == RmtMode.SOFTLINK:
+            # 软链接
+            func = SystemUtils.softlink
+        elif rmt_mode == RmtMode.MOVE:
+            # 移动
+            func = SystemUtils.move
+        elif rmt_mode == RmtMode.RCLONE:
+            # Rclone移动
+            func = SystemUtils.rclone_move
+        elif rmt_mode == RmtMode.RCLONECOPY:
+            # Rclone复制
+            func = SystemUtils.rclone_copy
+        elif rmt_mode == RmtMode.MINIO:
+            # Minio移动
+            func = SystemUtils.minio_move
+        elif rmt_mode == RmtMode.MINIOCOPY:
+            # Minio复制
+            func = SystemUtils.minio_copy
+        else:
+            # 复制
+            func = SystemUtils.copy
+        # 按转移方式及目的地分队列执行，不同目的地之间互不阻塞
+        retcode, retmsg = TransferHelper().execute(rmt_mode=rmt_mode,
+                                                   file_item=file_item,
+                                                   target_file=target_file,
+                                                   func=func)
         if retcode != 0:
             log.error("【Rmt】%s" % retmsg)
         return retcode
@@ -853,6 +855,8 @@ class FileTransfer:
                     out_path=out_path,
                     dest=dist_path,
                     media_info=media)
+                # 媒体库有变化，下次同步前不使用媒体库索引中该媒体的数据
+                MediaIndex.invalidate(media.tmdb_id)
                 # 未识别手动识别或历史记录重新识别的批处理模式
                 if isinstance(episode[1], bool) and episode[1]:
                     # 未识别手动识别，更改未识别记录为已处理
@@ -921,6 +925,11 @@ class FileTransfer:
             self.message.send_transfer_tv_message(message_medias, in_from)
         # 总结
         log.info("【Rmt】%s 处理完成，总数：%s，失败：%s" % (in_path, total_count, failed_count))
+        for statistic in TransferHelper().get_statistics():
+            log.debug("【Rmt】%s队列（%s）：并发限制 %s，排队 %s，执行中 %s，累计完成 %s，失败 %s，吞吐量 %s/s" % (
+                statistic.get("mode"), statistic.get("destination"), statistic.get("limit") or "无",
+                statistic.get("waiting"), statistic.get("running"), statistic.get("completed"),
+                statistic.get("failed"), StringUtils.str_filesize(statistic.get("throughput"))))
         if alert_count > 0:
             reason = "、".join(alert_messages)
             # 解发事件
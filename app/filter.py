@@ -1,8 +1,9 @@
 import re
+from collections import namedtuple
 
 import log
 from app.conf import ModuleConf
-from app.helper import DbHelper
+from app.helper import DbHelper, RssHelper
 from app.media.meta import ReleaseGroupsMatcher
 from app.utils import StringUtils
 from app.utils.commons import singleton
@@ -15,6 +16,7 @@ class Filter:
     dbhelper = None
     _groups = []
     _rules = []
+    _matcher = None
 
     def __init__(self):
         self.init_config()
@@ -24,6 +26,10 @@ class Filter:
         self.rg_matcher = ReleaseGroupsMatcher()
         self._groups = self.get_filter_group()
         self._rules = self.get_filter_rule()
+        self._matcher = FilterRuleMatcher(groups=self._groups, rules=self._rules)
+        # 过滤规则变化后需重新下载完整的RSS按新规则过滤，清除订阅及自定义订阅的条件请求缓存
+        RssHelper.reset_rss_validator(validator_key="rss")
+        RssHelper.reset_rss_validator(validator_key="userrss:")
 
     def get_rule_groups(self, groupid=None, default=False):
         """
@@ -105,99 +111,7 @@ class Filter:
         # 为-1时不使用过滤规则
         if rulegroup and int(rulegroup) == -1:
             return True, 0, "不过滤"
-        # 过滤使用的文本
-        title = meta_info.rev_string
-        if meta_info.subtitle:
-            title = f"{title} {meta_info.subtitle}"
-        # 过滤规则组
-        if not rulegroup:
-            rulegroup = self.get_rule_groups(default=True)
-            if not rulegroup:
-                return True, 0, "未配置过滤规则"
-        else:
-            rulegroup = self.get_rule_groups(groupid=rulegroup)
-        filters = self.get_rules(groupid=rulegroup.get("id"))
-        # 命中优先级
-        order_seq = 0
-        # 当前规则组是否命中
-        group_match = True
-        for filter_info in filters:
-            try:
-                # 当前规则是否命中
-                rule_match = True
-                # 命中规则的序号
-                order_seq = 100 - int(filter_info.get('pri'))
-                # 必须包括的项
-                includes = filter_info.get('include')
-                if includes and rule_match:
-                    include_flag = True
-                    for include in includes:
-                        if not include:
-                            continue
-                        if not re.search(r'%s' % include.strip(), title, re.IGNORECASE):
-                            include_flag = False
-                            break
-                    if not include_flag:
-                        rule_match = False
-
-                # 不能包含的项
-                excludes = filter_info.get('exclude')
-                if excludes and rule_match:
-                    exclude_flag = False
-                    exclude_count = 0
-                    for exclude in excludes:
-                        if not exclude:
-                            continue
-                        exclude_count += 1
-                        if not re.search(r'%s' % exclude.strip(), title, re.IGNORECASE):
-                            exclude_flag = True
-                    if exclude_count > 0 and not exclude_flag:
-                        rule_match = False
-                # 大小
-                sizes = filter_info.get('size')
-                if sizes and rule_match and meta_info.size:
-                    meta_info.size = StringUtils.num_filesize(meta_info.size)
-                    if sizes.find(',') != -1:
-                        sizes = sizes.split(',')
-                        if sizes[0].isdigit():
-                            begin_size = int(sizes[0].strip())
-                        else:
-                            begin_size = 0
-                        if sizes[1].isdigit():
-                            end_size = int(sizes[1].strip())
-                        else:
-                            end_size = 0
-                    else:
-                        begin_size = 0
-                        if sizes.isdigit():
-                            end_size = int(sizes.strip())
-                        else:
-                            end_size = 0
-                    if meta_info.type == MediaType.MOVIE:
-                        if not begin_size * 1024 ** 3 <= int(meta_info.size) <= end_size * 1024 ** 3:
-                            rule_match = False
-                    else:
-                        if meta_info.total_episodes \
-                                and not begin_size * 1024 ** 3 <= int(meta_info.size) / int(meta_info.total_episodes) <= end_size * 1024 ** 3:
-                            rule_match = False
-
-                # 促销
-                free = filter_info.get("free")
-                if free and meta_info.upload_volume_factor is not None and meta_info.download_volume_factor is not None:
-                    ul_factor, dl_factor = free.split()
-                    if float(ul_factor) > meta_info.upload_volume_factor \
-                            or float(dl_factor) < meta_info.download_volume_factor:
-                        rule_match = False
-
-                if rule_match:
-                    return True, order_seq, rulegroup.get("name")
-                else:
-                    group_match = False
-            except Exception as err:
-                log.error(f"【Filter】过滤规则出现严重错误 {err}，请检查：{filter_info}")
-        if not group_match:
-            return False, 0, rulegroup.get("name")
-        return True, order_seq, rulegroup.get("name")
+        return self._matcher.check(meta_info, rulegroup)
 
     def is_rule_free(self, rulegroup=None):
         """
@@ -387,3 +301,161 @@ class Filter:
         根据名称获取过滤规则组ID
         """
         return self.dbhelper.get_filter_groupid_by_name(name)
+
+
+# 预编译的过滤规则
+CompiledFilterRule = namedtuple("CompiledFilterRule",
+                                ["info", "order_seq", "includes", "excludes", "size_range", "free", "valid"])
+
+
+class FilterRuleMatcher:
+    """
+    预编译的过滤规则匹配器，规则组内的正则表达式、大小及促销条件只解析一次，规则变化时重新构建
+    """
+
+    def __init__(self, groups, rules):
+        group_rules = {}
+        for rule in rules or []:
+            group_rules.setdefault(str(rule.GROUP_ID), []).append(self.__compile_rule(rule))
+        # 规则组ID -> (规则组名称, 规则元组)
+        self._groups = {}
+        self._default_groupid = None
+        for group in groups or []:
+            groupid = str(group.ID)
+            self._groups[groupid] = (group.GROUP_NAME, tuple(group_rules.get(groupid, [])))
+            if not self._default_groupid and group.IS_DEFAULT == "Y":
+                self._default_groupid = groupid
+
+    @staticmethod
+    def __compile_rule(rule):
+        """
+        编译单条过滤规则
+        """
+        info = {
+            "id": rule.ID,
+            "name": rule.ROLE_NAME,
+            "pri": rule.PRIORITY or 0
+        }
+        valid = True
+        try:
+            order_seq = 100 - int(rule.PRIORITY or 0)
+        except (TypeError, ValueError):
+            order_seq = None
+            valid = False
+        # 包含及排除的正则表达式
+        patterns = {"include": [], "exclude": []}
+        for key, text in (("include", rule.INCLUDE), ("exclude", rule.EXCLUDE)):
+            for pattern in (text.split("\n") if text else []):
+                if not pattern:
+                    continue
+                try:
+                    patterns[key].append(re.compile(r'%s' % pattern.strip(), re.IGNORECASE))
+                except re.error as err:
+                    valid = False
+                    log.error(f"【Filter】过滤规则出现严重错误 {err}，请检查：{info}")
+        # 大小范围
+        size_range = None
+        sizes = rule.SIZE_LIMIT
+        if sizes:
+            if sizes.find(',') != -1:
+                sizes = sizes.split(',')
+                begin_size = int(sizes[0].strip()) if sizes[0].isdigit() else 0
+                end_size = int(sizes[1].strip()) if sizes[1].isdigit() else 0
+            else:
+                begin_size = 0
+                end_size = int(sizes.strip()) if sizes.isdigit() else 0
+            size_range = (begin_size * 1024 ** 3, end_size * 1024 ** 3)
+        # 促销
+        free = None
+        if rule.NOTE:
+            try:
+                ul_factor, dl_factor = rule.NOTE.split()
+                free = (float(ul_factor), float(dl_factor))
+            except ValueError as err:
+                valid = False
+                log.error(f"【Filter】过滤规则出现严重错误 {err}，请检查：{info}")
+        return CompiledFilterRule(info=info,
+                                  order_seq=order_seq,
+                                  includes=tuple(patterns["include"]),
+                                  excludes=tuple(patterns["exclude"]),
+                                  size_range=size_range,
+                                  free=free,
+                                  valid=valid)
+
+    def get_group(self, groupid=None):
+        """
+        获取规则组名称及规则，groupid为空时获取默认规则组
+        :return: 规则组名称、规则元组，规则组不存在时返回None
+        """
+        if not groupid:
+            if not self._default_groupid:
+                return None
+            groupid = self._default_groupid
+        return self._groups.get(str(groupid), (None, ()))
+
+    def check(self, meta_info, rulegroup=None):
+        """
+        检查种子是否匹配规则组
+        :return: 是否匹配，匹配的优先值，规则名称
+        """
+        group = self.get_group(rulegroup)
+        if group is None:
+            return True, 0, "未配置过滤规则"
+        return self.__check_group(meta_info, *group)
+
+    @staticmethod
+    def __check_group(meta_info, group_name, rules):
+        # 过滤使用的文本
+        title = meta_info.rev_string
+        if meta_info.subtitle:
+            title = f"{title} {meta_info.subtitle}"
+        # 命中优先级
+        order_seq = 0
+        # 当前规则组是否命中
+        group_match = True
+        for rule in rules:
+            if rule.order_seq is not None:
+                order_seq = rule.order_seq
+            if not rule.valid:
+                continue
+            try:
+                if FilterRuleMatcher.__check_rule(meta_info, title, rule):
+                    return True, order_seq, group_name
+                group_match = False
+            except Exception as err:
+                log.error(f"【Filter】过滤规则出现严重错误 {err}，请检查：{rule.info}")
+        if not group_match:
+            return False, 0, group_name
+        return True, order_seq, group_name
+
+    @staticmethod
+    def __check_rule(meta_info, title, rule):
+        """
+        检查种子是否命中单条规则
+        """
+        # 必须包括的项
+        for include in rule.includes:
+            if not include.search(title):
+                return False
+        # 不能包含的项，全部命中时不匹配
+        if rule.excludes \
+                and all(exclude.search(title) for exclude in rule.excludes):
+            return False
+        # 大小
+        if rule.size_range and meta_info.size:
+            meta_info.size = StringUtils.num_filesize(meta_info.size)
+            begin_size, end_size = rule.size_range
+            if meta_info.type == MediaType.MOVIE:
+                if not begin_size <= int(meta_info.size) <= end_size:
+                    return False
+            else:
+                if meta_info.total_episodes \
+                        and not begin_size <= int(meta_info.size) / int(meta_info.total_episodes) <= end_size:
+                    return False
+        # 促销
+        if rule.free and meta_info.upload_volume_factor is not None and meta_info.download_volume_factor is not None:
+            ul_factor, dl_factor = rule.free
+            if ul_factor > meta_info.upload_volume_factor \
+                    or dl_factor < meta_info.download_volume_factor:
+                return False
+        return True
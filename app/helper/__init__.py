@@ -15,3 +15,5 @@ from .ffmpeg_helper import FfmpegHelper
 from .redis_helper import RedisHelper
 from .rss_helper import RssHelper
 from .plugin_helper import PluginHelper
+from .transfer_helper import TransferHelper
+from .image_cache_helper import ImageCacheHelper
@@ -92,9 +92,13 @@ class DbHelper:
 
     def get_search_results(self):
         """
-        查询搜索结果的所有记录
+        查询搜索结果的所有记录，按质量、站点优先级、做种数排序
         """
-        return self._db.query(SEARCHRESULTINFO).all()
+        return self._db.query(SEARCHRESULTINFO).order_by(
+            cast(SEARCHRESULTINFO.RES_ORDER, Integer).desc(),
+            cast(SEARCHRESULTINFO.SITE_ORDER, Integer).desc(),
+            SEARCHRESULTINFO.SEEDERS.desc()
+        ).all()
 
     @DbPersist(_db)
     def delete_all_search_torrents(self):
@@ -785,6 +789,28 @@ class DbHelper:
             }
         )
 
+    @DbPersist(_db)
+    def update_rss_movies_tmdb(self, movies: list):
+        """
+        在同一事务中批量更新订阅电影的部分信息
+        :param movies: 字典列表，键同update_rss_movie_tmdb的参数
+        """
+        for movie in movies or []:
+            if not movie.get("tmdbid"):
+                continue
+            self._db.query(RSSMOVIES).filter(
+                RSSMOVIES.ID == int(movie.get("rid"))
+            ).update(
+                {
+                    "TMDBID": movie.get("tmdbid"),
+                    "NAME": movie.get("title"),
+                    "YEAR": movie.get("year"),
+                    "IMAGE": movie.get("image"),
+                    "NOTE": movie.get("note"),
+                    "DESC": movie.get("desc"),
+                }
+            )
+
     @DbPersist(_db)
     def update_rss_movie_desc(self, rid, desc):
         """
@@ -1045,6 +1071,36 @@ class DbHelper:
             }
         )
 
+    @DbPersist(_db)
+    def update_rss_tvs_tmdb(self, tvs: list):
+        """
+        在同一事务中批量更新订阅电视剧的部分信息及缺失剧集
+        :param tvs: 字典列表，键同update_rss_tv_tmdb的参数，episodes为缺失剧集
+        """
+        for tv in tvs or []:
+            if not tv.get("tmdbid"):
+                continue
+            rid = int(tv.get("rid"))
+            self._db.query(RSSTVS).filter(RSSTVS.ID == rid).update(
+                {
+                    "TMDBID": tv.get("tmdbid"),
+                    "NAME": tv.get("title"),
+                    "YEAR": tv.get("year"),
+                    "TOTAL": tv.get("total"),
+                    "LACK": tv.get("lack"),
+                    "IMAGE": tv.get("image"),
+                    "DESC": tv.get("desc"),
+                    "NOTE": tv.get("note"),
+                }
+            )
+            episodes = ",".join([str(epi) for epi in tv.get("episodes") or []])
+            if self.is_exists_rss_tv_episodes(rid):
+                self._db.query(RSSTVEPISODES).filter(
+                    RSSTVEPISODES.RSSID == rid
+                ).update({"EPISODES": episodes})
+            else:
+                self._db.insert(RSSTVEPISODES(RSSID=rid, EPISODES=episodes))
+
     @DbPersist(_db)
     def update_rss_tv_desc(self, rid, desc):
         """
@@ -1156,6 +1212,38 @@ class DbHelper:
         )
         return 0
 
+    @DbPersist(_db)
+    def update_rss_movie_search(self, rssid, sign):
+        """
+        记录电影订阅的搜索时间及搜索时的订阅签名
+        """
+        if not rssid:
+            return
+        self._db.query(RSSMOVIES).filter(RSSMOVIES.ID == int(rssid)).update(
+            {
+                "LAST_SEARCH": time.strftime(
+                    "%Y-%m-%d %H:%M:%S", time.localtime(time.time())
+                ),
+                "SEARCH_SIGN": sign,
+            }
+        )
+
+    @DbPersist(_db)
+    def update_rss_tv_search(self, rssid, sign):
+        """
+        记录电视剧订阅的搜索时间及搜索时的订阅签名
+        """
+        if not rssid:
+            return
+        self._db.query(RSSTVS).filter(RSSTVS.ID == int(rssid)).update(
+            {
+                "LAST_SEARCH": time.strftime(
+                    "%Y-%m-%d %H:%M:%S", time.localtime(time.time())
+                ),
+                "SEARCH_SIGN": sign,
+            }
+        )
+
     @DbPersist(_db)
     def update_rss_tv_lack(
         self,
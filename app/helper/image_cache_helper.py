@@ -0,0 +1,168 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import log
+from app.utils import RequestUtils, ExceptionUtils
+from app.utils.commons import singleton, SingleFlight
+from config import Config, IMAGE_CACHE_MAX_SIZE
+
+# 图片文件头 -> mimetype，只允许位图，其它内容（如SVG、HTML）不缓存也不返回
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+@singleton
+class ImageCacheHelper:
+    """
+    图片中转的磁盘缓存，按最近使用淘汰，相同图片的并发下载只执行一次
+    """
+    _lock = Lock()
+    _flight = SingleFlight()
+    # 缓存文件路径 -> 文件大小，按最近使用排序
+    _index = OrderedDict()
+    _total_size = 0
+    _cache_path = None
+
+    def __init__(self):
+        self.init_config()
+
+    def init_config(self):
+        self._cache_path = os.path.join(Config().get_temp_path(), "images")
+        with self._lock:
+            self._index = OrderedDict()
+            self._total_size = 0
+            files = []
+            if os.path.exists(self._cache_path):
+                for root, _, names in os.walk(self._cache_path):
+                    for name in names:
+                        if name.endswith(".tmp"):
+                            continue
+                        path = os.path.join(root, name)
+                        try:
+                            stat = os.stat(path)
+                        except OSError:
+                            continue
+                        files.append((stat.st_mtime, path, stat.st_size))
+            for _, path, size in sorted(files):
+                self._index[path] = size
+                self._total_size += size
+
+    def get_mimetype(self, path):
+        """
+        根据文件头判断图片的mimetype
+        :return: 不是允许的图片格式时返回None
+        """
+        try:
+            with open(path, "rb") as f:
+                header = f.read(16)
+        except OSError:
+            return None
+        return self.get_content_mimetype(header)
+
+    @staticmethod
+    def get_content_mimetype(content):
+        """
+        根据内容的文件头判断图片的mimetype
+        :return: 不是允许的图片格式时返回None
+        """
+        if not content:
+            return None
+        if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+            return "image/webp"
+        for signature, mimetype in IMAGE_SIGNATURES:
+            if content.startswith(signature):
+                return mimetype
+        return None
+
+    def get_image(self, url):
+        """
+        获取图片的缓存文件，不存在时下载
+        :param url: 图片地址
+        :return: 缓存文件路径，下载失败时返回None
+        """
+        if not url:
+            return None
+        path = self.__get_cache_file(url)
+        if self.__touch(path):
+            return path
+        try:
+            return self._flight.do(path, self.__fetch_image, url, path)
+        except Exception as e:
+            ExceptionUtils.exception_traceback(e)
+            return None
+
+    def get_statistics(self):
+        """
+        获取缓存占用及下载合并统计
+        """
+        with self._lock:
+            statistics = {"count": len(self._index), "size": self._total_size}
+        statistics.update(self._flight.get_statistics())
+        return statistics
+
+    def __get_cache_file(self, url):
+        """
+        缓存文件按地址的哈希值分目录存放
+        """
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self._cache_path, name[:2], name)
+
+    def __touch(self, path):
+        """
+        命中时移到最近使用的位置
+        """
+        with self._lock:
+            if path not in self._index:
+                return False
+            if not os.path.exists(path):
+                self._total_size -= self._index.pop(path)
+                return False
+            self._index.move_to_end(path)
+            return True
+
+    def __fetch_image(self, url, path):
+        """
+        下载图片并写入缓存
+        """
+        if self.__touch(path):
+            return path
+        res = RequestUtils().get_res(url)
+        if not res or res.status_code != 200 or not res.content:
+            log.debug(f"【ImageCache】图片下载失败：{url}")
+            return None
+        content = res.content
+        if not self.get_content_mimetype(content):
+            log.debug(f"【ImageCache】不是支持的图片格式：{url}")
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_file = f"{path}.{time.time_ns()}.tmp"
+        with open(temp_file, "wb") as f:
+            f.write(content)
+        os.replace(temp_file, path)
+        self.__add(path, len(content))
+        return path
+
+    def __add(self, path, size):
+        """
+        登记缓存文件，超出容量时淘汰最久未使用的文件
+        """
+        expired = []
+        with self._lock:
+            self._total_size += size - self._index.pop(path, 0)
+            self._index[path] = size
+            while self._total_size > IMAGE_CACHE_MAX_SIZE and len(self._index) > 1:
+                old_path, old_size = self._index.popitem(last=False)
+                self._total_size -= old_size
+                expired.append(old_path)
+        for old_path in expired:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
@@ -3,7 +3,7 @@ import pickle
 
 from app.utils import StringUtils, ExceptionUtils
 from app.utils.commons import singleton
-from config import Config
+from config import Config, INDEXER_SEARCH_TIMEOUT
 
 
 @singleton
@@ -124,3 +124,5 @@ class IndexerConf(object):
         self.language = language if language else datas.get('language')
         # 索引器优先级
         self.pri = pri if pri else 0
+        # 搜索超时时间（秒）
+        self.timeout = datas.get('timeout') or INDEXER_SEARCH_TIMEOUT
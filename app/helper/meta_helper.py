@@ -1,10 +1,11 @@
 import os
 import pickle
-import random
+import sqlite3
 import time
 from enum import Enum
-from threading import RLock
+from threading import RLock, Lock
 
+import log
 from app.utils import ExceptionUtils
 from app.utils.commons import singleton
 from config import Config
@@ -13,6 +14,10 @@ lock = RLock()
 
 CACHE_EXPIRE_TIMESTAMP_STR = "cache_expire_timestamp"
 EXPIRE_TIMESTAMP = 7 * 24 * 3600
+# 读取命中时延长过期时间的最小间隔，避免每次读取都产生写入
+EXPIRE_REFRESH_INTERVAL = 24 * 3600
+# 待写入KEY的分段锁数量
+LOCK_STRIPES = 16
 
 
 @singleton
@@ -24,10 +29,18 @@ class MetaHelper(object):
         "year": '',
         "type": MediaType
     }
+    缓存保存在SQLite中按条读写，内存中只保留用到的条目
+    读取内存中的条目不加锁，全局锁只用于数据库访问及删除等结构变更，待写入的KEY按分段锁记录
     """
+    # 已加载的缓存条目
     _meta_data = {}
+    # 分段锁及对应的待写入数据库的KEY
+    _stripe_locks = [Lock() for _ in range(LOCK_STRIPES)]
+    _dirty_keys = [set() for _ in range(LOCK_STRIPES)]
 
     _meta_path = None
+    _db_path = None
+    _conn = None
     _tmdb_cache_expire = False
 
     def __init__(self):
@@ -37,8 +50,135 @@ class MetaHelper(object):
         laboratory = Config().get_config('laboratory')
         if laboratory:
             self._tmdb_cache_expire = laboratory.get("tmdb_cache_expire")
-        self._meta_path = os.path.join(Config().get_config_path(), 'tmdb.dat')
-        self._meta_data = self.__load_meta_data(self._meta_path)
+        with lock:
+            if self._conn:
+                self.save_meta_data()
+                self._conn.close()
+            self._meta_path = os.path.join(Config().get_config_path(), 'tmdb.dat')
+            self._db_path = os.path.join(Config().get_config_path(), 'tmdb.db')
+            self._meta_data = {}
+            self.__take_dirty_keys()
+            self._conn = self.__init_db(self._db_path)
+            self.__import_meta_data(self._meta_path)
+
+    def __init_db(self, path):
+        """
+        打开缓存数据库并建表
+        """
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS META_DATA ("
+                     "KEY TEXT PRIMARY KEY, "
+                     "TMDBID TEXT, "
+                     "EXPIRE INTEGER, "
+                     "VALUE BLOB, "
+                     "TITLE TEXT)")
+        # 旧版本的表没有TITLE列，补充并回填
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(META_DATA)").fetchall()]
+        if "TITLE" not in columns:
+            conn.execute("ALTER TABLE META_DATA ADD COLUMN TITLE TEXT")
+            keys = [row[0] for row in conn.execute("SELECT KEY FROM META_DATA").fetchall()]
+            conn.execute("BEGIN")
+            conn.executemany("UPDATE META_DATA SET TITLE = ? WHERE KEY = ?",
+                             [(self.__get_search_title(key), key) for key in keys])
+            conn.execute("COMMIT")
+        conn.execute("CREATE INDEX IF NOT EXISTS INDX_META_DATA_TMDBID ON META_DATA (TMDBID)")
+        conn.execute("CREATE INDEX IF NOT EXISTS INDX_META_DATA_EXPIRE ON META_DATA (EXPIRE)")
+        # 标题按包含关系搜索用不到索引
+        conn.execute("DROP INDEX IF EXISTS INDX_META_DATA_TITLE")
+        return conn
+
+    @staticmethod
+    def __get_display_key(key):
+        """
+        去掉类型前缀及空年份后的缓存KEY，用于展示
+        """
+        return str(key).replace("[电影]", "").replace("[电视剧]", "").replace("[未知]", "").replace("-None", "")
+
+    def __get_search_title(self, key):
+        """
+        用于搜索的标题，不区分大小写
+        """
+        return self.__get_display_key(key).lower()
+
+    def __import_meta_data(self, path):
+        """
+        从旧版本的tmdb.dat导入缓存，导入后重命名原文件避免重复导入
+        """
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'rb') as f:
+                meta_data = pickle.load(f) or {}
+            self.__write_items([(key, item) for key, item in meta_data.items() if str(item.get("id")) != '0'])
+            os.replace(path, f"{path}.bak")
+            log.info(f"【Meta】已从 {path} 导入 {len(meta_data)} 条TMDB缓存")
+        except Exception as e:
+            ExceptionUtils.exception_traceback(e)
+
+    def __write_items(self, items):
+        """
+        批量写入缓存条目
+        """
+        if not items:
+            return
+        rows = []
+        for key, item in items:
+            if not item.get(CACHE_EXPIRE_TIMESTAMP_STR):
+                item[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
+            rows.append((key,
+                         str(item.get("id")),
+                         item.get(CACHE_EXPIRE_TIMESTAMP_STR),
+                         pickle.dumps(item, pickle.HIGHEST_PROTOCOL),
+                         self.__get_search_title(key)))
+        with lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO META_DATA (KEY, TMDBID, EXPIRE, VALUE, TITLE) "
+                                       "VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def __load_item(self, key):
+        """
+        读取单条缓存，优先使用内存中的条目
+        """
+        info = self._meta_data.get(key)
+        if info is not None:
+            return info
+        row = self._conn.execute("SELECT VALUE FROM META_DATA WHERE KEY = ?", (key,)).fetchone()
+        if not row:
+            return None
+        info = pickle.loads(row[0])
+        self._meta_data[key] = info
+        return info
+
+    def __mark_dirty(self, key):
+        """
+        记录待写入数据库的KEY
+        """
+        stripe = hash(key) % LOCK_STRIPES
+        with self._stripe_locks[stripe]:
+            self._dirty_keys[stripe].add(key)
+
+    def __unmark_dirty(self, key):
+        stripe = hash(key) % LOCK_STRIPES
+        with self._stripe_locks[stripe]:
+            self._dirty_keys[stripe].discard(key)
+
+    def __take_dirty_keys(self):
+        """
+        取出并清空所有待写入数据库的KEY
+        """
+        dirty_keys = set()
+        for stripe in range(LOCK_STRIPES):
+            with self._stripe_locks[stripe]:
+                dirty_keys |= self._dirty_keys[stripe]
+                self._dirty_keys[stripe] = set()
+        return dirty_keys
 
     def clear_meta_data(self):
         """
@@ -46,32 +186,41 @@ class MetaHelper(object):
         """
         with lock:
             self._meta_data = {}
+            self.__take_dirty_keys()
+            self._conn.execute("DELETE FROM META_DATA")
+            self._conn.execute("VACUUM")
 
     def get_meta_data_path(self):
         """
         返回TMDB缓存文件路径
         """
-        return self._meta_path
+        return self._db_path
 
     def get_meta_data_by_key(self, key):
         """
         根据KEY值获取缓存值
         """
-        with lock:
-            info: dict = self._meta_data.get(key)
-            if info:
-                expire = info.get(CACHE_EXPIRE_TIMESTAMP_STR)
-                if not expire or int(time.time()) < expire:
-                    info[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
-                    self.update_meta_data({key: info})
-                elif expire and self._tmdb_cache_expire:
-                    self.delete_meta_data(key)
-            return info or {}
+        # 已加载的条目直接读取，不加锁
+        info: dict = self._meta_data.get(key)
+        if info is None:
+            with lock:
+                info = self.__load_item(key)
+        if info:
+            now = int(time.time())
+            expire = info.get(CACHE_EXPIRE_TIMESTAMP_STR)
+            if not expire or now < expire:
+                # 延迟刷新过期时间，由定时保存任务批量写入
+                if not expire or expire - now < EXPIRE_TIMESTAMP - EXPIRE_REFRESH_INTERVAL:
+                    info[CACHE_EXPIRE_TIMESTAMP_STR] = now + EXPIRE_TIMESTAMP
+                    self.__mark_dirty(key)
+            elif self._tmdb_cache_expire:
+                self.delete_meta_data(key)
+        return info or {}
 
     def dump_meta_data(self, search, page, num):
         """
-        分页获取当前缓存列表
-        @param search: 搜索的缓存key
+        分页获取当前缓存列表，按标题包含关系搜索，包括尚未写入数据库的条目
+        @param search: 搜索的标题
         @param page: 页码
         @param num: 单页大小
         @return: 总数, 缓存列表
@@ -81,17 +230,55 @@ class MetaHelper(object):
         else:
             begin_pos = (page - 1) * num
 
+        search = (search or "").strip().lower()
+        if search:
+            condition = "TMDBID != '0' AND TITLE LIKE ? ESCAPE '\\'"
+            params = ("%%%s%%" % search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_"),)
+        else:
+            condition = "TMDBID != '0'"
+            params = ()
         with lock:
-            search_metas = [(k, {
+            unsaved_keys = self.__get_unsaved_keys(search)
+            db_total = self._conn.execute(f"SELECT COUNT(*) FROM META_DATA WHERE {condition}", params).fetchone()[0]
+            rows = self._conn.execute(f"SELECT KEY, VALUE FROM META_DATA WHERE {condition} "
+                                      f"ORDER BY rowid LIMIT ? OFFSET ?", params + (num, begin_pos)).fetchall()
+            # 数据库中的条目之后接着展示尚未保存的条目
+            if len(rows) < num:
+                unsaved_pos = max(begin_pos - db_total, 0)
+                rows += [(key, None) for key in unsaved_keys[unsaved_pos:unsaved_pos + num - len(rows)]]
+            # 内存中的条目可能已修改，优先使用
+            metas = [(k, self._meta_data.get(k) or pickle.loads(value)) for k, value in rows]
+        search_metas = []
+        for k, v in metas:
+            search_metas.append((k, {
                 "id": v.get("id"),
                 "title": v.get("title"),
                 "year": v.get("year"),
                 "media_type": v.get("type").value if isinstance(v.get("type"), Enum) else v.get("type"),
                 "poster_path": v.get("poster_path"),
                 "backdrop_path": v.get("backdrop_path")
-            },  str(k).replace("[电影]", "").replace("[电视剧]", "").replace("[未知]", "").replace("-None", ""))
-                for k, v in self._meta_data.items() if search.lower() in k.lower() and v.get("id") != 0]
-            return len(search_metas), search_metas[begin_pos: begin_pos + num]
+            }, self.__get_display_key(k)))
+        return db_total + len(unsaved_keys), search_metas
+
+    def __get_unsaved_keys(self, search):
+        """
+        获取标题包含搜索词、已识别但尚未写入数据库的缓存KEY，需在全局锁内调用
+        """
+        dirty_keys = set()
+        for stripe in range(LOCK_STRIPES):
+            with self._stripe_locks[stripe]:
+                dirty_keys |= self._dirty_keys[stripe]
+        keys = [key for key in dirty_keys
+                if self._meta_data.get(key)
+                and str(self._meta_data[key].get("id")) != '0'
+                and search in self.__get_search_title(key)]
+        # 排除数据库中已存在的条目
+        saved_keys = set()
+        for pos in range(0, len(keys), 500):
+            chunk = keys[pos:pos + 500]
+            saved_keys.update(row[0] for row in self._conn.execute(
+                "SELECT KEY FROM META_DATA WHERE KEY IN (%s)" % ",".join("?" * len(chunk)), chunk).fetchall())
+        return sorted(key for key in keys if key not in saved_keys)
 
     def delete_meta_data(self, key):
         """
@@ -100,25 +287,28 @@ class MetaHelper(object):
         @return: 被删除的缓存内容
         """
         with lock:
-            return self._meta_data.pop(key, None)
+            info = self.__load_item(key)
+            self._meta_data.pop(key, None)
+            self.__unmark_dirty(key)
+            self._conn.execute("DELETE FROM META_DATA WHERE KEY = ?", (key,))
+            return info
 
     def delete_meta_data_by_tmdbid(self, tmdbid):
         """
         清空对应TMDBID的所有缓存记录，以强制更新TMDB中最新的数据
         """
-        for key in list(self._meta_data):
-            if str(self._meta_data.get(key, {}).get("id")) == str(tmdbid):
-                with lock:
+        with lock:
+            for key in list(self._meta_data):
+                if str(self._meta_data.get(key, {}).get("id")) == str(tmdbid):
                     self._meta_data.pop(key)
+                    self.__unmark_dirty(key)
+            self._conn.execute("DELETE FROM META_DATA WHERE TMDBID = ?", (str(tmdbid),))
 
     def delete_unknown_meta(self):
         """
         清除未识别的缓存记录，以便重新搜索TMDB
         """
-        for key in list(self._meta_data):
-            if str(self._meta_data.get(key, {}).get("id")) == '0':
-                with lock:
-                    self._meta_data.pop(key)
+        self.delete_meta_data_by_tmdbid(0)
 
     def modify_meta_data(self, key, title):
         """
@@ -128,25 +318,12 @@ class MetaHelper(object):
         @return: 被修改后缓存内容
         """
         with lock:
-            if self._meta_data.get(key):
-                self._meta_data[key]['title'] = title
-                self._meta_data[key][CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
-            return self._meta_data.get(key)
-
-    @staticmethod
-    def __load_meta_data(path):
-        """
-        从文件中加载缓存
-        """
-        try:
-            if os.path.exists(path):
-                with open(path, 'rb') as f:
-                    data = pickle.load(f)
-                return data
-            return {}
-        except Exception as e:
-            ExceptionUtils.exception_traceback(e)
-            return {}
+            info = self.__load_item(key)
+            if info:
+                info['title'] = title
+                info[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
+                self.__mark_dirty(key)
+            return info
 
     def update_meta_data(self, meta_data):
         """
@@ -156,65 +333,40 @@ class MetaHelper(object):
             return
         with lock:
             for key, item in meta_data.items():
-                if not self._meta_data.get(key):
+                if not self.__load_item(key):
                     item[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
                     self._meta_data[key] = item
+                    self.__mark_dirty(key)
 
     def save_meta_data(self, force=False):
         """
-        保存缓存数据到文件
+        将变更的缓存条目写入数据库，未识别的条目只保存在内存中
         """
-        meta_data = self.__load_meta_data(self._meta_path)
-        new_meta_data = {k: v for k, v in self._meta_data.items() if str(v.get("id")) != '0'}
-
-        if not force \
-                and not self._random_sample(new_meta_data) \
-                and meta_data.keys() == new_meta_data.keys():
-            return
-
-        with open(self._meta_path, 'wb') as f:
-            pickle.dump(new_meta_data, f, pickle.HIGHEST_PROTOCOL)
-
-    def _random_sample(self, new_meta_data):
-        """
-        采样分析是否需要保存
-        """
-        ret = False
-        if len(new_meta_data) < 25:
-            keys = list(new_meta_data.keys())
-            for k in keys:
-                info = new_meta_data.get(k)
-                expire = info.get(CACHE_EXPIRE_TIMESTAMP_STR)
-                if not expire:
-                    ret = True
-                    info[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
-                elif int(time.time()) >= expire:
-                    ret = True
-                    if self._tmdb_cache_expire:
-                        new_meta_data.pop(k)
-        else:
-            count = 0
-            keys = random.sample(new_meta_data.keys(), 25)
-            for k in keys:
-                info = new_meta_data.get(k)
-                expire = info.get(CACHE_EXPIRE_TIMESTAMP_STR)
-                if not expire:
-                    ret = True
-                    info[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
-                elif int(time.time()) >= expire:
-                    ret = True
-                    if self._tmdb_cache_expire:
-                        new_meta_data.pop(k)
-                        count += 1
-            if count >= 5:
-                ret |= self._random_sample(new_meta_data)
-        return ret
+        with lock:
+            dirty_keys = self.__take_dirty_keys()
+            items = [(key, self._meta_data.get(key)) for key in dirty_keys
+                     if self._meta_data.get(key) and str(self._meta_data[key].get("id")) != '0']
+            try:
+                self.__write_items(items)
+            except Exception as e:
+                ExceptionUtils.exception_traceback(e)
+                for key in dirty_keys:
+                    self.__mark_dirty(key)
+                return
+            # 清理过期条目
+            if self._tmdb_cache_expire:
+                now = int(time.time())
+                self._conn.execute("DELETE FROM META_DATA WHERE EXPIRE < ?", (now,))
+                for key in [k for k, v in self._meta_data.items()
+                            if (v.get(CACHE_EXPIRE_TIMESTAMP_STR) or now) < now]:
+                    self._meta_data.pop(key, None)
 
     def get_cache_title(self, key):
         """
         获取缓存的标题
         """
-        cache_media_info = self._meta_data.get(key)
+        with lock:
+            cache_media_info = self.__load_item(key)
         if not cache_media_info or not cache_media_info.get("id"):
             return None
         return cache_media_info.get("title")
@@ -223,7 +375,9 @@ class MetaHelper(object):
         """
         重新设置缓存标题
         """
-        cache_media_info = self._meta_data.get(key)
-        if not cache_media_info:
-            return
-        self._meta_data[key]['title'] = cn_title
+        with lock:
+            cache_media_info = self.__load_item(key)
+            if not cache_media_info:
+                return
+            cache_media_info['title'] = cn_title
+            self.__mark_dirty(key)
@@ -1,4 +1,5 @@
-import xml.dom.minidom
+from threading import Lock
+from xml.etree import ElementTree
 
 from app.db import MainDb, DbPersist
 from app.db.models import RSSTORRENTS
@@ -7,7 +8,8 @@ from app.utils import (
     StringUtils,
     RequestUtils,
     ExceptionUtils,
-    DomUtils,
+    RssValidatorCache,
+    EncodingUtils,
 )
 from config import Config
 import log
@@ -15,108 +17,255 @@ import log
 
 class RssHelper:
     _db = MainDb()
+    # 条件请求命中统计
+    _validator_lock = Lock()
+    _validator_statistics = {"hit": 0, "miss": 0}
+
+    # 流式解析时每次喂给解析器的字符数
+    _feed_chunk_size = 64 * 1024
+
+    # 需要特殊处理标题的站点
+    _special_title_sites = {
+        "pt.keepfrds.com": RssTitleUtils.keepfriends_title
+    }
+
+    # RSS过期时站点返回的报文
+    _rss_expired_msg = [
+        "RSS 链接已过期, 您需要获得一个新的!",
+        "RSS Link has expired, You need to get a new one!",
+    ]
 
     @staticmethod
-    def parse_rssxml(url, proxy=False):
+    def request_rss(url, proxies=None, timeout=None, validator_key=None):
         """
-        解析RSS订阅URL，获取RSS中的种子信息
+        请求RSS地址，传入validator_key时使用ETag/Last-Modified发起条件请求
         :param url: RSS地址
-        :param proxy: 是否使用代理
-        :return: 种子信息列表，如为None代表Rss过期
+        :param proxies: 代理
+        :param timeout: 请求超时时间（秒）
+        :param validator_key: 条件请求缓存的使用方标识，不同使用方互不影响，为空时不使用条件请求
+        :return: 请求结果，状态码为304时代表RSS自上次请求以来没有更新
         """
-        _special_title_sites = {
-            "pt.keepfrds.com": RssTitleUtils.keepfriends_title
+        if not validator_key:
+            return RequestUtils(proxies=proxies, timeout=timeout).get_res(url)
+        cache_key = RssHelper.__get_validator_cache_key(validator_key, url)
+        headers = {
+            "User-Agent": Config().get_ua()
         }
+        validator = RssValidatorCache.get(cache_key) or {}
+        if validator.get("etag"):
+            headers["If-None-Match"] = validator.get("etag")
+        if validator.get("last_modified"):
+            headers["If-Modified-Since"] = validator.get("last_modified")
+        ret = RequestUtils(headers=headers,
+                           proxies=proxies,
+                           timeout=timeout).get_res(url)
+        if ret is None:
+            return None
+        with RssHelper._validator_lock:
+            if ret.status_code == 304:
+                RssHelper._validator_statistics["hit"] += 1
+            else:
+                RssHelper._validator_statistics["miss"] += 1
+        if ret.status_code == 304:
+            log.debug(f"【RssHelper】{url} 没有更新")
+            validator["not_modified"] = True
+            RssValidatorCache.set(cache_key, validator)
+        elif ret.ok and (ret.headers.get("ETag") or ret.headers.get("Last-Modified")):
+            RssValidatorCache.set(cache_key, {
+                "etag": ret.headers.get("ETag"),
+                "last_modified": ret.headers.get("Last-Modified"),
+                "not_modified": False
+            })
+        else:
+            RssValidatorCache.delete(cache_key)
+        return ret
 
-        _rss_expired_msg = [
-            "RSS 链接已过期, 您需要获得一个新的!",
-            "RSS Link has expired, You need to get a new one!",
-        ]
+    @staticmethod
+    def is_rss_not_modified(validator_key, url):
+        """
+        最近一次条件请求是否返回了304（RSS没有更新）
+        """
+        validator = RssValidatorCache.get(RssHelper.__get_validator_cache_key(validator_key, url)) or {}
+        return True if validator.get("not_modified") else False
 
+    @staticmethod
+    def reset_rss_validator(validator_key, url=None):
+        """
+        清除条件请求缓存，下次请求时重新下载完整的RSS
+        :param validator_key: 条件请求缓存的使用方标识
+        :param url: RSS地址，为空时清除使用方标识以validator_key开头的全部缓存
+        """
+        if url:
+            RssValidatorCache.delete(RssHelper.__get_validator_cache_key(validator_key, url))
+        else:
+            RssValidatorCache.delete_many(lambda key: key.startswith(validator_key))
+
+    @staticmethod
+    def get_validator_statistics():
+        """
+        获取条件请求的命中统计
+        """
+        with RssHelper._validator_lock:
+            return dict(RssHelper._validator_statistics)
+
+    @staticmethod
+    def __get_validator_cache_key(validator_key, url):
+        return f"{validator_key}|{url}"
+
+    @staticmethod
+    def parse_rssxml(url, proxy=False, timeout=None, stop_func=None, validator_key=None):
+        """
+        解析RSS订阅URL，获取RSS中的种子信息
+        :param url: RSS地址
+        :param proxy: 是否使用代理
+        :param timeout: 请求超时时间（秒）
+        :param stop_func: 提前结束解析的判断函数，入参为种子信息，返回True时停止解析，该条及之后的种子不再返回
+        :param validator_key: 条件请求缓存的使用方标识，RSS没有更新时返回空列表
+        :return: 种子信息列表，如为None代表Rss过期
+        """
         # 开始处理
         ret_array = []
         if not url:
             return []
         site_domain = StringUtils.get_url_domain(url)
         try:
-            ret = RequestUtils(
-                proxies=Config().get_proxies() if proxy else None
-            ).get_res(url)
+            ret = RssHelper.request_rss(
+                url,
+                proxies=Config().get_proxies() if proxy else None,
+                timeout=timeout,
+                validator_key=validator_key
+            )
             if not ret:
                 return []
-            ret.encoding = ret.apparent_encoding
+            # RSS没有更新
+            if ret.status_code == 304:
+                return []
+            EncodingUtils.set_encoding(ret)
         except Exception as e2:
             ExceptionUtils.exception_traceback(e2)
             return []
         if ret:
             ret_xml = ret.text
             try:
-                # 解析XML
-                dom_tree = xml.dom.minidom.parseString(ret_xml)
-                rootNode = dom_tree.documentElement
-                items = rootNode.getElementsByTagName("item")
-                for item in items:
-                    try:
-                        # 标题
-                        title = DomUtils.tag_value(item, "title", default="")
-                        if not title:
-                            continue
-                        # 标题特殊处理
-                        if site_domain and site_domain in _special_title_sites:
-                            title = _special_title_sites.get(site_domain)(
-                                title
-                            )
-                        # 描述
-                        description = DomUtils.tag_value(
-                            item, "description", default=""
-                        )
-                        # 种子页面
-                        link = DomUtils.tag_value(item, "link", default="")
-                        # 种子链接
-                        enclosure = DomUtils.tag_value(
-                            item, "enclosure", "url", default=""
-                        )
-                        if not enclosure and not link:
-                            continue
-                        # 部分RSS只有link没有enclosure
-                        if not enclosure and link:
-                            enclosure = link
-                            link = None
-                        # 大小
-                        size = DomUtils.tag_value(
-                            item, "enclosure", "length", default=0
-                        )
-                        if size and str(size).isdigit():
-                            size = int(size)
-                        else:
-                            size = 0
-                        # 发布日期
-                        pubdate = DomUtils.tag_value(
-                            item, "pubDate", default=""
-                        )
-                        if pubdate:
-                            # 转换为时间
-                            pubdate = StringUtils.get_time_stamp(pubdate)
-                        # 返回对象
-                        tmp_dict = {
-                            "title": title,
-                            "enclosure": enclosure,
-                            "size": size,
-                            "description": description,
-                            "link": link,
-                            "pubdate": pubdate,
-                        }
-                        ret_array.append(tmp_dict)
-                    except Exception as e1:
-                        ExceptionUtils.exception_traceback(e1)
-                        continue
+                # 流式解析XML
+                for item in RssHelper.iter_rssxml(ret_xml, site_domain=site_domain):
+                    if stop_func and stop_func(item):
+                        break
+                    ret_array.append(item)
             except Exception as e2:
                 # RSS过期 观众RSS 链接已过期，您需要获得一个新的！  pthome RSS Link has expired, You need to get a new one!
-                if ret_xml in _rss_expired_msg:
+                if ret_xml in RssHelper._rss_expired_msg:
                     return None
                 ExceptionUtils.exception_traceback(e2)
         return ret_array
 
+    @staticmethod
+    def iter_rssxml(rss_xml, site_domain=None):
+        """
+        流式解析RSS报文，每解析完一个item即返回，不构建完整的DOM树
+        :param rss_xml: RSS报文
+        :param site_domain: 站点域名，用于标题特殊处理
+        :return: 种子信息生成器
+        """
+        if not rss_xml:
+            return
+        title_func = RssHelper._special_title_sites.get(site_domain) if site_domain else None
+        parser = ElementTree.XMLPullParser(events=("start", "end"))
+        # 当前item的父节点，处理完item后从父节点移除以释放内存
+        parents = []
+        for pos in range(0, len(rss_xml), RssHelper._feed_chunk_size):
+            parser.feed(rss_xml[pos:pos + RssHelper._feed_chunk_size])
+            for event, elem in parser.read_events():
+                if RssHelper.__local_name(elem.tag) != "item":
+                    if event == "start":
+                        parents.append(elem)
+                    elif parents and parents[-1] is elem:
+                        parents.pop()
+                    continue
+                if event != "end":
+                    continue
+                try:
+                    item = RssHelper.__parse_item(elem, title_func)
+                except Exception as e1:
+                    ExceptionUtils.exception_traceback(e1)
+                    item = None
+                if parents:
+                    parents[-1].remove(elem)
+                if item:
+                    yield item
+        parser.close()
+
+    @staticmethod
+    def __parse_item(item, title_func=None):
+        """
+        解析单个item节点
+        """
+        # 标题
+        title = RssHelper.__tag_value(item, "title", default="")
+        if not title:
+            return None
+        # 标题特殊处理
+        if title_func:
+            title = title_func(title)
+        # 描述
+        description = RssHelper.__tag_value(item, "description", default="")
+        # 种子页面
+        link = RssHelper.__tag_value(item, "link", default="")
+        # 种子链接
+        enclosure = RssHelper.__tag_value(item, "enclosure", "url", default="")
+        if not enclosure and not link:
+            return None
+        # 部分RSS只有link没有enclosure
+        if not enclosure and link:
+            enclosure = link
+            link = None
+        # 大小
+        size = RssHelper.__tag_value(item, "enclosure", "length", default=0)
+        if size and str(size).isdigit():
+            size = int(size)
+        else:
+            size = 0
+        # 发布日期
+        pubdate = RssHelper.__tag_value(item, "pubDate", default="")
+        if pubdate:
+            # 转换为时间
+            pubdate = StringUtils.get_time_stamp(pubdate)
+        # 返回对象
+        return {
+            "title": title,
+            "enclosure": enclosure,
+            "size": size,
+            "description": description,
+            "link": link,
+            "pubdate": pubdate,
+        }
+
+    @staticmethod
+    def __local_name(tag):
+        """
+        去掉标签的命名空间前缀，如{http://purl.org/rss/1.0/}item -> item
+        """
+        if not isinstance(tag, str):
+            return tag
+        return tag.rsplit("}", 1)[-1]
+
+    @staticmethod
+    def __tag_value(item, tag_name, attname="", default=None):
+        """
+        解析item下的标签值，按去掉命名空间后的标签名匹配
+        """
+        for tag in item.iter():
+            if tag is item or RssHelper.__local_name(tag.tag) != tag_name:
+                continue
+            if attname:
+                attvalue = tag.get(attname)
+                if attvalue:
+                    return attvalue
+            elif tag.text:
+                return tag.text
+            return default
+        return default
+
     @DbPersist(_db)
     def insert_rss_torrents(self, media_info):
         """
@@ -0,0 +1,124 @@
+import os
+import time
+from threading import Lock, BoundedSemaphore
+
+from app.utils.commons import singleton
+from app.utils.types import RmtMode
+from config import RMT_TRANSFER_LIMITS
+
+# 目的地为远程存储的转移方式
+REMOTE_RMT_MODES = [RmtMode.RCLONE, RmtMode.RCLONECOPY, RmtMode.MINIO, RmtMode.MINIOCOPY]
+
+
+@singleton
+class TransferHelper:
+    """
+    文件转移执行器，按转移方式及目的地设备分别限制并发，互不阻塞
+    """
+    _lock = Lock()
+    # (转移方式, 目的地) -> 信号量，不限制并发时为None
+    _semaphores = {}
+    # (转移方式, 目的地) -> 统计信息
+    _statistics = {}
+
+    def __init__(self):
+        self.init_config()
+
+    def init_config(self):
+        with self._lock:
+            self._semaphores = {}
+            self._statistics = {}
+
+    def execute(self, rmt_mode, file_item, target_file, func):
+        """
+        在对应的转移队列中执行转移操作
+        :param rmt_mode: RmtMode转移方式
+        :param file_item: 文件路径
+        :param target_file: 目标文件路径
+        :param func: 转移函数，参数为源和目的路径，返回(retcode, retmsg)
+        """
+        key = (rmt_mode, self.__get_destination(rmt_mode, target_file))
+        semaphore = self.__get_semaphore(key)
+        try:
+            file_size = os.path.getsize(file_item) if os.path.isfile(file_item) else 0
+        except OSError:
+            file_size = 0
+        self.__update_statistics(key, waiting=1)
+        if semaphore:
+            semaphore.acquire()
+        self.__update_statistics(key, waiting=-1, running=1)
+        start_time = time.time()
+        retcode, retmsg = -1, ""
+        try:
+            retcode, retmsg = func(file_item, target_file)
+        finally:
+            if semaphore:
+                semaphore.release()
+            self.__update_statistics(key,
+                                     running=-1,
+                                     completed=1 if retcode == 0 else 0,
+                                     failed=0 if retcode == 0 else 1,
+                                     size=file_size if retcode == 0 else 0,
+                                     seconds=time.time() - start_time)
+        return retcode, retmsg
+
+    @staticmethod
+    def __get_destination(rmt_mode, target_file):
+        """
+        获取目的地标识，本地转移使用目的路径所在设备号，远程转移共用一个队列
+        """
+        if rmt_mode in REMOTE_RMT_MODES:
+            return "remote"
+        path = os.path.dirname(os.path.normpath(target_file))
+        while path:
+            try:
+                return os.stat(path).st_dev
+            except OSError:
+                parent = os.path.dirname(path)
+                if parent == path:
+                    break
+                path = parent
+        return None
+
+    def __get_semaphore(self, key):
+        with self._lock:
+            if key not in self._semaphores:
+                limit = RMT_TRANSFER_LIMITS.get(key[0].name) or 0
+                self._semaphores[key] = BoundedSemaphore(limit) if limit > 0 else None
+            return self._semaphores[key]
+
+    def __update_statistics(self, key, waiting=0, running=0, completed=0, failed=0, size=0, seconds=0):
+        with self._lock:
+            statistic = self._statistics.setdefault(key, {
+                "waiting": 0,
+                "running": 0,
+                "completed": 0,
+                "failed": 0,
+                "size": 0,
+                "seconds": 0
+            })
+            statistic["waiting"] += waiting
+            statistic["running"] += running
+            statistic["completed"] += completed
+            statistic["failed"] += failed
+            statistic["size"] += size
+            statistic["seconds"] += seconds
+
+    def get_statistics(self):
+        """
+        获取各转移队列的排队数量及吞吐量
+        """
+        with self._lock:
+            statistics = []
+            for (rmt_mode, destination), statistic in self._statistics.items():
+                seconds = statistic.get("seconds")
+                statistics.append({
+                    "mode": rmt_mode.value,
+                    "destination": destination,
+                    "limit": RMT_TRANSFER_LIMITS.get(rmt_mode.name) or 0,
+                    **statistic,
+                    "seconds": round(seconds, 2),
+                    # 吞吐量（字节/秒）
+                    "throughput": round(statistic.get("size") / seconds) if seconds else 0
+                })
+            return statistics
@@ -1,7 +1,9 @@
 import regex as re
 import cn2an
 
+import log
 from app.helper.db_helper import DbHelper
+from app.utils.cache_manager import MetaInfoCache
 from app.utils.commons import singleton
 from app.utils.exception_utils import ExceptionUtils
 
@@ -11,6 +13,8 @@ class WordsHelper:
     dbhelper = None
     # 识别词
     words_info = []
+    # 预编译的识别词处理流水线
+    _pipeline = None
 
     def __init__(self):
         self.init_config()
@@ -18,8 +22,214 @@ class WordsHelper:
     def init_config(self):
         self.dbhelper = DbHelper()
         self.words_info = self.dbhelper.get_custom_words(enabled=1)
+        self._pipeline = CustomWordsPipeline(self.words_info)
+        # 识别词变化后清空识别缓存
+        MetaInfoCache.clear()
 
     def process(self, title):
+        """
+        应用自定义识别词
+        :param title: 标题
+        :return: 处理后的标题、错误信息、应用的识别词
+        """
+        return self._pipeline.process(title)
+
+    def is_custom_words_existed(self, replaced=None, front=None, back=None):
+        """
+        判断自定义词是否存在
+        """
+        return self.dbhelper.is_custom_words_existed(replaced=replaced,
+                                                     front=front,
+                                                     back=back)
+
+    def insert_custom_word(self, replaced, replace, front, back, offset, wtype, gid, season, enabled, regex, whelp,
+                           note=None):
+        """
+        插入自定义词
+        """
+        ret = self.dbhelper.insert_custom_word(replaced=replaced,
+                                               replace=replace,
+                                               front=front,
+                                               back=back,
+                                               offset=offset,
+                                               wtype=wtype,
+                                               gid=gid,
+                                               season=season,
+                                               enabled=enabled,
+                                               regex=regex,
+                                               whelp=whelp,
+                                               note=note)
+        self.init_config()
+        return ret
+
+    def delete_custom_word(self, wid=None):
+        """
+        删除自定义词
+        """
+        ret = self.dbhelper.delete_custom_word(wid=wid)
+        self.init_config()
+        return ret
+
+    def get_custom_words(self, wid=None, gid=None, enabled=None):
+        """
+        获取自定义词
+        """
+        return self.dbhelper.get_custom_words(wid=wid, gid=gid, enabled=enabled)
+
+    def get_custom_word_groups(self, gid=None, tmdbid=None, gtype=None):
+        """
+        获取自定义词组
+        """
+        return self.dbhelper.get_custom_word_groups(gid=gid, tmdbid=tmdbid, gtype=gtype)
+
+    def is_custom_word_group_existed(self, tmdbid=None, gtype=None):
+        """
+        判断自定义词组是否存在
+        """
+        return self.dbhelper.is_custom_word_group_existed(tmdbid=tmdbid, gtype=gtype)
+
+    def insert_custom_word_groups(self, title, year, gtype, tmdbid, season_count, note=None):
+        """
+        插入自定义词组
+        """
+        ret = self.dbhelper.insert_custom_word_groups(title=title,
+                                                      year=year,
+                                                      gtype=gtype,
+                                                      tmdbid=tmdbid,
+                                                      season_count=season_count,
+                                                      note=note)
+        self.init_config()
+        return ret
+
+    def delete_custom_word_group(self, gid):
+        """
+        删除自定义词组
+        """
+        ret = self.dbhelper.delete_custom_word_group(gid=gid)
+        self.init_config()
+        return ret
+
+    def check_custom_word(self, wid=None, enabled=None):
+        """
+        检查自定义词
+        """
+        ret = self.dbhelper.check_custom_word(wid=wid, enabled=enabled)
+        self.init_config()
+        return ret
+
+
+class CustomWordsPipeline:
+    """
+    预编译的自定义识别词处理流水线，识别词只在加载时编译及校验一次，
+    连续的非正则屏蔽词合并为一个正则预先判断，均未出现时整段跳过
+    """
+    # 替换串中的分组引用
+    _group_ref_re = re.compile(r"\\(\d+)|\\g<(\w+)>")
+
+    def __init__(self, words_info):
+        # 处理步骤，按识别词顺序执行
+        self._steps = []
+        # 加载时校验不通过的识别词及原因
+        self.errors = []
+        for word_info in words_info or []:
+            try:
+                step = self.__compile_word(word_info)
+            except Exception as err:
+                step = None
+                self.errors.append(f"自定义识别词 {word_info.REPLACED or ''}"
+                                   f"{word_info.FRONT or ''}{word_info.BACK or ''} 设置有误：{str(err)}")
+            if not step:
+                continue
+            # 合并连续的非正则屏蔽词
+            if step[0] == "ignore_plain" and self._steps and self._steps[-1][0] == "ignore_plain":
+                self._steps[-1][1].append(step[1][0])
+            else:
+                self._steps.append(step)
+        # 生成非正则屏蔽词的预判断正则，按长度倒序避免短词抢先匹配
+        for i, step in enumerate(self._steps):
+            if step[0] == "ignore_plain":
+                words = step[1]
+                prefilter_re = re.compile("|".join(re.escape(word) for word in
+                                                   sorted(set(words), key=len, reverse=True)))
+                self._steps[i] = ("ignore_plain", tuple(words), prefilter_re)
+        for error in self.errors:
+            log.warn("【Meta】%s" % error)
+
+    def __compile_word(self, word_info):
+        """
+        编译单个识别词为处理步骤
+        """
+        match word_info.TYPE:
+            case 1:
+                # 屏蔽
+                ignored = word_info.REPLACED
+                if not ignored:
+                    raise ValueError("屏蔽词为空")
+                if word_info.REGEX:
+                    return "ignore_regex", re.compile(r'%s' % ignored), ignored
+                return "ignore_plain", [ignored]
+            case 2:
+                # 替换
+                replaced, replace = word_info.REPLACED, word_info.REPLACE
+                replaced_word = f"{replaced} ⇒ {replace}"
+                if not replaced:
+                    raise ValueError("被替换词为空")
+                if word_info.REGEX:
+                    replaced_re = re.compile(r'%s' % replaced)
+                    self.__check_template(replaced_re, r'%s' % replace)
+                    return "replace_regex", replaced_re, r'%s' % replace, replaced_word
+                if replace is None:
+                    raise ValueError("替换词为空")
+                return "replace_plain", replaced, replace, replaced_word
+            case 3:
+                # 替换+集偏移
+                replaced, replace = word_info.REPLACED, word_info.REPLACE
+                replaced_word = f"{replaced} ⇒ {replace}"
+                offset_word = f"{word_info.FRONT} + {word_info.BACK} >> {word_info.OFFSET}"
+                replaced_re = re.compile(r'%s' % replaced)
+                self.__check_template(replaced_re, r'%s' % replace)
+                return "replace_offset", replaced_re, r'%s' % replace, \
+                    self.__compile_offset(word_info.FRONT, word_info.BACK, word_info.OFFSET), \
+                    replaced_word, offset_word
+            case 4:
+                # 集数偏移
+                offset_word = f"{word_info.FRONT} + {word_info.BACK} >> {word_info.OFFSET}"
+                return "offset", self.__compile_offset(word_info.FRONT, word_info.BACK, word_info.OFFSET), \
+                    offset_word
+            case _:
+                return None
+
+    def __check_template(self, pattern, template):
+        """
+        校验替换串中的分组引用是否存在
+        """
+        for num, name in self._group_ref_re.findall(template):
+            if num and int(num) > pattern.groups:
+                raise ValueError(f"invalid group reference {num}")
+            if name and not name.isdigit() and name not in pattern.groupindex:
+                raise ValueError(f"unknown group name {name}")
+            if name and name.isdigit() and int(name) > pattern.groups:
+                raise ValueError(f"invalid group reference {name}")
+
+    @staticmethod
+    def __compile_offset(front, back, offset):
+        """
+        编译集数偏移的前后定位词
+        """
+        if not offset:
+            raise ValueError("偏移量为空")
+        return (front,
+                back,
+                offset,
+                re.compile(r'%s' % front) if front else None,
+                re.compile(r'%s' % back) if back else None,
+                re.compile(r'(?<=%s.*?)[0-9一二三四五六七八九十]+(?=.*?%s)' % (front, back)))
+
+    def process(self, title):
+        """
+        按顺序应用识别词
+        :return: 处理后的标题、错误信息、应用的识别词
+        """
         # 错误信息
         msg = []
         # 应用屏蔽
@@ -28,44 +238,46 @@ class WordsHelper:
         used_replaced_words = []
         # 应用集偏移
         used_offset_words = []
-        # 应用识别词
-        for word_info in self.words_info:
-            match word_info.TYPE:
-                case 1:
-                    # 屏蔽
-                    ignored = word_info.REPLACED
-                    ignored_word = ignored
-                    title, ignore_msg, ignore_flag = self.replace_regex(title, ignored, "") \
-                        if word_info.REGEX else self.replace_noregex(title, ignored, "")
+        for step in self._steps:
+            match step[0]:
+                case "ignore_plain":
+                    _, words, prefilter_re = step
+                    # 所有屏蔽词均未出现
+                    if not prefilter_re.search(title):
+                        continue
+                    for word in words:
+                        if title.find(word) != -1:
+                            title = title.replace(word, "")
+                            used_ignored_words.append(word)
+                case "ignore_regex":
+                    _, ignored_re, ignored_word = step
+                    title, ignore_msg, ignore_flag = self.__replace_regex(title, ignored_re, "")
                     if ignore_flag:
                         used_ignored_words.append(ignored_word)
                     elif ignore_msg:
                         msg.append(f"自定义屏蔽词 {ignored_word} 设置有误：{ignore_msg}")
-                case 2:
-                    # 替换
-                    replaced, replace = word_info.REPLACED, word_info.REPLACE
-                    replaced_word = f"{replaced} ⇒ {replace}"
-                    title, replace_msg, replace_flag = self.replace_regex(title, replaced, replace) \
-                        if word_info.REGEX else self.replace_noregex(title, replaced, replace)
+                case "replace_regex":
+                    _, replaced_re, replace, replaced_word = step
+                    title, replace_msg, replace_flag = self.__replace_regex(title, replaced_re, replace)
                     if replace_flag:
                         used_replaced_words.append(replaced_word)
                     elif replace_msg:
                         msg.append(f"自定义替换词 {replaced_word} 格式有误：{replace_msg}")
-
-                case 3:
-                    # 替换+集偏移
-                    replaced, replace, front, back, offset = \
-                        word_info.REPLACED, word_info.REPLACE, word_info.FRONT, word_info.BACK, word_info.OFFSET
-                    replaced_word = f"{replaced} ⇒ {replace}"
-                    offset_word = f"{front} + {back} >> {offset}"
+                case "replace_plain":
+                    _, replaced, replace, replaced_word = step
+                    if title.find(replaced) != -1:
+                        title = title.replace(replaced, replace)
+                        used_replaced_words.append(replaced_word)
+                case "replace_offset":
+                    _, replaced_re, replace, offset_info, replaced_word, offset_word = step
                     replaced_offset_word = f"{replaced_word} @@@ {offset_word}"
                     # 记录替换前title
                     title_cache = title
                     # 替换
-                    title, replace_msg, replace_flag = self.replace_regex(title, replaced, replace)
+                    title, replace_msg, replace_flag = self.__replace_regex(title, replaced_re, replace)
                     # 替换应用成功进行集数偏移
                     if replace_flag:
-                        title, offset_msg, offset_flag = self.episode_offset(title, front, back, offset)
+                        title, offset_msg, offset_flag = self.__episode_offset(title, *offset_info)
                         # 集数偏移应用成功
                         if offset_flag:
                             used_replaced_words.append(replaced_word)
@@ -77,50 +289,32 @@ class WordsHelper:
                                 f"自定义替换+集偏移词 {replaced_offset_word} 集偏移部分格式有误：{offset_msg}")
                     elif replace_msg:
                         msg.append(f"自定义替换+集偏移词 {replaced_offset_word} 替换部分格式有误：{replace_msg}")
-                case 4:
-                    # 集数偏移
-                    front, back, offset = word_info.FRONT, word_info.BACK, word_info.OFFSET
-                    offset_word = f"{front} + {back} >> {offset}"
-                    title, offset_msg, offset_flag = self.episode_offset(title, front, back, offset)
+                case "offset":
+                    _, offset_info, offset_word = step
+                    title, offset_msg, offset_flag = self.__episode_offset(title, *offset_info)
                     if offset_flag:
                         used_offset_words.append(offset_word)
                     elif offset_msg:
                         msg.append(f"自定义集偏移词 {offset_word} 格式有误：{offset_msg}")
-                case _:
-                    pass
         return title, msg, {"ignored": used_ignored_words, "replaced": used_replaced_words, "offset": used_offset_words}
 
     @staticmethod
-    def replace_regex(title, replaced, replace) -> (str, str, bool):
+    def __replace_regex(title, replaced_re, replace) -> (str, str, bool):
         try:
-            if not re.findall(r'%s' % replaced, title):
-                return title, "", False
-            else:
-                return re.sub(r'%s' % replaced, r'%s' % replace, title), "", True
+            title, count = replaced_re.subn(replace, title)
+            return title, "", count > 0
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
             return title, str(err), False
 
     @staticmethod
-    def replace_noregex(title, replaced, replace) -> (str, str, bool):
+    def __episode_offset(title, front, back, offset, front_re, back_re, offset_word_info_re) -> (str, str, bool):
         try:
-            if title.find(replaced) == -1:
+            if back_re and not back_re.search(title):
                 return title, "", False
-            else:
-                return title.replace(replaced, replace), "", True
-        except Exception as err:
-            ExceptionUtils.exception_traceback(err)
-            return title, str(err), False
-
-    @staticmethod
-    def episode_offset(title, front, back, offset) -> (str, str, bool):
-        try:
-            if back and not re.findall(r'%s' % back, title):
-                return title, "", False
-            if front and not re.findall(r'%s' % front, title):
+            if front_re and not front_re.search(title):
                 return title, "", False
-            offset_word_info_re = re.compile(r'(?<=%s.*?)[0-9一二三四五六七八九十]+(?=.*?%s)' % (front, back))
-            episode_nums_str = re.findall(offset_word_info_re, title)
+            episode_nums_str = offset_word_info_re.findall(title)
             if not episode_nums_str:
                 return title, "", False
             episode_nums_offset_str = []
@@ -160,86 +354,3 @@ class WordsHelper:
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
             return title, str(err), False
-
-    def is_custom_words_existed(self, replaced=None, front=None, back=None):
-        """
-        判断自定义词是否存在
-        """
-        return self.dbhelper.is_custom_words_existed(replaced=replaced,
-                                                     front=front,
-                                                     back=back)
-
-    def insert_custom_word(self, replaced, replace, front, back, offset, wtype, gid, season, enabled, regex, whelp,
-                           note=None):
-        """
-        插入自定义词
-        """
-        ret = self.dbhelper.insert_custom_word(replaced=replaced,
-                                               replace=replace,
-                                               front=front,
-                                               back=back,
-                                               offset=offset,
-                                               wtype=wtype,
-                                               gid=gid,
-                                               season=season,
-                                               enabled=enabled,
-                                               regex=regex,
-                                               whelp=whelp,
-                                               note=note)
-        self.init_config()
-        return ret
-
-    def delete_custom_word(self, wid=None):
-        """
-        删除自定义词
-        """
-        ret = self.dbhelper.delete_custom_word(wid=wid)
-        self.init_config()
-        return ret
-
-    def get_custom_words(self, wid=None, gid=None, enabled=None):
-        """
-        获取自定义词
-        """
-        return self.dbhelper.get_custom_words(wid=wid, gid=gid, enabled=enabled)
-
-    def get_custom_word_groups(self, gid=None, tmdbid=None, gtype=None):
-        """
-        获取自定义词组
-        """
-        return self.dbhelper.get_custom_word_groups(gid=gid, tmdbid=tmdbid, gtype=gtype)
-
-    def is_custom_word_group_existed(self, tmdbid=None, gtype=None):
-        """
-        判断自定义词组是否存在
-        """
-        return self.dbhelper.is_custom_word_group_existed(tmdbid=tmdbid, gtype=gtype)
-
-    def insert_custom_word_groups(self, title, year, gtype, tmdbid, season_count, note=None):
-        """
-        插入自定义词组
-        """
-        ret = self.dbhelper.insert_custom_word_groups(title=title,
-                                                      year=year,
-                                                      gtype=gtype,
-                                                      tmdbid=tmdbid,
-                                                      season_count=season_count,
-                                                      note=note)
-        self.init_config()
-        return ret
-
-    def delete_custom_word_group(self, gid):
-        """
-        删除自定义词组
-        """
-        ret = self.dbhelper.delete_custom_word_group(gid=gid)
-        self.init_config()
-        return ret
-
-    def check_custom_word(self, wid=None, enabled=None):
-        """
-        检查自定义词
-        """
-        ret = self.dbhelper.check_custom_word(wid=wid, enabled=enabled)
-        self.init_config()
-        return ret
@@ -1,12 +1,15 @@
 import datetime
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import log
 from app.filter import Filter
 from app.helper import ProgressHelper
 from app.media import Media
 from app.media.meta import MetaInfo
+from app.utils import ExceptionUtils
 from app.utils.types import MediaType, SearchType, ProgressKey
+from config import MEDIA_RECOGNIZE_THREAD_NUM
 
 
 class _IIndexClient(metaclass=ABCMeta):
@@ -60,7 +63,8 @@ class _IIndexClient(metaclass=ABCMeta):
                key_word,
                filter_args: dict,
                match_media,
-               in_from: SearchType):
+               in_from: SearchType,
+               refresh=False):
         """
         根据关键字多线程搜索
         """
@@ -80,6 +84,8 @@ class _IIndexClient(metaclass=ABCMeta):
         index_rule_fail = 0
         index_match_fail = 0
         index_error = 0
+        # 第一轮：识别种子名称并按规则过滤，不访问TMDB
+        candidates = []
         for item in result_array:
             # 名称
             torrent_name = item.get('title')
@@ -88,11 +94,7 @@ class _IIndexClient(metaclass=ABCMeta):
             if not torrent_name:
                 index_error += 1
                 continue
-            enclosure = item.get('enclosure')
-            size = item.get('size')
             seeders = item.get('seeders')
-            peers = item.get('peers')
-            page_url = item.get('page_url')
             uploadvolumefactor = round(float(item.get('uploadvolumefactor')), 1) if item.get(
                 'uploadvolumefactor') is not None else 1.0
             downloadvolumefactor = round(float(item.get('downloadvolumefactor')), 1) if item.get(
@@ -111,7 +113,7 @@ class _IIndexClient(metaclass=ABCMeta):
                 index_match_fail += 1
                 continue
             # 大小及促销等
-            meta_info.set_torrent_info(size=size,
+            meta_info.set_torrent_info(size=item.get('size'),
                                        imdbid=imdbid,
                                        upload_volume_factor=uploadvolumefactor,
                                        download_volume_factor=downloadvolumefactor,
@@ -134,46 +136,67 @@ class _IIndexClient(metaclass=ABCMeta):
                 log.info(f"【{self.client_name}】{match_msg}")
                 index_rule_fail += 1
                 continue
+            # 是否需要重新识别媒体信息：IMDBID及缓存均未匹配时
+            need_recognize = False
+            if match_media \
+                    and not (meta_info.imdb_id
+                             and match_media.imdb_id
+                             and str(meta_info.imdb_id) == str(match_media.imdb_id)):
+                cache_info = self.media.get_cache_info(meta_info)
+                need_recognize = str(cache_info.get("id")) != str(match_media.tmdb_id)
+            candidates.append((item, meta_info, res_order, need_recognize))
+
+        # 第二轮：相同名称去重后并发识别媒体信息，整页只需一轮TMDB查询耗时
+        recognized = self.__recognize_medias({
+            (item.get('title'), item.get('description'))
+            for item, _, _, need_recognize in candidates if need_recognize
+        })
+
+        # 第三轮：匹配媒体信息及季集
+        for item, meta_info, res_order, need_recognize in candidates:
+            torrent_name = item.get('title')
+            description = item.get('description')
+            enclosure = item.get('enclosure')
+            size = item.get('size')
+            seeders = item.get('seeders')
+            peers = item.get('peers')
+            page_url = item.get('page_url')
+            uploadvolumefactor = meta_info.upload_volume_factor
+            downloadvolumefactor = meta_info.download_volume_factor
             # 识别媒体信息
             if not match_media:
                 # 不过滤
                 media_info = meta_info
             else:
                 # 0-识别并模糊匹配；1-识别并精确匹配
-                if meta_info.imdb_id \
-                        and match_media.imdb_id \
-                        and str(meta_info.imdb_id) == str(match_media.imdb_id):
-                    # IMDBID匹配，合并媒体数据
+                if not need_recognize:
+                    # IMDBID或缓存匹配，合并媒体数据
                     media_info = self.media.merge_media_info(meta_info, match_media)
                 else:
-                    # 查询缓存
-                    cache_info = self.media.get_cache_info(meta_info)
-                    if match_media \
-                            and str(cache_info.get("id")) == str(match_media.tmdb_id):
-                        # 缓存匹配，合并媒体数据
-                        media_info = self.media.merge_media_info(meta_info, match_media)
+                    # 重新识别，同名资源首次使用预先识别的结果，之后命中识别缓存
+                    if (torrent_name, description) in recognized:
+                        media_info = recognized.pop((torrent_name, description))
                     else:
-                        # 重新识别
                         media_info = self.media.get_media_info(title=torrent_name, subtitle=description, chinese=False)
-                        if not media_info:
-                            log.warn(f"【{self.client_name}】{torrent_name} 识别媒体信息出错！")
-                            index_error += 1
-                            continue
-                        elif not media_info.tmdb_info:
-                            log.info(
-                                f"【{self.client_name}】{torrent_name} 识别为 {media_info.get_name()} 未匹配到媒体信息")
-                            index_match_fail += 1
-                            continue
-                        # TMDBID是否匹配
-                        if str(media_info.tmdb_id) != str(match_media.tmdb_id):
-                            log.info(
-                                f"【{self.client_name}】{torrent_name} 识别为 "
-                                f"{media_info.type.value}/{media_info.get_title_string()}/{media_info.tmdb_id} "
-                                f"与 {match_media.type.value}/{match_media.get_title_string()}/{match_media.tmdb_id} 不匹配")
-                            index_match_fail += 1
-                            continue
-                        # 合并媒体数据
-                        media_info = self.media.merge_media_info(media_info, match_media)
+                    if not media_info:
+                        log.warn(f"【{self.client_name}】{torrent_name} 识别媒体信息出错！")
+                        index_error += 1
+                        continue
+                    elif not media_info.tmdb_info:
+                        log.info(
+                            f"【{self.client_name}】{torrent_name} 识别为 {media_info.get_name()} 未匹配到媒体信息")
+                        index_match_fail += 1
+                        continue
+                    # TMDBID是否匹配
+                    if str(media_info.tmdb_id) != str(match_media.tmdb_id):
+                        log.info(
+                            f"【{self.client_name}】{torrent_name} 识别为 "
+                            f"{media_info.type.value}/{media_info.get_title_string()}/{media_info.tmdb_id} "
+                            f"与 {match_media.type.value}/{match_media.get_title_string()}/{match_media.tmdb_id} 不匹配")
+                        index_match_fail += 1
+                        continue
+                    # 合并媒体数据
+                    media_info = self.media.merge_media_info(media_info, match_media)
                 # 过滤类型
                 if filter_args.get("type"):
                     if (filter_args.get("type") == MediaType.TV and media_info.type == MediaType.MOVIE) \
@@ -253,3 +276,32 @@ class _IIndexClient(metaclass=ABCMeta):
                                   f"有效 {index_sucess}，"
                                   f"耗时 {(end_time - start_time).seconds} 秒")
         return ret_array
+
+    def __recognize_medias(self, names):
+        """
+        并发识别多个种子名称的媒体信息
+        :param names: (种子名称, 描述)集合
+        :return: (种子名称, 描述) -> 媒体信息
+        """
+        if not names:
+            return {}
+        if len(names) == 1:
+            torrent_name, description = next(iter(names))
+            return {(torrent_name, description): self.media.get_media_info(title=torrent_name,
+                                                                           subtitle=description,
+                                                                           chinese=False)}
+        recognized = {}
+        with ThreadPoolExecutor(max_workers=min(len(names), MEDIA_RECOGNIZE_THREAD_NUM)) as executor:
+            all_task = {
+                executor.submit(self.media.get_media_info,
+                                title=torrent_name,
+                                subtitle=description,
+                                chinese=False): (torrent_name, description)
+                for torrent_name, description in names
+            }
+            for future in as_completed(all_task):
+                try:
+                    recognized[all_task[future]] = future.result()
+                except Exception as err:
+                    ExceptionUtils.exception_traceback(err)
+        return recognized
@@ -1,6 +1,7 @@
 import copy
 import datetime
 import re
+import threading
 from urllib.parse import quote
 
 from jinja2 import Template
@@ -47,6 +48,8 @@ class TorrentSpider(feapder.AirSpider):
     )
     # 是否搜索完成标志
     is_complete = False
+    # 搜索完成事件
+    complete_event = None
     # 是否出现错误
     is_error = False
     # 索引器ID
@@ -132,6 +135,33 @@ class TorrentSpider(feapder.AirSpider):
             self.referer = referer
         self.result_num = Config().get_config('pt').get('site_search_result_num') or 100
         self.torrents_info_array = []
+        self.complete_event = threading.Event()
+
+    def set_complete(self):
+        """
+        标记搜索完成并通知等待方
+        """
+        self.is_complete = True
+        if self.complete_event:
+            self.complete_event.set()
+
+    def wait_complete(self, timeout=None):
+        """
+        等待搜索完成
+        :param timeout: 超时时间（秒）
+        :return: 是否在超时前完成
+        """
+        if not self.complete_event:
+            return self.is_complete
+        return self.complete_event.wait(timeout)
+
+    def end_callback(self):
+        """
+        爬虫结束时如仍未完成解析，说明请求失败
+        """
+        if not self.is_complete:
+            self.is_error = True
+            self.set_complete()
 
     def start_requests(self):
         """
@@ -139,7 +169,7 @@ class TorrentSpider(feapder.AirSpider):
         """
 
         if not self.search or not self.domain:
-            self.is_complete = True
+            self.set_complete()
             return
 
         # 种子搜索相对路径
@@ -635,7 +665,7 @@ class TorrentSpider(feapder.AirSpider):
             html_text = response.extract()
             if not html_text:
                 self.is_error = True
-                self.is_complete = True
+                self.set_complete()
                 return
             # 解析站点文本对象
             html_doc = PyQuery(html_text)
@@ -652,4 +682,4 @@ class TorrentSpider(feapder.AirSpider):
             ExceptionUtils.exception_traceback(err)
             log.warn(f"【Spider】错误：{self.indexername} {str(err)}")
         finally:
-            self.is_complete = True
+            self.set_complete()
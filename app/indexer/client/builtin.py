@@ -1,6 +1,6 @@
 import copy
 import datetime
-import time
+import threading
 
 import log
 from app.conf import SystemConfig
@@ -12,7 +12,8 @@ from app.indexer.client._spider import TorrentSpider
 from app.indexer.client._tnode import TNodeSpider
 from app.indexer.client._torrentleech import TorrentLeech
 from app.sites import Sites
-from app.utils import StringUtils
+from app.utils import StringUtils, SearchResultCache
+from app.utils.commons import SingleFlight
 from app.utils.types import SearchType, IndexerType, ProgressKey, SystemConfigKey
 from config import Config
 
@@ -31,6 +32,11 @@ class BuiltinIndexer(_IIndexClient):
     progress = None
     sites = None
     dbhelper = None
+    # 搜索结果缓存命中统计
+    _cache_lock = threading.Lock()
+    _cache_statistics = {"hit": 0, "miss": 0}
+    # 合并相同站点及关键字的并发搜索
+    _search_flight = SingleFlight()
 
     def __init__(self, config=None):
         super().__init__()
@@ -109,16 +115,15 @@ class BuiltinIndexer(_IIndexClient):
                key_word,
                filter_args: dict,
                match_media,
-               in_from: SearchType):
+               in_from: SearchType,
+               refresh=False):
         """
         根据关键字多线程搜索
+        :param refresh: 是否忽略缓存强制刷新
+        :return: 命中的资源媒体信息列表，站点触发流控或搜索出错时返回None
         """
         if not indexer or not key_word:
             return None
-        # 站点流控
-        if self.sites.check_ratelimit(indexer.siteid):
-            self.progress.update(ptype=ProgressKey.Search, text=f"{indexer.name} 触发站点流控，跳过 ...")
-            return []
         # fix 共用同一个dict时会导致某个站点的更新全局全效
         if filter_args is None:
             _filter_args = {}
@@ -142,6 +147,58 @@ class BuiltinIndexer(_IIndexClient):
         if indexer.language == "en" and StringUtils.is_chinese(search_word):
             log.warn(f"【{self.client_name}】{indexer.name} 无法使用中文名搜索")
             return []
+        mtype = match_media.type if match_media and match_media.tmdb_info else None
+        imdb_id = match_media.imdb_id if match_media else None
+        # 优先使用缓存的搜索结果
+        cache_key = self.__get_cache_key(indexer=indexer,
+                                         keyword=search_word,
+                                         mtype=mtype if indexer.parser not in ["TNodeSpider", "RarBg",
+                                                                               "TorrentLeech"] else None,
+                                         imdb_id=imdb_id if indexer.parser == "RarBg" else None)
+        result_array = None if refresh else self.__get_cache(cache_key)
+        if result_array is not None:
+            log.info(f"【{self.client_name}】{indexer.name} 使用缓存的搜索结果")
+        else:
+            # 相同站点及关键字的并发搜索只请求一次站点
+            result_array = self._search_flight.do(cache_key,
+                                                  self.__fetch_results,
+                                                  indexer=indexer,
+                                                  search_word=search_word,
+                                                  mtype=mtype,
+                                                  imdb_id=imdb_id,
+                                                  cache_key=cache_key)
+            if result_array is None:
+                self.progress.update(ptype=ProgressKey.Search, text=f"{indexer.name} 未返回结果，跳过 ...")
+                return None
+            result_array = list(result_array)
+        # 返回结果
+        if len(result_array) == 0:
+            log.warn(f"【{self.client_name}】{indexer.name} 未搜索到数据")
+            # 更新进度
+            self.progress.update(ptype=ProgressKey.Search, text=f"{indexer.name} 未搜索到数据")
+            return []
+        else:
+            log.warn(f"【{self.client_name}】{indexer.name} 返回数据：{len(result_array)}")
+            # 更新进度
+            self.progress.update(ptype=ProgressKey.Search, text=f"{indexer.name} 返回 {len(result_array)} 条数据")
+            # 过滤
+            return self.filter_search_results(result_array=result_array,
+                                              order_seq=order_seq,
+                                              indexer=indexer,
+                                              filter_args=_filter_args,
+                                              match_media=match_media,
+                                              start_time=start_time)
+
+    def __fetch_results(self, indexer, search_word, mtype, imdb_id, cache_key):
+        """
+        请求站点搜索并缓存结果
+        :return: 种子列表，触发站点流控或搜索出错时返回None
+        """
+        # 站点流控
+        if self.sites.check_ratelimit(indexer.siteid):
+            return None
+        # 计算耗时
+        start_time = datetime.datetime.now()
         # 开始索引
         result_array = []
         try:
@@ -150,18 +207,18 @@ class BuiltinIndexer(_IIndexClient):
             elif indexer.parser == "RarBg":
                 error_flag, result_array = Rarbg(indexer).search(
                     keyword=search_word,
-                    imdb_id=match_media.imdb_id if match_media else None)
+                    imdb_id=imdb_id)
             elif indexer.parser == "RenderSpider":
                 error_flag, result_array = RenderSpider(indexer).search(
                     keyword=search_word,
-                    mtype=match_media.type if match_media and match_media.tmdb_info else None)
+                    mtype=mtype)
             elif indexer.parser == "TorrentLeech":
                 error_flag, result_array = TorrentLeech(indexer).search(keyword=search_word)
             else:
                 error_flag, result_array = self.__spider_search(
                     keyword=search_word,
                     indexer=indexer,
-                    mtype=match_media.type if match_media and match_media.tmdb_info else None)
+                    mtype=mtype)
         except Exception as err:
             error_flag = True
             print(str(err))
@@ -173,27 +230,15 @@ class BuiltinIndexer(_IIndexClient):
                                                 itype=self.client_id,
                                                 seconds=seconds,
                                                 result='N' if error_flag else 'Y')
-        # 返回结果
-        if len(result_array) == 0:
-            log.warn(f"【{self.client_name}】{indexer.name} 未搜索到数据")
-            # 更新进度
-            self.progress.update(ptype=ProgressKey.Search, text=f"{indexer.name} 未搜索到数据")
-            return []
-        else:
-            log.warn(f"【{self.client_name}】{indexer.name} 返回数据：{len(result_array)}")
-            # 更新进度
-            self.progress.update(ptype=ProgressKey.Search, text=f"{indexer.name} 返回 {len(result_array)} 条数据")
-            # 过滤
-            return self.filter_search_results(result_array=result_array,
-                                              order_seq=order_seq,
-                                              indexer=indexer,
-                                              filter_args=_filter_args,
-                                              match_media=match_media,
-                                              start_time=start_time)
+        if error_flag:
+            return None
+        self.__set_cache(cache_key, result_array)
+        return result_array or []
 
-    def list(self, index_id, page=0, keyword=None):
+    def list(self, index_id, page=0, keyword=None, refresh=False):
         """
         根据站点ID搜索站点首页资源
+        :param refresh: 是否忽略缓存强制刷新
         """
         if not index_id:
             return []
@@ -201,6 +246,12 @@ class BuiltinIndexer(_IIndexClient):
         if not indexer:
             return []
 
+        # 优先使用缓存的结果
+        cache_key = self.__get_cache_key(indexer=indexer, keyword=keyword, page=page)
+        result_array = None if refresh else self.__get_cache(cache_key)
+        if result_array is not None:
+            return result_array
+
         # 计算耗时
         start_time = datetime.datetime.now()
 
@@ -228,17 +279,56 @@ class BuiltinIndexer(_IIndexClient):
                                                 itype=self.client_id,
                                                 seconds=seconds,
                                                 result='N' if error_flag else 'Y')
+        if not error_flag:
+            self.__set_cache(cache_key, result_array)
         return result_array
 
     @staticmethod
-    def __spider_search(indexer, keyword=None, page=None, mtype=None, timeout=30):
+    def __get_cache_key(indexer, keyword=None, page=None, mtype=None, imdb_id=None):
+        """
+        生成搜索结果缓存键：站点、规范化的关键字、页码、媒体类型、IMDBID
+        """
+        if isinstance(keyword, list):
+            keyword = "|".join(keyword)
+        keyword = " ".join(str(keyword or "").lower().split())
+        return "%s|%s|%s|%s|%s|%s" % (indexer.id,
+                                      indexer.parser,
+                                      keyword,
+                                      page or 0,
+                                      mtype.value if mtype else "",
+                                      imdb_id or "")
+
+    @classmethod
+    def __get_cache(cls, cache_key):
+        result_array = SearchResultCache.get(cache_key)
+        with cls._cache_lock:
+            if result_array is None:
+                cls._cache_statistics["miss"] += 1
+                return None
+            cls._cache_statistics["hit"] += 1
+        return list(result_array)
+
+    @staticmethod
+    def __set_cache(cache_key, result_array):
+        SearchResultCache.set(cache_key, list(result_array or []))
+
+    @classmethod
+    def get_cache_statistics(cls):
+        """
+        获取搜索结果缓存命中统计
+        """
+        with cls._cache_lock:
+            return dict(cls._cache_statistics)
+
+    @staticmethod
+    def __spider_search(indexer, keyword=None, page=None, mtype=None, timeout=None):
         """
         根据关键字搜索单个站点
         :param: indexer: 站点配置
         :param: keyword: 关键字
         :param: page: 页码
         :param: mtype: 媒体类型
-        :param: timeout: 超时时间
+        :param: timeout: 超时时间，为空时使用站点配置的超时时间
         :return: 是否发生错误, 种子列表
         """
         spider = TorrentSpider()
@@ -247,13 +337,11 @@ class BuiltinIndexer(_IIndexClient):
                         page=page,
                         mtype=mtype)
         spider.start()
-        # 循环判断是否获取到数据
-        sleep_count = 0
-        while not spider.is_complete:
-            sleep_count += 1
-            time.sleep(1)
-            if sleep_count > timeout:
-                break
+        # 等待解析完成
+        if not spider.wait_complete(timeout or indexer.timeout):
+            log.warn(f"【{BuiltinIndexer.client_name}】{indexer.name} 搜索超时")
+            # 终止爬虫，释放线程
+            spider.stop_spider()
         # 是否发生错误
         result_flag = spider.is_error
         # 种子列表
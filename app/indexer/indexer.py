@@ -1,12 +1,15 @@
 import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError, Future
 
 import log
 from app.helper import ProgressHelper, SubmoduleHelper, DbHelper
 from app.utils import ExceptionUtils, StringUtils
 from app.utils.commons import singleton
 from app.utils.types import SearchType, IndexerType, ProgressKey
-from config import Config
+from config import Config, INDEXER_SEARCH_DEADLINE, INDEXER_SEARCH_THREAD_NUM, INDEXER_SITE_THREAD_NUM
 
 
 @singleton
@@ -16,8 +19,21 @@ class Indexer(object):
     _client_type = None
     progress = None
     dbhelper = None
+    # 全局共享的搜索线程池，线程数即为全局并发上限
+    _executor = None
+    _lock = threading.Lock()
+    # 站点ID -> 正在执行的搜索数
+    _site_running = {}
+    # 站点ID -> 等待执行的搜索任务队列，站点并发已满时在此排队，不占用线程池
+    _site_queues = {}
+    # 合并键 -> 进行中的搜索任务
+    _pending_tasks = {}
+    # 站点名称 -> 排队等待统计，site为站点并发排队，pool为线程池排队
+    _wait_statistics = {}
 
     def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=INDEXER_SEARCH_THREAD_NUM,
+                                            thread_name_prefix="IndexerSearch")
         self._indexer_schemas = SubmoduleHelper.import_submodules(
             'app.indexer.client',
             filter_func=lambda _, obj: hasattr(obj, 'client_id')
@@ -81,14 +97,15 @@ class Indexer(object):
         """
         return [indexer.name for indexer in self.get_indexers(check=True)]
 
-    def list_resources(self, index_id, page=0, keyword=None):
+    def list_resources(self, index_id, page=0, keyword=None, refresh=False):
         """
         获取内置索引器的资源列表
         :param index_id: 内置站点ID
         :param page: 页码
         :param keyword: 搜索关键字
+        :param refresh: 是否忽略缓存强制刷新
         """
-        return self._client.list(index_id=index_id, page=page, keyword=keyword)
+        return self._client.list(index_id=index_id, page=page, keyword=keyword, refresh=refresh)
 
     def __get_client(self, ctype: [IndexerType, str], conf=None):
         return self.__build_class(ctype=ctype, conf=conf)
@@ -109,7 +126,10 @@ class Indexer(object):
                           key_word: [str, list],
                           filter_args: dict,
                           match_media=None,
-                          in_from: SearchType = None):
+                          in_from: SearchType = None,
+                          callback=None,
+                          timeout=None,
+                          refresh=False):
         """
         根据关键字调用 Index API 搜索
         :param key_word: 搜索的关键字，不能为空
@@ -118,15 +138,47 @@ class Indexer(object):
                             sp_state: 为UL DL，* 代表不关心，
         :param match_media: 需要匹配的媒体信息
         :param in_from: 搜索渠道
+        :param callback: 单个站点返回结果时的回调，参数为站点配置及该站点命中的资源媒体信息列表
+        :param timeout: 整体搜索超时时间（秒），超时后返回已完成站点的结果
+        :param refresh: 是否忽略搜索结果缓存
         :return: 命中的资源媒体信息列表
         """
+        ret_array = []
+        for indexer, result in self.iter_search_by_keyword(key_word=key_word,
+                                                           filter_args=filter_args,
+                                                           match_media=match_media,
+                                                           in_from=in_from,
+                                                           timeout=timeout,
+                                                           refresh=refresh):
+            if callback:
+                callback(indexer, result)
+            ret_array = ret_array + result
+        return ret_array
+
+    def iter_search_by_keyword(self,
+                               key_word: [str, list],
+                               filter_args: dict,
+                               match_media=None,
+                               in_from: SearchType = None,
+                               timeout=None,
+                               refresh=False):
+        """
+        根据关键字调用 Index API 搜索，每个站点完成后立即返回该站点的结果
+        :param key_word: 搜索的关键字，不能为空
+        :param filter_args: 过滤条件
+        :param match_media: 需要匹配的媒体信息
+        :param in_from: 搜索渠道
+        :param timeout: 整体搜索超时时间（秒），超时后不再等待未完成的站点
+        :param refresh: 是否忽略搜索结果缓存
+        :return: 生成器，依次产出(站点配置, 命中的资源媒体信息列表)，未返回结果的站点不产出
+        """
         if not key_word:
-            return []
+            return
 
         indexers = self.get_indexers(check=True)
         if not indexers:
             log.error("没有配置索引器，无法搜索！")
-            return []
+            return
         # 计算耗时
         start_time = datetime.datetime.now()
         if filter_args and filter_args.get("site"):
@@ -137,37 +189,149 @@ class Indexer(object):
             log.info(f"【{self._client_type.value}】开始并行搜索 %s，线程数：%s ..." % (key_word, len(indexers)))
             self.progress.update(ptype=ProgressKey.Search,
                                  text="开始并行搜索 %s，线程数：%s ..." % (key_word, len(indexers)))
-        # 多线程
-        executor = ThreadPoolExecutor(max_workers=len(indexers))
-        all_task = []
+        # 提交到全局线程池，相同站点及搜索条件的任务合并
+        all_task = {}
         for index in indexers:
-            order_seq = 100 - int(index.pri)
-            task = executor.submit(self._client.search,
-                                   order_seq,
-                                   index,
-                                   key_word,
-                                   filter_args,
-                                   match_media,
-                                   in_from)
-            all_task.append(task)
-        ret_array = []
+            task = self.__submit_search(index=index,
+                                        key_word=key_word,
+                                        filter_args=filter_args,
+                                        match_media=match_media,
+                                        in_from=in_from,
+                                        refresh=refresh)
+            all_task[task] = index
+        result_count = 0
         finish_count = 0
-        for future in as_completed(all_task):
-            result = future.result()
-            finish_count += 1
-            self.progress.update(ptype=ProgressKey.Search,
-                                 value=round(100 * (finish_count / len(all_task))))
-            if result:
-                ret_array = ret_array + result
+        try:
+            for future in as_completed(all_task, timeout=timeout or INDEXER_SEARCH_DEADLINE):
+                result = future.result()
+                finish_count += 1
+                result_count += len(result or [])
+                self.progress.update(ptype=ProgressKey.Search,
+                                     text="已完成 %s/%s 个站点，有效资源数：%s"
+                                          % (finish_count, len(all_task), result_count),
+                                     value=round(100 * (finish_count / len(all_task))))
+                # 站点流控或出错，没有返回结果
+                if result is None:
+                    continue
+                yield all_task[future], list(result)
+        except TimeoutError:
+            log.warn(f"【{self._client_type.value}】搜索超时，"
+                     f"{len(all_task) - finish_count} 个站点未返回结果")
         # 计算耗时
         end_time = datetime.datetime.now()
         log.info(f"【{self._client_type.value}】所有站点搜索完成，有效资源数：%s，总耗时 %s 秒"
-                 % (len(ret_array), (end_time - start_time).seconds))
+                 % (result_count, (end_time - start_time).seconds))
+        # 排队等待情况
+        wait_statistics = self.get_wait_statistics()
+        for index in indexers:
+            statistics = wait_statistics.get(index.name)
+            if not statistics:
+                continue
+            site_wait, pool_wait = statistics.get("site") or {}, statistics.get("pool") or {}
+            log.debug(f"【{self._client_type.value}】{index.name} 累计搜索 {site_wait.get('count')} 次，"
+                      f"等待站点并发平均 {site_wait.get('avg')} 秒、最长 {site_wait.get('max')} 秒，"
+                      f"等待线程池平均 {pool_wait.get('avg')} 秒、最长 {pool_wait.get('max')} 秒")
         self.progress.update(ptype=ProgressKey.Search,
                              text="所有站点搜索完成，有效资源数：%s，总耗时 %s 秒"
-                                  % (len(ret_array), (end_time - start_time).seconds),
+                                  % (result_count, (end_time - start_time).seconds),
                              value=100)
-        return ret_array
+
+    def __submit_search(self, index, key_word, filter_args, match_media, in_from, refresh=False):
+        """
+        提交单个站点的搜索任务，如已有相同站点及搜索条件的任务在排队或执行中，则直接复用
+        """
+        coalesce_key = (index.id,
+                        str(key_word),
+                        str(sorted((filter_args or {}).items(), key=lambda x: x[0])),
+                        (match_media.tmdb_id, match_media.type, match_media.get_title_string())
+                        if match_media else None,
+                        in_from)
+        with self._lock:
+            task = self._pending_tasks.get(coalesce_key)
+            if task and not task.done():
+                log.debug(f"【{self._client_type.value}】{index.name} 合并相同的搜索请求：{key_word}")
+                return task
+            task = Future()
+            self._pending_tasks[coalesce_key] = task
+            self._site_queues.setdefault(index.id, deque()).append(
+                (task, (index, key_word, filter_args, match_media, in_from, refresh), time.time()))
+            self.__dispatch_site_tasks(index.id)
+        task.add_done_callback(lambda _: self.__remove_pending_task(coalesce_key, task))
+        return task
+
+    def __remove_pending_task(self, coalesce_key, task):
+        with self._lock:
+            if self._pending_tasks.get(coalesce_key) is task:
+                self._pending_tasks.pop(coalesce_key, None)
+
+    def __dispatch_site_tasks(self, site_id):
+        """
+        站点并发未满时，将站点队列中的任务提交到线程池，需持有锁调用
+        """
+        queue = self._site_queues.get(site_id)
+        while queue and self._site_running.get(site_id, 0) < INDEXER_SITE_THREAD_NUM:
+            task, args, submit_time = queue.popleft()
+            if not task.set_running_or_notify_cancel():
+                continue
+            self._site_running[site_id] = self._site_running.get(site_id, 0) + 1
+            self._executor.submit(self.__search_site, task, args, submit_time, time.time())
+
+    def __search_site(self, task, args, submit_time, dispatch_time):
+        """
+        在线程池中执行单个站点的搜索，完成后提交该站点排队中的下一个任务
+        """
+        index, key_word, filter_args, match_media, in_from, refresh = args
+        self.__update_wait_statistics(index.name,
+                                      site_seconds=dispatch_time - submit_time,
+                                      pool_seconds=time.time() - dispatch_time)
+        try:
+            result = self._client.search(100 - int(index.pri),
+                                         index,
+                                         key_word,
+                                         filter_args,
+                                         match_media,
+                                         in_from,
+                                         refresh)
+        except Exception as e:
+            task.set_exception(e)
+        else:
+            task.set_result(result)
+        finally:
+            with self._lock:
+                self._site_running[index.id] -= 1
+                self.__dispatch_site_tasks(index.id)
+
+    def __update_wait_statistics(self, site_name, site_seconds, pool_seconds):
+        with self._lock:
+            statistics = self._wait_statistics.setdefault(site_name, {})
+            for wait_type, seconds in (("site", site_seconds), ("pool", pool_seconds)):
+                statistic = statistics.setdefault(wait_type, {
+                    "count": 0,
+                    "total": 0,
+                    "max": 0,
+                    "last": 0
+                })
+                statistic["count"] += 1
+                statistic["total"] += seconds
+                statistic["last"] = seconds
+                statistic["max"] = max(statistic["max"], seconds)
+
+    def get_wait_statistics(self):
+        """
+        获取各站点搜索任务的排队等待时间统计（秒），site为等待站点并发的时间，pool为等待线程池的时间
+        """
+        with self._lock:
+            return {
+                site_name: {
+                    wait_type: {
+                        "count": statistic.get("count"),
+                        "avg": round(statistic.get("total") / statistic.get("count"), 3)
+                        if statistic.get("count") else 0,
+                        "max": round(statistic.get("max"), 3),
+                        "last": round(statistic.get("last"), 3)
+                    } for wait_type, statistic in statistics.items()
+                } for site_name, statistics in self._wait_statistics.items()
+            }
 
     def get_indexer_statistics(self):
         """
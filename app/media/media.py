@@ -1,3 +1,4 @@
+import datetime
 import difflib
 import os
 import random
@@ -12,11 +13,14 @@ import log
 from app.helper import MetaHelper
 from app.helper.openai_helper import OpenAiHelper
 from app.media.meta.metainfo import MetaInfo
-from app.media.tmdbv3api import TMDb, Search, Movie, TV, Person, Find, TMDbException, Discover, Trending, Episode, Genre
-from app.utils import PathUtils, EpisodeFormat, RequestUtils, NumberUtils, StringUtils, cacheman
+from app.media.tmdbv3api import TMDb, Search, Movie, TV, Person, Find, TMDbException, Discover, Trending, Episode, Genre, \
+    Change
+from app.utils import PathUtils, EpisodeFormat, RequestUtils, NumberUtils, StringUtils, cacheman, \
+    TmdbSeasonsCache
+from app.utils.commons import SingleFlight
 from app.utils.types import MediaType, MatchMode
 from config import Config, KEYWORD_BLACKLIST, KEYWORD_SEARCH_WEIGHT_3, KEYWORD_SEARCH_WEIGHT_2, KEYWORD_SEARCH_WEIGHT_1, \
-    KEYWORD_STR_SIMILARITY_THRESHOLD, KEYWORD_DIFF_SCORE_THRESHOLD
+    KEYWORD_STR_SIMILARITY_THRESHOLD, KEYWORD_DIFF_SCORE_THRESHOLD, TMDB_CHANGES_MAX_DAYS
 
 
 class Media:
@@ -31,6 +35,7 @@ class Media:
     trending = None
     discover = None
     genre = None
+    change = None
     meta = None
     openai = None
     _rmt_match_mode = None
@@ -38,6 +43,8 @@ class Media:
     _search_tmdbweb = None
     _chatgpt_enable = None
     _default_language = None
+    # 所有实例共享，合并相同名称的并发识别
+    _media_flight = SingleFlight()
 
     def __init__(self):
         self.init_config()
@@ -80,6 +87,7 @@ class Media:
             self.trending = Trending()
             self.discover = Discover()
             self.genre = Genre()
+            self.change = Change()
         # 元数据缓存
         self.meta = MetaHelper()
         # ChatGPT
@@ -696,6 +704,13 @@ class Media:
             return None
         return f"[{meta_info.type.value}]{meta_info.get_name()}-{meta_info.year}-{meta_info.begin_season}"
 
+    @classmethod
+    def get_media_flight_statistics(cls):
+        """
+        获取媒体识别的执行及合并次数统计
+        """
+        return cls._media_flight.get_statistics()
+
     def get_cache_info(self, meta_info):
         """
         根据名称查询是否已经有缓存
@@ -741,74 +756,25 @@ class Media:
         media_key = self.__make_cache_key(meta_info)
         if not cache or not self.meta.get_meta_data_by_key(media_key):
             # 缓存没有或者强制不使用缓存
-            if meta_info.type != MediaType.TV and not meta_info.year:
-                file_media_info = self.__search_multi_tmdb(file_media_name=meta_info.get_name())
-            else:
-                if meta_info.type == MediaType.TV:
-                    # 确定是电视
-                    file_media_info = self.__search_tmdb(file_media_name=meta_info.get_name(),
-                                                         first_media_year=meta_info.year,
-                                                         search_type=meta_info.type,
-                                                         media_year=meta_info.year,
-                                                         season_number=meta_info.begin_season
-                                                         )
-                    if not file_media_info and meta_info.year and self._rmt_match_mode == MatchMode.NORMAL and not strict:
-                        # 非严格模式下去掉年份再查一次
-                        file_media_info = self.__search_tmdb(file_media_name=meta_info.get_name(),
-                                                             search_type=meta_info.type
-                                                             )
-                else:
-                    # 有年份先按电影查
-                    file_media_info = self.__search_tmdb(file_media_name=meta_info.get_name(),
-                                                         first_media_year=meta_info.year,
-                                                         search_type=MediaType.MOVIE
-                                                         )
-                    # 没有再按电视剧查
-                    if not file_media_info:
-                        file_media_info = self.__search_tmdb(file_media_name=meta_info.get_name(),
-                                                             first_media_year=meta_info.year,
-                                                             search_type=MediaType.TV
-                                                             )
-                    if not file_media_info and self._rmt_match_mode == MatchMode.NORMAL and not strict:
-                        # 非严格模式下去掉年份和类型再查一次
-                        file_media_info = self.__search_multi_tmdb(file_media_name=meta_info.get_name())
-            if not file_media_info and self._search_tmdbweb:
-                # 从网站查询
-                file_media_info = self.__search_tmdb_web(file_media_name=meta_info.get_name(),
-                                                         mtype=meta_info.type)
-            if not file_media_info and self._chatgpt_enable:
-                # 通过ChatGPT查询
-                mtype, seaons, episodes, file_media_info = self.__search_chatgpt(file_name=title,
-                                                                                 mtype=meta_info.type)
+            # 相同名称的并发查询只访问一次TMDB，其余调用共享结果
+            file_media_info, chatgpt_info = self._media_flight.do(
+                (media_key, title if self._chatgpt_enable else None, strict, cache, chinese,
+                 str(append_to_response), language),
+                self.__search_media_info,
+                meta_info=meta_info,
+                media_key=media_key,
+                title=title,
+                strict=strict,
+                chinese=chinese,
+                append_to_response=append_to_response)
+            if chatgpt_info:
                 # 修正类型和集数
+                mtype, seaons, episodes = chatgpt_info
                 meta_info.type = mtype
                 if not meta_info.get_season_string():
                     meta_info.set_season(seaons)
                 if not meta_info.get_episode_string():
                     meta_info.set_episode(episodes)
-            if not file_media_info and self._search_keyword:
-                # 关键字猜测
-                cache_name = cacheman["tmdb_supply"].get(meta_info.get_name())
-                is_movie = False
-                if not cache_name:
-                    cache_name, is_movie = self.__search_engine(meta_info.get_name())
-                    cacheman["tmdb_supply"].set(meta_info.get_name(), cache_name)
-                if cache_name:
-                    log.info("【Meta】开始辅助查询：%s ..." % cache_name)
-                    if is_movie:
-                        file_media_info = self.__search_tmdb(file_media_name=cache_name, search_type=MediaType.MOVIE)
-                    else:
-                        file_media_info = self.__search_multi_tmdb(file_media_name=cache_name)
-            # 补充全量信息
-            if file_media_info and not file_media_info.get("genres"):
-                file_media_info = self.get_tmdb_info(mtype=file_media_info.get("media_type"),
-                                                     tmdbid=file_media_info.get("id"),
-                                                     chinese=chinese,
-                                                     append_to_response=append_to_response)
-            # 保存到缓存
-            if file_media_info is not None:
-                self.__insert_media_cache(media_key=media_key,
-                                          file_media_info=file_media_info)
         else:
             # 使用缓存信息
             cache_info = self.meta.get_meta_data_by_key(media_key)
@@ -823,6 +789,77 @@ class Media:
         meta_info.set_tmdb_info(file_media_info)
         return meta_info
 
+    def __search_media_info(self, meta_info, media_key, title, strict, chinese, append_to_response):
+        """
+        从TMDB等途径查询名称对应的媒体信息并写入缓存
+        :return: TMDB信息，ChatGPT识别出的(类型, 季, 集)
+        """
+        chatgpt_info = None
+        if meta_info.type != MediaType.TV and not meta_info.year:
+            file_media_info = self.__search_multi_tmdb(file_media_name=meta_info.get_name())
+        else:
+            if meta_info.type == MediaType.TV:
+                # 确定是电视
+                file_media_info = self.__search_tmdb(file_media_name=meta_info.get_name(),
+                                                     first_media_year=meta_info.year,
+                                                     search_type=meta_info.type,
+                                                     media_year=meta_info.year,
+                                                     season_number=meta_info.begin_season
+                                                     )
+                if not file_media_info and meta_info.year and self._rmt_match_mode == MatchMode.NORMAL and not strict:
+                    # 非严格模式下去掉年份再查一次
+                    file_media_info = self.__search_tmdb(file_media_name=meta_info.get_name(),
+                                                         search_type=meta_info.type
+                                                         )
+            else:
+                # 有年份先按电影查
+                file_media_info = self.__search_tmdb(file_media_name=meta_info.get_name(),
+                                                     first_media_year=meta_info.year,
+                                                     search_type=MediaType.MOVIE
+                                                     )
+                # 没有再按电视剧查
+                if not file_media_info:
+                    file_media_info = self.__search_tmdb(file_media_name=meta_info.get_name(),
+                                                         first_media_year=meta_info.year,
+                                                         search_type=MediaType.TV
+                                                         )
+                if not file_media_info and self._rmt_match_mode == MatchMode.NORMAL and not strict:
+                    # 非严格模式下去掉年份和类型再查一次
+                    file_media_info = self.__search_multi_tmdb(file_media_name=meta_info.get_name())
+        if not file_media_info and self._search_tmdbweb:
+            # 从网站查询
+            file_media_info = self.__search_tmdb_web(file_media_name=meta_info.get_name(),
+                                                     mtype=meta_info.type)
+        if not file_media_info and self._chatgpt_enable:
+            # 通过ChatGPT查询，类型和集数由调用方修正
+            mtype, seaons, episodes, file_media_info = self.__search_chatgpt(file_name=title,
+                                                                             mtype=meta_info.type)
+            chatgpt_info = (mtype, seaons, episodes)
+        if not file_media_info and self._search_keyword:
+            # 关键字猜测
+            cache_name = cacheman["tmdb_supply"].get(meta_info.get_name())
+            is_movie = False
+            if not cache_name:
+                cache_name, is_movie = self.__search_engine(meta_info.get_name())
+                cacheman["tmdb_supply"].set(meta_info.get_name(), cache_name)
+            if cache_name:
+                log.info("【Meta】开始辅助查询：%s ..." % cache_name)
+                if is_movie:
+                    file_media_info = self.__search_tmdb(file_media_name=cache_name, search_type=MediaType.MOVIE)
+                else:
+                    file_media_info = self.__search_multi_tmdb(file_media_name=cache_name)
+        # 补充全量信息
+        if file_media_info and not file_media_info.get("genres"):
+            file_media_info = self.get_tmdb_info(mtype=file_media_info.get("media_type"),
+                                                 tmdbid=file_media_info.get("id"),
+                                                 chinese=chinese,
+                                                 append_to_response=append_to_response)
+        # 保存到缓存
+        if file_media_info is not None:
+            self.__insert_media_cache(media_key=media_key,
+                                      file_media_info=file_media_info)
+        return file_media_info, chatgpt_info
+
     def __insert_media_cache(self, media_key, file_media_info):
         """
         将TMDB信息插入缓存
@@ -1142,6 +1179,44 @@ class Media:
             return []
         return self.__dict_tmdbinfos(self.trending.all_week(page=page))
 
+    def get_tmdb_changes(self, mtype: MediaType, start_time, max_pages=None):
+        """
+        获取指定时间以来TMDB中信息有变化的媒体
+        :param mtype: 媒体类型
+        :param start_time: 开始时间
+        :param max_pages: 最多查询的页数，超出时返回None
+        :return: 有变化的TMDBID集合，查询失败或超出可查询的时间范围时返回None
+        """
+        if not self.change or not start_time:
+            return None
+        # TMDB按UTC日期查询，往前多取一天避免遗漏
+        start_date = (start_time.astimezone(datetime.timezone.utc) - datetime.timedelta(days=1)).date()
+        end_date = datetime.datetime.now(datetime.timezone.utc).date()
+        if (end_date - start_date).days >= TMDB_CHANGES_MAX_DAYS:
+            return None
+        if mtype == MediaType.MOVIE:
+            change_list = self.change.movie_change_list
+        else:
+            change_list = self.change.tv_change_list
+        tmdbids = set()
+        page = 1
+        try:
+            while True:
+                changes = change_list(start_date=start_date, end_date=end_date, page=page)
+                total_pages = changes.get("total_pages") or 1
+                if max_pages is not None and total_pages > max_pages:
+                    log.info(f"【Meta】TMDB{mtype.value}变更列表共 {total_pages} 页，超出 {max_pages} 页，不使用变更列表")
+                    return None
+                for item in changes.get("results") or []:
+                    tmdbids.add(item.get("id"))
+                if page >= total_pages:
+                    break
+                page += 1
+        except Exception as e:
+            log.error(f"【Meta】连接TMDB出错：{str(e)}")
+            return None
+        return tmdbids
+
     def __get_tmdb_movie_detail(self, tmdbid, append_to_response=None):
         """
         获取电影的详情
@@ -1696,6 +1771,28 @@ class Media:
                 return int(sea.get("episode_count"))
         return 0
 
+    def get_tmdb_seasons_episodes_num(self, tmdbid, tv_info=None):
+        """
+        获取电视剧每季的总集数，结果按TMDBID缓存
+        :param tmdbid: TMDBID
+        :param tv_info: 已获取的TMDB信息，没有时查询TMDB
+        :return: 季号与总集数的字典，不含特别季，查询失败时返回None
+        """
+        if not tmdbid:
+            return None
+        seasons = TmdbSeasonsCache.get(str(tmdbid))
+        if seasons is not None:
+            return seasons
+        if not tv_info or not tv_info.get("seasons"):
+            tv_info = self.get_tmdb_info(mtype=MediaType.TV, tmdbid=tmdbid)
+        if not tv_info:
+            return None
+        seasons = {int(sea.get("season_number")): int(sea.get("episode_count") or 0)
+                   for sea in tv_info.get("seasons") or []
+                   if sea.get("season_number")}
+        TmdbSeasonsCache.set(str(tmdbid), seasons)
+        return seasons
+
     @staticmethod
     def __dict_media_crews(crews):
         """
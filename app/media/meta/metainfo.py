@@ -1,4 +1,6 @@
+import copy
 import os.path
+from threading import Lock
 from typing import Any
 import regex as re
 
@@ -6,19 +8,65 @@ import log
 from app.helper import WordsHelper
 from app.media.meta.metaanime import MetaAnime
 from app.media.meta.metavideo import MetaVideo
+from app.utils import MetaInfoCache
 from app.utils.types import MediaType
 from config import RMT_MEDIAEXT
 
+# 识别缓存命中统计
+_cache_lock = Lock()
+_cache_statistics = {"hit": 0, "miss": 0}
+
 
 def MetaInfo(title, subtitle=None, mtype=None):
     """
     媒体整理入口，根据名称和副标题，判断是哪种类型的识别，返回对应对象
+    相同的名称、副标题及类型直接返回缓存识别结果的副本，识别词或制作组变化时缓存清空
     :param title: 标题、种子名、文件名
     :param subtitle: 副标题、描述
     :param mtype: 指定识别类型，为空则自动识别类型
     :return: MetaAnime、MetaVideo
     """
+    if not title:
+        return _parse_meta_info(title, subtitle, mtype)
+    cache_key = (title, subtitle, mtype)
+    meta_info = MetaInfoCache.get(cache_key)
+    with _cache_lock:
+        _cache_statistics["hit" if meta_info is not None else "miss"] += 1
+    if meta_info is None:
+        meta_info = _parse_meta_info(title, subtitle, mtype)
+        MetaInfoCache.set(cache_key, meta_info)
+    return _copy_meta_info(meta_info)
+
+
+def get_meta_cache_statistics():
+    """
+    获取识别缓存的命中统计
+    """
+    with _cache_lock:
+        hit, miss = _cache_statistics["hit"], _cache_statistics["miss"]
+    return {
+        "hit": hit,
+        "miss": miss,
+        "size": MetaInfoCache.size(),
+        "hit_rate": round(hit / (hit + miss), 4) if hit + miss else 0
+    }
+
+
+def _copy_meta_info(meta_info):
+    """
+    复制识别结果，调用方会修改返回的对象，列表、字典等属性也需要复制
+    """
+    meta_copy = copy.copy(meta_info)
+    for key, value in vars(meta_info).items():
+        if isinstance(value, (list, dict, set)):
+            setattr(meta_copy, key, copy.copy(value))
+    return meta_copy
 
+
+def _parse_meta_info(title, subtitle=None, mtype=None):
+    """
+    识别名称和副标题
+    """
     # 记录原始名称
     org_title = title
     # 应用自定义识别词，获取识别词处理后名称
@@ -1,4 +1,5 @@
 import regex as re
+from app.utils.cache_manager import MetaInfoCache
 from app.utils.commons import singleton
 
 
@@ -8,6 +9,11 @@ class ReleaseGroupsMatcher(object):
     识别制作组、字幕组
     """
     __release_groups = None
+    # 内置及自定义制作组的预编译正则
+    __release_groups_re = None
+    # 指定制作组的预编译正则缓存
+    __groups_re_cache = {}
+    __groups_re_cache_size = 128
     custom_release_groups = None
     custom_separator = None
     RELEASE_GROUPS = {
@@ -79,6 +85,29 @@ class ReleaseGroupsMatcher(object):
             for release_group in site_groups:
                 release_groups.append(release_group)
         self.__release_groups = '|'.join(release_groups)
+        self.__groups_re_cache = {}
+        self.__release_groups_re = self.__compile_groups(self.__release_groups)
+
+    @staticmethod
+    def __compile_groups(groups):
+        """
+        编译制作组/字幕组正则
+        """
+        return re.compile(r"(?<=[-@\[￡【&])(?:%s)(?=[@.\s\]\[】&])" % groups, re.I)
+
+    def __get_groups_re(self, groups=None):
+        """
+        获取制作组/字幕组的预编译正则，未指定制作组时使用内置及自定义制作组
+        """
+        if not groups:
+            return self.__release_groups_re
+        groups_re = self.__groups_re_cache.get(groups)
+        if not groups_re:
+            if len(self.__groups_re_cache) >= self.__groups_re_cache_size:
+                self.__groups_re_cache.clear()
+            groups_re = self.__compile_groups(groups)
+            self.__groups_re_cache[groups] = groups_re
+        return groups_re
 
     def match(self, title=None, groups=None):
         """
@@ -88,13 +117,8 @@ class ReleaseGroupsMatcher(object):
         """
         if not title:
             return ""
-        if not groups:
-            if self.custom_release_groups:
-                groups = f"{self.__release_groups}|{self.custom_release_groups}"
-            else:
-                groups = self.__release_groups
         title = f"{title} "
-        groups_re = re.compile(r"(?<=[-@\[￡【&])(?:%s)(?=[@.\s\]\[】&])" % groups, re.I)
+        groups_re = self.__get_groups_re(groups)
         # 处理一个制作组识别多次的情况，保留顺序
         unique_groups = []
         for item in re.findall(groups_re, title):
@@ -109,3 +133,9 @@ class ReleaseGroupsMatcher(object):
         """
         self.custom_release_groups = release_groups
         self.custom_separator = separator
+        if release_groups:
+            self.__release_groups_re = self.__compile_groups(f"{self.__release_groups}|{release_groups}")
+        else:
+            self.__release_groups_re = self.__compile_groups(self.__release_groups)
+        # 识别结果已变化，清空识别缓存
+        MetaInfoCache.clear()
@@ -9,3 +9,4 @@ from .objs.discover import Discover
 from .objs.trending import Trending
 from .objs.episode import Episode
 from .objs.genre import Genre
+from .objs.change import Change
@@ -0,0 +1,58 @@
+from urllib.parse import urlencode
+
+from app.media.tmdbv3api.tmdb import TMDb
+
+
+class Change(TMDb):
+    _urls = {
+        "movie": "/movie/changes",
+        "tv": "/tv/changes",
+        "person": "/person/changes",
+    }
+
+    def _change_list(self, change_type, start_date="", end_date="", page=1):
+        return self._get_obj(
+            self._call(
+                self._urls[change_type],
+                urlencode({
+                    "start_date": str(start_date),
+                    "end_date": str(end_date),
+                    "page": str(page)
+                }),
+                call_cached=False
+            ),
+            key=None
+        )
+
+    def movie_change_list(self, start_date="", end_date="", page=1):
+        """
+        Get a list of all of the movie ids that have been changed in the past 24 hours.
+        You can query up to 14 days in a single query by using the start_date and end_date query parameters.
+        :param start_date: str
+        :param end_date: str
+        :param page: int
+        :return:
+        """
+        return self._change_list("movie", start_date=start_date, end_date=end_date, page=page)
+
+    def tv_change_list(self, start_date="", end_date="", page=1):
+        """
+        Get a list of all of the TV show ids that have been changed in the past 24 hours.
+        You can query up to 14 days in a single query by using the start_date and end_date query parameters.
+        :param start_date: str
+        :param end_date: str
+        :param page: int
+        :return:
+        """
+        return self._change_list("tv", start_date=start_date, end_date=end_date, page=page)
+
+    def person_change_list(self, start_date="", end_date="", page=1):
+        """
+        Get a list of all of the person ids that have been changed in the past 24 hours.
+        You can query up to 14 days in a single query by using the start_date and end_date query parameters.
+        :param start_date: str
+        :param end_date: str
+        :param page: int
+        :return:
+        """
+        return self._change_list("person", start_date=start_date, end_date=end_date, page=page)
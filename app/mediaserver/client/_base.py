@@ -161,6 +161,15 @@ class _IMediaClient(metaclass=ABCMeta):
         """
         pass
 
+    @staticmethod
+    def get_item_signature(*values):
+        """
+        拼装媒体项目的变更签名，增量同步时据此判断项目是否有变化
+        :return: 签名，值均为空时返回None
+        """
+        values = [str(value) for value in values if value not in (None, "")]
+        return "|".join(values) if values else None
+
     @staticmethod
     def get_nt_image_url(url, remote=False):
         """
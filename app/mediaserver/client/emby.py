@@ -24,6 +24,9 @@ class Emby(_IMediaClient):
     _host = None
     _play_host = None
     _user = None
+    # 同步媒体库时随列表一并返回的字段，不再逐个查询项目详情
+    _item_fields = "ProviderIds,Path,OriginalTitle,ParentId,Etag,DateModified," \
+                   "DateLastMediaAdded,ChildCount,RecursiveItemCount"
     _folders = []
 
     def __init__(self, config=None):
@@ -355,7 +358,9 @@ class Emby(_IMediaClient):
             ExceptionUtils.exception_traceback(e)
             log.error(f"【{self.client_name}】连接Shows/Id/Episodes出错：" + str(e))
             return None
-        return []
+        # 请求失败时返回None，与没有剧集区分
+        log.error(f"【{self.client_name}】Shows/Id/Episodes 未获取到返回数据")
+        return None
 
     def get_no_exists_episodes(self, meta_info, season, total_num):
         """
@@ -626,7 +631,8 @@ class Emby(_IMediaClient):
             yield {}
         if not self._host or not self._apikey:
             yield {}
-        req_url = "%semby/Users/%s/Items?ParentId=%s&api_key=%s" % (self._host, self._user, parent, self._apikey)
+        req_url = "%semby/Users/%s/Items?ParentId=%s&Fields=%s&api_key=%s" % (
+            self._host, self._user, parent, self._item_fields, self._apikey)
         try:
             res = RequestUtils().get_res(req_url)
             if res and res.status_code == 200:
@@ -635,7 +641,8 @@ class Emby(_IMediaClient):
                     if not result:
                         continue
                     if result.get("Type") in ["Movie", "Series"]:
-                        item_info = self.get_iteminfo(result.get("Id"))
+                        # 不支持Fields参数的旧版本才查询项目详情
+                        item_info = result if "ProviderIds" in result else self.get_iteminfo(result.get("Id"))
                         yield {"id": result.get("Id"),
                                "library": item_info.get("ParentId"),
                                "type": item_info.get("Type"),
@@ -645,6 +652,11 @@ class Emby(_IMediaClient):
                                "tmdbid": item_info.get("ProviderIds", {}).get("Tmdb"),
                                "imdbid": item_info.get("ProviderIds", {}).get("Imdb"),
                                "path": item_info.get("Path"),
+                               "modified": self.get_item_signature(item_info.get("Etag"),
+                                                                   item_info.get("DateModified"),
+                                                                   item_info.get("DateLastMediaAdded"),
+                                                                   item_info.get("ChildCount"),
+                                                                   item_info.get("RecursiveItemCount")),
                                "json": str(item_info)}
                     elif "Folder" in result.get("Type"):
                         for item in self.get_items(parent=result.get('Id')):
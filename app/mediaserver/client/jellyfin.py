@@ -23,6 +23,8 @@ class Jellyfin(_IMediaClient):
     _host = None
     _play_host = None
     _user = None
+    # 同步媒体库时随列表一并返回的字段，不再逐个查询项目详情
+    _item_fields = "ProviderIds,Path,OriginalTitle,ParentId,Etag,DateLastMediaAdded,ChildCount,RecursiveItemCount"
 
     def __init__(self, config=None):
         if config:
@@ -304,7 +306,9 @@ class Jellyfin(_IMediaClient):
             ExceptionUtils.exception_traceback(e)
             log.error(f"【{self.client_name}】连接Shows/Id/Episodes出错：" + str(e))
             return None
-        return []
+        # 请求失败时返回None，与没有剧集区分
+        log.error(f"【{self.client_name}】Shows/Id/Episodes 未获取到返回数据")
+        return None
 
     def get_no_exists_episodes(self, meta_info, season, total_num):
         """
@@ -522,7 +526,8 @@ class Jellyfin(_IMediaClient):
             yield {}
         if not self._host or not self._apikey:
             yield {}
-        req_url = "%sUsers/%s/Items?parentId=%s&api_key=%s" % (self._host, self._user, parent, self._apikey)
+        req_url = "%sUsers/%s/Items?parentId=%s&fields=%s&api_key=%s" % (
+            self._host, self._user, parent, self._item_fields, self._apikey)
         try:
             res = RequestUtils().get_res(req_url)
             if res and res.status_code == 200:
@@ -531,7 +536,8 @@ class Jellyfin(_IMediaClient):
                     if not result:
                         continue
                     if result.get("Type") in ["Movie", "Series"]:
-                        item_info = self.get_iteminfo(result.get("Id"))
+                        # 不支持Fields参数的旧版本才查询项目详情
+                        item_info = result if "ProviderIds" in result else self.get_iteminfo(result.get("Id"))
                         yield {"id": result.get("Id"),
                                "library": item_info.get("ParentId"),
                                "type": item_info.get("Type"),
@@ -541,6 +547,11 @@ class Jellyfin(_IMediaClient):
                                "tmdbid": item_info.get("ProviderIds", {}).get("Tmdb"),
                                "imdbid": item_info.get("ProviderIds", {}).get("Imdb"),
                                "path": item_info.get("Path"),
+                               "modified": self.get_item_signature(item_info.get("Etag"),
+                                                                   item_info.get("DateModified"),
+                                                                   item_info.get("DateLastMediaAdded"),
+                                                                   item_info.get("ChildCount"),
+                                                                   item_info.get("RecursiveItemCount")),
                                "json": str(item_info)}
                     elif "Folder" in result.get("Type"):
                         for item in self.get_items(result.get("Id")):
@@ -460,7 +460,9 @@ class Plex(_IMediaClient):
                            "tmdbid": ids['tmdb_id'],
                            "imdbid": ids['imdb_id'],
                            "tvdbid": ids['tvdb_id'],
-                           "path": path}
+                           "path": path,
+                           "modified": self.get_item_signature(item.updatedAt,
+                                                               getattr(item, "leafCount", None))}
         except Exception as err:
             ExceptionUtils.exception_traceback(err)
         yield {}
@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+
+import log
+from app.db import MediaDb
+from app.utils import ExceptionUtils, TvEpisodesCache
+
+
+class MediaIndex:
+    """
+    已同步媒体库数据的内存索引，同步完成后重建，查询时不访问数据库
+    """
+    _lock = threading.Lock()
+    # 媒体库中有变化的TMDBID -> 变化时间，所有索引共享
+    _invalidated = {}
+
+    def __init__(self, server_type):
+        self._server_type = server_type
+        self._loaded = False
+        self._rebuild_time = 0
+        # TMDBID -> 项目
+        self._tmdbid_index = {}
+        # (标题, 年份) -> 项目
+        self._title_year_index = {}
+        # 标题 -> 项目
+        self._title_index = {}
+
+    @property
+    def server_type(self):
+        return self._server_type
+
+    def rebuild(self):
+        """
+        从数据库重建索引
+        """
+        tmdbid_index = {}
+        title_year_index = {}
+        title_index = {}
+        rebuild_time = time.time()
+        try:
+            for media in MediaDb().get_items(server_type=self._server_type):
+                item = {
+                    "id": media.ITEM_ID,
+                    "tmdbid": str(media.TMDBID) if media.TMDBID else None,
+                    # 季号 -> 集号集合
+                    "seasons": self.__parse_seasons(media.JSON)
+                }
+                if item.get("tmdbid"):
+                    tmdbid_index.setdefault(item.get("tmdbid"), item)
+                if media.TITLE:
+                    title_year_index.setdefault((media.TITLE, str(media.YEAR)), item)
+                    title_index.setdefault(media.TITLE, item)
+        except Exception as e:
+            ExceptionUtils.exception_traceback(e)
+            log.error(f"【MediaServer】构建媒体库索引出错：{str(e)}")
+            return
+        with self._lock:
+            self._tmdbid_index = tmdbid_index
+            self._title_year_index = title_year_index
+            self._title_index = title_index
+            self._rebuild_time = rebuild_time
+            self._loaded = True
+            # 重建前标记的变化已包含在新索引中
+            for tmdbid in [key for key, value in self._invalidated.items() if value < rebuild_time]:
+                self._invalidated.pop(tmdbid, None)
+        log.info(f"【MediaServer】媒体库索引构建完成，共 {len(title_index)} 个标题")
+
+    @staticmethod
+    def __parse_seasons(seasoninfo):
+        seasons = {}
+        for episode in json.loads(seasoninfo or "[]") or []:
+            seasons.setdefault(episode.get("season_num"), set()).add(episode.get("episode_num"))
+        return seasons
+
+    def query(self, title, year=None, tmdbid=None):
+        """
+        查询媒体项目，有TMDBID时优先使用TMDBID匹配，否则使用标题年份匹配
+        :return: 项目信息，不存在时返回None
+        """
+        if not title:
+            return None
+        if not self._loaded:
+            with self._lock:
+                loaded = self._loaded
+            if not loaded:
+                self.rebuild()
+        if tmdbid:
+            item = self._tmdbid_index.get(str(tmdbid))
+            if item:
+                return item
+        if year:
+            item = self._title_year_index.get((title, str(year)))
+        else:
+            item = self._title_index.get(title)
+        if item and tmdbid and item.get("tmdbid") != str(tmdbid):
+            return None
+        return item
+
+    def get_seasons(self, title, year=None, tmdbid=None):
+        """
+        查询媒体库中已存在的季集，索引构建后有变化的项目视为不存在
+        :return: 季号与集号集合的字典，不存在时返回None
+        """
+        if tmdbid:
+            invalidate_time = self._invalidated.get(str(tmdbid))
+            if invalidate_time and invalidate_time >= self._rebuild_time:
+                return None
+        item = self.query(title=title, year=year, tmdbid=tmdbid)
+        if not item:
+            return None
+        return item.get("seasons")
+
+    @classmethod
+    def invalidate(cls, tmdbid):
+        """
+        标记媒体库中的项目有变化（如刚转移了新文件），下次同步前查询该项目时实时访问媒体服务器
+        """
+        if not tmdbid:
+            return
+        with cls._lock:
+            cls._invalidated[str(tmdbid)] = time.time()
+        TvEpisodesCache.delete(str(tmdbid))
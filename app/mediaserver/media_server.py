@@ -1,16 +1,17 @@
-import json
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import log
 from app.conf import SystemConfig
 from app.db import MediaDb
 from app.helper import ProgressHelper, SubmoduleHelper
+from app.mediaserver.media_index import MediaIndex
 from app.media import Media
 from app.message import Message
-from app.utils import ExceptionUtils
+from app.utils import ExceptionUtils, TvEpisodesCache
 from app.utils.commons import singleton
 from app.utils.types import MediaServerType, MovieTypes, SystemConfigKey, ProgressKey
-from config import Config
+from config import Config, MEDIASYNC_THREAD_NUM
 
 lock = threading.Lock()
 server_lock = threading.Lock()
@@ -27,6 +28,7 @@ class MediaServer:
     message = None
     media = None
     systemconfig = None
+    _media_index = None
 
     def __init__(self):
         self._mediaserver_schemas = SubmoduleHelper.import_submodules(
@@ -159,6 +161,32 @@ class MediaServer:
                                                   season_number,
                                                   episode_count)
 
+    def get_exists_episodes(self, meta_info):
+        """
+        查询媒体服务器中电视剧已存在的所有季集，优先使用本地媒体库索引，未同步的剧集整部查询一次并短时缓存
+        :param meta_info: 已识别的需要查询的媒体信息
+        :return: 季号与集号集合的字典，查询失败时返回None
+        """
+        if not self.server:
+            return None
+        seasons = self.media_index.get_seasons(title=meta_info.title,
+                                               year=meta_info.year,
+                                               tmdbid=meta_info.tmdb_id)
+        if seasons:
+            return seasons
+        cache_key = str(meta_info.tmdb_id) if meta_info.tmdb_id else f"{meta_info.title}-{meta_info.year}"
+        seasons = TvEpisodesCache.get(cache_key)
+        if seasons is not None:
+            return seasons
+        episodes = self.server.get_tv_episodes(None, meta_info.title, meta_info.year, meta_info.tmdb_id)
+        if not isinstance(episodes, list):
+            return None
+        seasons = {}
+        for episode in episodes:
+            seasons.setdefault(episode.get("season_num") or 0, set()).add(episode.get("episode_num"))
+        TvEpisodesCache.set(cache_key, seasons)
+        return seasons
+
     def get_movies(self, title, year=None):
         """
         根据标题和年份，检查电影是否在媒体服务器中存在，存在则返回列表
@@ -214,27 +242,32 @@ class MediaServer:
             return []
         return self.server.get_tv_episodes(item_id=item_id)
 
-    def sync_mediaserver(self):
+    def sync_mediaserver(self, incremental=True):
         """
         同步媒体库所有数据到本地数据库
+        :param incremental: 是否增量同步，增量同步时只重新获取有变化的项目，否则全量同步
         """
         if not self.server:
             return
         with lock:
             # 开始进度条
-            log.info("【MediaServer】开始同步媒体库数据...")
+            log.info("【MediaServer】开始%s同步媒体库数据..." % ("增量" if incremental else "全量"))
             self.progress.start(ProgressKey.MediaSync)
             self.progress.update(ptype=ProgressKey.MediaSync, text="请稍候...")
             # 获取需同步的媒体库
             librarys = self.systemconfig.get(SystemConfigKey.SyncLibrary) or []
             # 汇总统计
             medias_count = self.get_medias_count()
-            total_media_count = medias_count.get("MovieCount") + medias_count.get("SeriesCount")
+            total_media_count = (medias_count.get("MovieCount") + medias_count.get("SeriesCount")) or 1
             total_count = 0
             movie_count = 0
             tv_count = 0
-            # 清空登记薄
-            self.mediadb.empty(server_type=self._server_type)
+            # 已同步项目的变更签名
+            synced_items = self.mediadb.get_item_signatures(server_type=self._server_type) if incremental else {}
+            # 媒体服务器中现有的项目ID
+            exists_ids = set()
+            # 新增或有变化的项目
+            changed_items = []
             for library in self.get_libraries():
                 if str(library.get("id")) not in librarys:
                     continue
@@ -244,24 +277,47 @@ class MediaServer:
                 for item in self.get_items(library.get("id")):
                     if not item:
                         continue
-                    # 更新进度
-                    seasoninfo = []
                     total_count += 1
                     if item.get("type") in ['Movie', 'movie']:
                         movie_count += 1
                     elif item.get("type") in ['Series', 'show']:
                         tv_count += 1
-                        # 查询剧集信息
-                        seasoninfo = self.get_tv_episodes(item.get("id"))
+                    # 更新进度
                     self.progress.update(ptype=ProgressKey.MediaSync,
-                                         text="正在同步 %s，已完成：%s / %s ..." % (
+                                         text="正在获取 %s，已完成：%s / %s ..." % (
                                              library.get("name"), total_count, total_media_count),
-                                         value=round(100 * total_count / total_media_count, 1))
-                    # 插入数据
-                    self.mediadb.insert(server_type=self._server_type,
-                                        iteminfo=item,
-                                        seasoninfo=seasoninfo)
-
+                                         value=round(50 * total_count / total_media_count, 1))
+                    item_id = str(item.get("id"))
+                    exists_ids.add(item_id)
+                    # 未变化的项目不再处理
+                    if item.get("modified") \
+                            and item_id in synced_items \
+                            and synced_items.get(item_id) == item.get("modified"):
+                        continue
+                    changed_items.append(item)
+            # 并发查询剧集信息
+            seasoninfos = self.__get_tv_episodes_batch([item for item in changed_items
+                                                        if item.get("type") in ['Series', 'show']])
+            # 剧集信息查询失败的项目不记录签名，下次同步时重新查询
+            for item in changed_items:
+                if item.get("type") in ['Series', 'show'] \
+                        and seasoninfos.get(str(item.get("id"))) is None:
+                    item["modified"] = None
+            # 已从媒体服务器删除的项目
+            removed_ids = set(synced_items.keys()) - exists_ids
+            log.info("【MediaServer】媒体库共 %s 个项目，新增或变化 %s 个，删除 %s 个" % (
+                total_count, len(changed_items), len(removed_ids)))
+            self.progress.update(ptype=ProgressKey.MediaSync,
+                                 text="正在保存同步数据...",
+                                 value=95)
+            # 同一事务中替换数据，同步过程中不影响已有数据的查询
+            self.mediadb.replace_items(server_type=self._server_type,
+                                       items=[(item, seasoninfos.get(str(item.get("id"))) or [])
+                                              for item in changed_items],
+                                       delete_ids=removed_ids | {str(item.get("id")) for item in changed_items},
+                                       empty=not incremental)
+            # 重建媒体库索引
+            self.media_index.rebuild()
             # 更新总体同步情况
             self.mediadb.statistics(server_type=self._server_type,
                                     total_count=total_count,
@@ -274,6 +330,30 @@ class MediaServer:
             self.progress.end(ProgressKey.MediaSync)
             log.info("【MediaServer】媒体库数据同步完成，同步数量：%s" % total_count)
 
+    def __get_tv_episodes_batch(self, items):
+        """
+        使用线程池并发查询多个电视剧的剧集信息
+        :param items: 电视剧项目列表
+        :return: 项目ID与剧集信息的字典，查询失败时剧集信息为None
+        """
+        seasoninfos = {}
+        if not items:
+            return seasoninfos
+        executor = ThreadPoolExecutor(max_workers=min(len(items), MEDIASYNC_THREAD_NUM))
+        all_task = {executor.submit(self.get_tv_episodes, item.get("id")): str(item.get("id")) for item in items}
+        finish_count = 0
+        for future in as_completed(all_task):
+            finish_count += 1
+            try:
+                seasoninfos[all_task.get(future)] = future.result()
+            except Exception as e:
+                ExceptionUtils.exception_traceback(e)
+            self.progress.update(ptype=ProgressKey.MediaSync,
+                                 text="正在同步剧集信息，已完成：%s / %s ..." % (finish_count, len(items)),
+                                 value=round(50 + 45 * finish_count / len(items), 1))
+        executor.shutdown()
+        return seasoninfos
+
     def check_item_exists(self,
                           mtype,
                           title=None,
@@ -291,10 +371,9 @@ class MediaServer:
         :param episode: 集号
         :return: 媒体服务器中的ITEMID
         """
-        media = self.mediadb.query(server_type=self._server_type,
-                                   title=title,
-                                   year=year,
-                                   tmdbid=tmdbid)
+        media = self.media_index.query(title=title,
+                                       year=year,
+                                       tmdbid=tmdbid)
         if not media:
             return None
 
@@ -304,16 +383,23 @@ class MediaServer:
                 season = 1
         if season:
             # 匹配剧集是否存在
-            seasoninfos = json.loads(media.JSON or "[]")
-            for seasoninfo in seasoninfos:
-                if seasoninfo.get("season_num") == int(season):
-                    if not episode:
-                        return media.ITEM_ID
-                    elif seasoninfo.get("episode_num") == int(episode):
-                        return media.ITEM_ID
+            episodes = media.get("seasons", {}).get(int(season))
+            if episodes is None:
+                return None
+            if not episode or int(episode) in episodes:
+                return media.get("id")
             return None
         else:
-            return media.ITEM_ID
+            return media.get("id")
+
+    @property
+    def media_index(self):
+        """
+        已同步媒体库数据的内存索引
+        """
+        if not self._media_index or self._media_index.server_type != self._server_type:
+            self._media_index = MediaIndex(self._server_type)
+        return self._media_index
 
     def get_mediasync_status(self):
         """
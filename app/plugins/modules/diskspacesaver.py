@@ -2,9 +2,11 @@ import datetime
 import hashlib
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from app.plugins.modules._base import _IPluginModule
-from app.utils import SystemUtils
+from app.utils import SystemUtils, StringUtils
+from config import DISKSPACE_HASH_THREAD_NUM
 
 
 class DiskSpaceSaver(_IPluginModule):
@@ -17,7 +19,7 @@ class DiskSpaceSaver(_IPluginModule):
     # 主题色
     module_color = "#FE9003"
     # 插件版本
-    module_version = "1.0"
+    module_version = "1.1"
     # 插件作者
     module_author = "link2fun"
     # 作者主页
@@ -90,7 +92,7 @@ class DiskSpaceSaver(_IPluginModule):
                         {
                             'title': '仅查重',
                             'required': "",
-                            'tooltip': '仅查重，不进行删除和硬链接替换',
+                            'tooltip': '仅查重，不进行删除和硬链接替换，只输出重复文件及可释放的空间',
                             'type': 'switch',
                             'id': 'dry_run',
                         },
@@ -163,7 +165,8 @@ class DiskSpaceSaver(_IPluginModule):
             _last_result = self.load_last_result(result_path)
             self.info(f"磁盘空间释放 加载上次处理结果，共有 {len(_last_result['file_info'])} 个文件。")
             _duplicates = self.find_duplicates(path, ext_list, int(file_size), _last_result, fast)
-            self.info(f"磁盘空间释放 找到 {len(_duplicates)} 个重复文件。")
+            self.info(f"磁盘空间释放 找到 {len(_duplicates)} 组共 "
+                      f"{sum(len(files) - 1 for files in _duplicates.values())} 个重复文件。")
             self.process_duplicates(_duplicates, dry_run)
             self.info(f"磁盘空间释放 处理完毕。")
             self.save_last_result(result_path, _last_result)
@@ -190,7 +193,7 @@ class DiskSpaceSaver(_IPluginModule):
         with open(file_path, 'rb', buffering=0) as f:
             if fast:
                 # 获取文件大小
-                file_size = os.path.getsize(file_path)
+                file_size = os.fstat(f.fileno()).st_size
                 # 读取文件前buffer_size大小的数据计算SHA1值
                 n = f.readinto(buffer)
                 h.update(buffer_view[:n])
@@ -212,70 +215,152 @@ class DiskSpaceSaver(_IPluginModule):
     def find_duplicates(self, folder_path, _ext_list, _file_size, last_result, fast=False):
         """
         查找重复的文件，返回字典，key 为文件的 SHA1 值，value 为文件路径的列表
+        依次按文件大小、文件头部/中间/尾部的SHA1分组，只有仍然相同的文件才计算整体SHA1
         """
-        duplicates = {}
+        # 上次处理结果按路径索引
+        file_index = {info.get('filePath'): info for info in last_result.get('file_info') or []}
+        # 按大小分组，同一inode（已是硬链接）只计算一次
         file_group_by_size = {}
-        # 先进行依次过滤
-        for dirpath, dirnames, filenames in os.walk(folder_path):
-            for filename in filenames:
-                file_path = os.path.join(dirpath, filename)
-                file_ext = os.path.splitext(file_path)[1]
-                file_size = os.path.getsize(file_path)
-                if file_ext.lower() not in _ext_list:
-                    continue
+        for file_info in self.__scan_files(folder_path, _ext_list, _file_size * 1024 * 1024):
+            file_group_by_size.setdefault(file_info['fileSize'], []).append(file_info)
+        candidates = []
+        for file_list in file_group_by_size.values():
+            if len({file_info['fileInode'] for file_info in file_list}) > 1:
+                candidates.extend(file_list)
+        self.info(f'磁盘空间释放 {folder_path} 共有 {len(candidates)} 个文件存在大小相同的其他文件')
 
-                if os.path.getsize(file_path) < _file_size * 1024 * 1024:
-                    continue
-                file_mtime = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-                if file_group_by_size.get(file_size) is None:
-                    file_group_by_size[file_size] = []
+        # 部分SHA1预筛选
+        partial_hashes = self.__get_hashes(candidates, file_index, 'filePartialSha1', True)
+        file_group_by_partial = {}
+        for file_info in candidates:
+            partial_sha1 = partial_hashes.get(file_info['filePath'])
+            if partial_sha1:
+                file_group_by_partial.setdefault((file_info['fileSize'], partial_sha1), []).append(file_info)
+        duplicates = {}
+        if fast:
+            # 快速模式直接使用部分SHA1，不同大小的文件部分SHA1可能相同，按大小及部分SHA1分组
+            for (size, partial_sha1), file_list in file_group_by_partial.items():
+                if len({file_info['fileInode'] for file_info in file_list}) > 1:
+                    duplicates[(size, partial_sha1)] = [file_info['filePath'] for file_info in file_list]
+        else:
+            candidates = []
+            for file_list in file_group_by_partial.values():
+                if len({file_info['fileInode'] for file_info in file_list}) > 1:
+                    candidates.extend(file_list)
+            self.info(f'磁盘空间释放 {folder_path} 部分SHA1相同的文件共 {len(candidates)} 个，计算整体SHA1')
+            hashes = self.__get_hashes(candidates, file_index, 'fileSha1', False)
+            for file_info in candidates:
+                sha1 = hashes.get(file_info['filePath'])
+                if sha1:
+                    duplicates.setdefault(sha1, []).append(file_info['filePath'])
+        last_result['file_info'] = list(file_index.values())
+        return {key: files for key, files in duplicates.items() if len(files) > 1}
 
-                file_group_by_size[file_size].append(
-                    {'filePath': file_path, 'fileExt': file_ext, 'fileSize': file_size,
-                     'fileModifyTime': str(file_mtime)})
+    def __scan_files(self, folder_path, ext_list, min_size):
+        """
+        遍历目录，返回符合后缀和大小的文件信息，复用scandir的stat结果
+        """
+        dirs = [folder_path]
+        while dirs:
+            current = dirs.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                dirs.append(entry.path)
+                                continue
+                            if not entry.is_file(follow_symlinks=False):
+                                continue
+                            file_ext = os.path.splitext(entry.name)[1]
+                            if file_ext.lower() not in ext_list:
+                                continue
+                            stat = entry.stat(follow_symlinks=False)
+                            if stat.st_size < min_size:
+                                continue
+                            # Windows下scandir的stat结果不含设备号及inode，需重新获取
+                            if not stat.st_ino:
+                                stat = os.stat(entry.path, follow_symlinks=False)
+                        except OSError as err:
+                            self.warn(f'磁盘空间释放 读取文件 {entry.path} 出错：{str(err)}')
+                            continue
+                        yield {'filePath': entry.path,
+                               'fileExt': file_ext,
+                               'fileSize': stat.st_size,
+                               'fileModifyTime': str(datetime.datetime.fromtimestamp(stat.st_mtime)),
+                               # 仍获取不到inode时按路径区分文件
+                               'fileInode': (stat.st_dev, stat.st_ino or entry.path)}
+            except OSError as err:
+                self.warn(f'磁盘空间释放 读取目录 {current} 出错：{str(err)}')
 
-        # 循环 file_group_by_size
-        for file_size, file_list in file_group_by_size.items():
-            # 如果文件数量大于1，进行sha1计算
-            if len(file_list) <= 1:
-                # 没有大小一样的 不需要处理
-                self.debug(f'磁盘空间释放 {file_list[0]["filePath"]} 大小相同的文件数量为1，无需计算sha1')
+    def __get_hashes(self, file_list, file_index, key, fast):
+        """
+        获取文件的SHA1值，大小和修改时间与上次处理结果一致时直接使用，否则按磁盘并行计算
+        :param file_list: 文件信息列表
+        :param file_index: 上次处理结果的路径索引，计算后更新
+        :param key: 记录SHA1值的字段
+        :param fast: 是否只计算部分SHA1
+        :return: 文件路径与SHA1值的字典
+        """
+        hashes = {}
+        inode_hashes = {}
+        # 需要计算的文件按磁盘分组，同一inode只计算一次
+        files_by_dev = {}
+        for file_info in file_list:
+            file_path = file_info['filePath']
+            info = file_index.get(file_path)
+            if info and info.get(key) \
+                    and info.get('fileSize') == file_info['fileSize'] \
+                    and info.get('fileModifyTime') == file_info['fileModifyTime']:
+                hashes[file_path] = info.get(key)
+                inode_hashes[file_info['fileInode']] = info.get(key)
                 continue
-            for file_info in file_list:
-                file_path = file_info['filePath']
-                file_mtime = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-                file_size = os.path.getsize(file_path)
-                sha1 = None
+            files_by_dev.setdefault(file_info['fileInode'][0], {}).setdefault(file_info['fileInode'], file_info)
 
-                # 查找是否存在相同路径的文件
-                for info in last_result['file_info']:
-                    if file_path == info['filePath']:
-                        # 如果文件大小和修改时间都一致，则直接使用之前计算的 sha1 值
-                        if file_size == info['fileSize'] and str(file_mtime) == info['fileModifyTime']:
-                            self.info(
-                                f'磁盘空间释放 文件 {file_path} 的大小和修改时间与上次处理结果一致，直接使用上次处理结果')
-                            sha1 = info['fileSha1']
-                        break
+        def hash_dev_files(dev_files):
+            results = {}
+            for inode, dev_file in dev_files.items():
+                if inode in inode_hashes:
+                    continue
+                try:
+                    results[inode] = self.get_sha1(dev_file['filePath'], fast=fast)
+                except OSError as err:
+                    self.warn(f'磁盘空间释放 计算文件 {dev_file["filePath"]} 的 SHA1 值出错：{str(err)}')
+            return results
 
-                if sha1 is None:
-                    self.info(f'磁盘空间释放 计算文件 {file_path} 的 SHA1 值')
-                    sha1 = self.get_sha1(file_path, fast=fast)
-                    file_info = {'filePath': file_path,
-                                 'fileSize': file_size,
-                                 'fileModifyTime': str(file_mtime),
-                                 'fileSha1': sha1}
-                    last_result['file_info'].append(file_info)
+        if files_by_dev:
+            self.info(f'磁盘空间释放 在 {len(files_by_dev)} 个磁盘上计算 '
+                      f'{sum(len(dev_files) for dev_files in files_by_dev.values())} 个文件的'
+                      f'{"部分" if fast else "整体"}SHA1')
+            with ThreadPoolExecutor(max_workers=min(len(files_by_dev), DISKSPACE_HASH_THREAD_NUM)) as executor:
+                for results in executor.map(hash_dev_files, files_by_dev.values()):
+                    inode_hashes.update(results)
 
-                if sha1 in duplicates:
-                    duplicates[sha1].append(file_path)
-                else:
-                    duplicates[sha1] = [file_path]
-        return duplicates
+        for file_info in file_list:
+            file_path = file_info['filePath']
+            if file_path in hashes:
+                continue
+            sha1 = inode_hashes.get(file_info['fileInode'])
+            if not sha1:
+                continue
+            hashes[file_path] = sha1
+            info = file_index.get(file_path)
+            if not info or info.get('fileSize') != file_info['fileSize'] \
+                    or info.get('fileModifyTime') != file_info['fileModifyTime']:
+                info = {'filePath': file_path,
+                        'fileSize': file_info['fileSize'],
+                        'fileModifyTime': file_info['fileModifyTime'],
+                        'fileSha1': None}
+                file_index[file_path] = info
+            info[key] = sha1
+        return hashes
 
     def process_duplicates(self, duplicates, dry_run=False):
         """
-        处理重复的文件，保留一个文件，其他的用硬链接替换
+        处理重复的文件，保留一个文件，其他的用硬链接替换，dry_run时只统计可释放的空间
         """
+        saved_size = 0
+        saved_inodes = set()
         for sha1, files in duplicates.items():
             if len(files) > 1:
 
@@ -288,6 +373,9 @@ class DiskSpaceSaver(_IPluginModule):
                         else:
                             if dry_run:
                                 self.info(f'磁盘空间释放 文件 {files[0]} 和 {file_path} 是重复文件，dry_run中，不做处理')
+                                if (stat_compare.st_dev, stat_compare.st_ino) not in saved_inodes:
+                                    saved_inodes.add((stat_compare.st_dev, stat_compare.st_ino))
+                                    saved_size += stat_compare.st_size
                                 continue
                             # 使用try catch
                             try:
@@ -307,6 +395,8 @@ class DiskSpaceSaver(_IPluginModule):
                     else:
                         self.info(f'磁盘空间释放 文件 {files[0]} 和 {file_path} 不在同一个磁盘，无法用硬链接替换')
                         continue
+        if dry_run:
+            self.info(f'磁盘空间释放 dry_run中，替换为硬链接后可释放 {StringUtils.str_filesize(saved_size)}')
 
     @staticmethod
     def load_last_result(last_result_path):
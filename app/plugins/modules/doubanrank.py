@@ -16,7 +16,7 @@ from app.media import Media
 from app.mediaserver import MediaServer
 from app.plugins.modules._base import _IPluginModule
 from app.subscribe import Subscribe
-from app.utils import RequestUtils, DomUtils
+from app.utils import RequestUtils, DomUtils, EncodingUtils
 from app.utils.types import MediaType, SearchType, RssType
 from config import Config
 from web.backend.web_utils import WebUtils
@@ -858,7 +858,7 @@ ajax_post(
             ret = RequestUtils(timeout=300).get_res(addr)
             if not ret:
                 return []
-            ret.encoding = ret.apparent_encoding
+            EncodingUtils.set_encoding(ret)
             ret_xml = ret.text
             ret_array = []
             # 解析XML
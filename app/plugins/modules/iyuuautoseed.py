@@ -14,7 +14,7 @@ from app.media.meta import MetaInfo
 from app.plugins.modules._base import _IPluginModule
 from app.plugins.modules.iyuu.iyuu_helper import IyuuHelper
 from app.sites import Sites
-from app.utils import RequestUtils
+from app.utils import RequestUtils, EncodingUtils
 from app.utils.types import DownloaderType
 from config import Config
 
@@ -821,10 +821,7 @@ class IYUUAutoSeed(_IPluginModule):
                 proxies=Config().get_proxies() if site.get("proxy") else None
             ).get_res(url=page_url)
             if res is not None and res.status_code in (200, 500):
-                if "charset=utf-8" in res.text or "charset=UTF-8" in res.text:
-                    res.encoding = "UTF-8"
-                else:
-                    res.encoding = res.apparent_encoding
+                EncodingUtils.set_encoding(res)
                 if not res.text:
                     self.warn(f"获取种子下载链接失败，页面内容为空：{page_url}")
                     return None
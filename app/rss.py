@@ -1,4 +1,7 @@
+import math
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
 from threading import Lock
 
 import log
@@ -7,11 +10,13 @@ from app.filter import Filter
 from app.helper import DbHelper, RssHelper
 from app.media import Media
 from app.media.meta import MetaInfo
+from app.message import Message
 from app.sites import Sites, SiteConf
 from app.subscribe import Subscribe
-from app.utils import ExceptionUtils, Torrent
+from app.utils import ExceptionUtils, Torrent, StringUtils, RequestUtils
 from app.utils.commons import singleton
 from app.utils.types import MediaType, SearchType
+from config import RSS_FETCH_THREAD_NUM, RSS_FETCH_TIMEOUT
 
 lock = Lock()
 
@@ -27,6 +32,11 @@ class Rss:
     dbhelper = None
     rsshelper = None
     subscribe = None
+    message = None
+    # 各站点RSS下载耗时统计
+    _site_statistics = {}
+    # 上次RSS处理时的订阅签名
+    _subscribe_signature = None
 
     def __init__(self):
         self.init_config()
@@ -40,6 +50,7 @@ class Rss:
         self.dbhelper = DbHelper()
         self.rsshelper = RssHelper()
         self.subscribe = Subscribe()
+        self.message = Message()
 
     def rssdownload(self):
         """
@@ -69,6 +80,12 @@ class Rss:
             # 没有订阅退出
             if not rss_movies and not rss_tvs:
                 return
+            # 订阅或站点过滤规则有变化时需要重新下载完整的RSS，未变化的RSS不再重复处理
+            site_rules = [(site_info.get("name"), site_info.get("rule")) for site_info in rss_sites_info if site_info]
+            subscribe_signature = StringUtils.md5_hash(f"{rss_movies}{rss_tvs}{site_rules}")
+            if subscribe_signature != self._subscribe_signature:
+                self.rsshelper.reset_rss_validator(validator_key="rss")
+                self._subscribe_signature = subscribe_signature
 
             # 获取有订阅的站点范围
             check_sites = []
@@ -97,7 +114,8 @@ class Rss:
             rss_download_torrents = []
             # 缺失的资源详情
             rss_no_exists = {}
-            # 遍历站点资源
+            # 需要下载RSS的站点
+            fetch_sites = []
             for site_info in rss_sites_info:
                 if not site_info:
                     continue
@@ -107,10 +125,18 @@ class Rss:
                 if check_sites and site_name not in check_sites:
                     continue
                 # 站点rss链接
-                rss_url = site_info.get("rssurl")
-                if not rss_url:
+                if not site_info.get("rssurl"):
                     log.info(f"【Rss】{site_name} 未配置rssurl，跳过...")
                     continue
+                fetch_sites.append(site_info)
+            # 并发下载各站点RSS
+            fetch_results = self.__fetch_rss_sites(fetch_sites)
+            # 遍历站点资源
+            for site_info in fetch_sites:
+                # 站点名称
+                site_name = site_info.get("name")
+                # 站点rss链接
+                rss_url = site_info.get("rssurl")
                 # 站点信息
                 site_id = site_info.get("id")
                 site_cookie = site_info.get("cookie")
@@ -121,13 +147,13 @@ class Rss:
                 site_proxy = site_info.get("proxy")
                 # 使用的规则
                 site_fliter_rule = site_info.get("rule")
-                # 开始下载RSS
+                # 开始处理RSS
                 log.info(f"【Rss】正在处理：{site_name}")
                 if site_info.get("pri"):
                     site_order = 100 - int(site_info.get("pri"))
                 else:
                     site_order = 0
-                rss_acticles = self.rsshelper.parse_rssxml(url=rss_url)
+                rss_acticles = fetch_results.get(site_name, [])
                 if rss_acticles is None:
                     # RSS链接过期
                     log.error(f"【Rss】站点 {site_name} RSS链接已过期，请重新获取！")
@@ -137,7 +163,10 @@ class Rss:
                                                         f"链接：{rss_url}")
                     continue
                 if not rss_acticles:
-                    log.warn(f"【Rss】{site_name} 未下载到数据")
+                    if self.rsshelper.is_rss_not_modified(validator_key="rss", url=rss_url):
+                        log.info(f"【Rss】{site_name} RSS没有更新")
+                    else:
+                        log.warn(f"【Rss】{site_name} 未下载到数据")
                     continue
                 else:
                     log.info(f"【Rss】{site_name} 获取数据：{len(rss_acticles)}")
@@ -316,6 +345,106 @@ class Rss:
             self.download_rss_torrent(rss_download_torrents=rss_download_torrents,
                                       rss_no_exists=rss_no_exists)
 
+    def __fetch_rss_sites(self, rss_sites):
+        """
+        使用线程池并发下载解析各站点的RSS，单个站点超时不影响其它站点
+        :param rss_sites: 需要下载RSS的站点信息列表
+        :return: 站点名称与RSS解析结果的字典，解析结果为None代表RSS过期
+        """
+        if not rss_sites:
+            return {}
+        log.info(f"【Rss】开始并发下载 {len(rss_sites)} 个站点的RSS ...")
+        start_time = time.time()
+        fetch_results = {}
+        executor = ThreadPoolExecutor(max_workers=min(len(rss_sites), RSS_FETCH_THREAD_NUM))
+        # 站点数超过线程数时分批执行，整体超时按批数放宽，避免排队的站点未开始就被判定超时
+        deadline = RSS_FETCH_TIMEOUT * 2 * math.ceil(len(rss_sites) / RSS_FETCH_THREAD_NUM)
+        all_task = {}
+        for site_info in rss_sites:
+            task = executor.submit(self.__fetch_site_rss, site_info)
+            all_task[task] = site_info.get("name")
+        try:
+            for future in as_completed(all_task, timeout=deadline):
+                site_name = all_task.get(future)
+                try:
+                    rss_acticles, seconds, success = future.result()
+                except Exception as e:
+                    ExceptionUtils.exception_traceback(e)
+                    rss_acticles, seconds, success = [], round(time.time() - start_time, 2), False
+                fetch_results[site_name] = rss_acticles
+                self.__update_site_statistics(site_name=site_name,
+                                              seconds=seconds,
+                                              success=success)
+                log.debug(f"【Rss】{site_name} RSS下载完成，耗时 {seconds} 秒")
+        except TimeoutError:
+            for future, site_name in all_task.items():
+                if future.done():
+                    continue
+                # 还在排队未开始的站点计为取消，不计入耗时
+                if future.cancel():
+                    log.warn(f"【Rss】{site_name} 等待下载RSS超时，本次跳过...")
+                    self.__update_site_statistics(site_name=site_name,
+                                                  seconds=0,
+                                                  success=False,
+                                                  cancelled=True)
+                    continue
+                log.warn(f"【Rss】{site_name} RSS下载超时，跳过...")
+                self.__update_site_statistics(site_name=site_name,
+                                              seconds=round(time.time() - start_time, 2),
+                                              success=False)
+        executor.shutdown(wait=False, cancel_futures=True)
+        log.info(f"【Rss】所有站点RSS下载完成，总耗时 {round(time.time() - start_time, 2)} 秒")
+        for site_name in all_task.values():
+            statistics = self._site_statistics.get(site_name)
+            if not statistics:
+                continue
+            log.debug(f"【Rss】{site_name} 累计下载RSS {statistics.get('total')} 次，"
+                      f"失败 {statistics.get('fail')} 次（排队超时取消 {statistics.get('cancel')} 次），"
+                      f"平均耗时 {statistics.get('avg_seconds')} 秒，最长耗时 {statistics.get('max_seconds')} 秒")
+        # 连接复用情况
+        for host, statistic in RequestUtils.get_pool_statistics().items():
+            log.debug(f"【Rss】{host} 累计请求 {statistic.get('requests')} 次，"
+                      f"新建连接 {statistic.get('connections')} 次，复用连接 {statistic.get('reused')} 次")
+        return fetch_results
+
+    def __fetch_site_rss(self, site_info):
+        """
+        下载解析单个站点的RSS
+        :return: RSS解析结果、耗时（秒）、是否成功，RSS没有更新（304）也视为成功
+        """
+        start_time = time.time()
+        rss_acticles = self.rsshelper.parse_rssxml(url=site_info.get("rssurl"),
+                                                   timeout=RSS_FETCH_TIMEOUT,
+                                                   validator_key="rss")
+        success = bool(rss_acticles) \
+            or self.rsshelper.is_rss_not_modified(validator_key="rss", url=site_info.get("rssurl"))
+        return rss_acticles, round(time.time() - start_time, 2), success
+
+    def __update_site_statistics(self, site_name, seconds, success, cancelled=False):
+        """
+        更新站点RSS下载耗时统计，排队超时取消的计为失败，不计入耗时
+        """
+        statistics = self._site_statistics.get(site_name) or {
+            "total": 0,
+            "fail": 0,
+            "cancel": 0,
+            "last_seconds": 0,
+            "max_seconds": 0,
+            "avg_seconds": 0
+        }
+        statistics["total"] += 1
+        if not success:
+            statistics["fail"] += 1
+        if cancelled:
+            statistics["cancel"] += 1
+        else:
+            fetched = statistics["total"] - statistics["cancel"]
+            statistics["last_seconds"] = seconds
+            statistics["max_seconds"] = max(statistics["max_seconds"], seconds)
+            statistics["avg_seconds"] = round(
+                (statistics["avg_seconds"] * (fetched - 1) + seconds) / fetched, 2)
+        self._site_statistics[site_name] = statistics
+
     def check_torrent_rss(self,
                           media_info,
                           rss_movies,
@@ -17,7 +17,7 @@ from app.media.meta import MetaInfo
 from app.message import Message
 from app.searcher import Searcher
 from app.subscribe import Subscribe
-from app.utils import RequestUtils, StringUtils, ExceptionUtils
+from app.utils import StringUtils, ExceptionUtils, EncodingUtils
 from app.utils.commons import singleton
 from app.utils.types import MediaType, SearchType, RssType
 from config import Config
@@ -58,6 +58,8 @@ class RssChecker(object):
         self.subscribe = Subscribe()
         # 移除现有任务
         self.stop_service()
+        # 任务或解析器可能已变化，重新下载完整的RSS
+        self.rsshelper.reset_rss_validator(validator_key="userrss:")
         # 读取解析器列表
         rss_parsers = self.dbhelper.get_userrss_parser()
         self._rss_parsers = []
@@ -193,9 +195,9 @@ class RssChecker(object):
         taskinfo = self.get_rsstask_info(taskid)
         if not taskinfo:
             return
-        rss_result = self.__parse_userrss_result(taskinfo)
+        rss_result = self.__parse_userrss_result(taskinfo, conditional=True)
         if len(rss_result) == 0:
-            log.warn("【RssChecker】%s 未下载到数据" % taskinfo.get("name"))
+            log.warn("【RssChecker】%s 未下载到新数据" % taskinfo.get("name"))
             return
         else:
             log.info("【RssChecker】%s 获取数据：%s" % (taskinfo.get("name"), len(rss_result)))
@@ -401,9 +403,11 @@ class RssChecker(object):
                 if str(taskinfo.get("counter")).isdigit() else counter
             taskinfo["update_time"] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))
 
-    def __parse_userrss_result(self, taskinfo):
+    def __parse_userrss_result(self, taskinfo, conditional=False):
         """
         获取RSS链接数据，根据PARSER进行解析获取返回结果
+        :param taskinfo: 任务信息
+        :param conditional: 是否使用条件请求，RSS没有更新时不返回该地址的数据
         """
         task_name = taskinfo.get("name")
         rss_urls = taskinfo.get("address")
@@ -444,11 +448,16 @@ class RssChecker(object):
                 rss_url = "%s?%s" % (rss_url, param_url) if rss_url.find("?") == -1 else "%s&%s" % (rss_url, param_url)
             # 请求数据
             try:
-                ret = RequestUtils(proxies=Config().get_proxies() if taskinfo.get("proxy") else None
-                                   ).get_res(rss_url)
+                ret = self.rsshelper.request_rss(
+                    rss_url,
+                    proxies=Config().get_proxies() if taskinfo.get("proxy") else None,
+                    validator_key=f"userrss:{taskinfo.get('id')}" if conditional else None)
                 if not ret:
                     continue
-                ret.encoding = ret.apparent_encoding
+                if ret.status_code == 304:
+                    log.info(f"【RssChecker】任务 {task_name} RSS地址 {rss_url} 没有更新")
+                    continue
+                EncodingUtils.set_encoding(ret)
             except Exception as e2:
                 ExceptionUtils.exception_traceback(e2)
                 continue
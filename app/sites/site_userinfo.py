@@ -9,7 +9,7 @@ import log
 from app.helper import ChromeHelper, SubmoduleHelper, DbHelper
 from app.message import Message
 from app.sites.sites import Sites
-from app.utils import RequestUtils, ExceptionUtils, StringUtils
+from app.utils import RequestUtils, ExceptionUtils, StringUtils, EncodingUtils
 from app.utils.commons import singleton
 from config import Config
 
@@ -85,10 +85,7 @@ class SiteUserInfo(object):
                                proxies=proxies
                                ).get_res(url=url)
             if res and res.status_code == 200:
-                if "charset=utf-8" in res.text or "charset=UTF-8" in res.text:
-                    res.encoding = "UTF-8"
-                else:
-                    res.encoding = res.apparent_encoding
+                EncodingUtils.set_encoding(res)
                 html_text = res.text
                 # 第一次登录反爬
                 if html_text.find("title") == -1:
@@ -103,10 +100,7 @@ class SiteUserInfo(object):
                                        proxies=proxies
                                        ).get_res(url=tmp_url)
                     if res and res.status_code == 200:
-                        if "charset=utf-8" in res.text or "charset=UTF-8" in res.text:
-                            res.encoding = "UTF-8"
-                        else:
-                            res.encoding = res.apparent_encoding
+                        EncodingUtils.set_encoding(res)
                         html_text = res.text
                         if not html_text:
                             return None
@@ -122,10 +116,7 @@ class SiteUserInfo(object):
                                        proxies=proxies
                                        ).get_res(url=url + "/index.php")
                     if res and res.status_code == 200:
-                        if "charset=utf-8" in res.text or "charset=UTF-8" in res.text:
-                            res.encoding = "UTF-8"
-                        else:
-                            res.encoding = res.apparent_encoding
+                        EncodingUtils.set_encoding(res)
                         html_text = res.text
                         if not html_text:
                             return None
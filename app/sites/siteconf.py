@@ -7,7 +7,7 @@ from functools import lru_cache
 from lxml import etree
 
 from app.helper import ChromeHelper
-from app.utils import ExceptionUtils, StringUtils, RequestUtils
+from app.utils import ExceptionUtils, StringUtils, RequestUtils, EncodingUtils
 from app.utils.commons import singleton
 from config import Config
 
@@ -182,6 +182,6 @@ class SiteConf:
                 proxies=Config().get_proxies() if proxy else None
             ).get_res(url=url)
             if res and res.status_code == 200:
-                res.encoding = res.apparent_encoding
+                EncodingUtils.set_encoding(res)
                 return res.text
         return ""
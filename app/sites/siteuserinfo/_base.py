@@ -11,7 +11,7 @@ from lxml import etree
 import log
 from app.helper import SiteHelper, ChromeHelper
 from app.helper.cloudflare_helper import under_challenge
-from app.utils import RequestUtils
+from app.utils import RequestUtils, EncodingUtils
 from app.utils.types import SiteSchema
 from config import Config
 
@@ -261,10 +261,7 @@ class _ISiteUserInfo(metaclass=ABCMeta):
                     log.warn(
                         f"【Sites】{self.site_name} 检测到Cloudflare，需要浏览器仿真，但是浏览器不可用或者未开启浏览器仿真")
                     return ""
-            if "charset=utf-8" in res.text or "charset=UTF-8" in res.text:
-                res.encoding = "UTF-8"
-            else:
-                res.encoding = res.apparent_encoding
+            EncodingUtils.set_encoding(res)
             return res.text
 
         return ""
@@ -1,4 +1,6 @@
+import datetime
 import json
+from concurrent.futures import ThreadPoolExecutor, wait
 from threading import Lock
 
 import log
@@ -13,7 +15,7 @@ from app.message import Message
 from app.plugins import EventManager
 from app.searcher import Searcher
 from app.sites import Sites
-from app.utils import Torrent
+from app.utils import Torrent, StringUtils
 from app.utils.commons import singleton
 from app.utils.types import (
     MediaType,
@@ -23,6 +25,7 @@ from app.utils.types import (
     RssType,
 )
 from web.backend.web_utils import WebUtils
+from config import Config, SUBSCRIBE_SEARCH_THREAD_NUM, SUBSCRIBE_SEARCH_SKIP_RATIO, RSS_REFRESH_TMDB_THREAD_NUM
 
 lock = Lock()
 
@@ -40,6 +43,10 @@ class Subscribe:
     # filter = None
     # eventmanager = None
     # indexer = None
+    # 上次刷新订阅TMDB信息的时间，为空时全部刷新
+    _tmdb_refresh_time = None
+    # 上次刷新TMDB信息失败的订阅
+    _tmdb_refresh_retry = set()
 
     def __init__(self):
         self.init_config()
@@ -543,6 +550,9 @@ class Subscribe:
                 "release_date": note_info.get("release_date"),
                 "vote": note_info.get("vote"),
                 "keyword": keyword,
+                "filter_order": rss_movie.FILTER_ORDER,
+                "last_search": rss_movie.LAST_SEARCH,
+                "search_sign": rss_movie.SEARCH_SIGN,
             }
         return ret_dict
 
@@ -630,6 +640,9 @@ class Subscribe:
                 "release_date": note_info.get("release_date"),
                 "vote": note_info.get("vote"),
                 "keyword": keyword,
+                "filter_order": rss_tv.FILTER_ORDER,
+                "last_search": rss_tv.LAST_SEARCH,
+                "search_sign": rss_tv.SEARCH_SIGN,
             }
         return ret_dict
 
@@ -661,109 +674,159 @@ class Subscribe:
     def refresh_rss_metainfo(self):
         """
         定时将豆瓣订阅转换为TMDB的订阅，并更新订阅的TMDB信息
+        只刷新上次刷新以来TMDB信息有变化的订阅，并发查询后批量写入数据库
         """
-        # 更新电影
         log.info("【Subscribe】开始刷新订阅TMDB信息...")
-        rss_movies = self.get_subscribe_movies(state="R")
-        for rid, rss_info in rss_movies.items():
-            # 跳过模糊匹配的
-            if rss_info.get("fuzzy_match"):
-                continue
-            rssid = rss_info.get("id")
-            name = rss_info.get("name")
-            year = rss_info.get("year") or ""
-            tmdbid = rss_info.get("tmdbid")
-            # 更新TMDB信息
+        refresh_time = datetime.datetime.now().astimezone()
+        # 跳过模糊匹配的
+        rss_movies = [rss_info for rss_info in self.get_subscribe_movies(state="R").values()
+                      if not rss_info.get("fuzzy_match")]
+        rss_tvs = [rss_info for rss_info in self.get_subscribe_tvs(state="R").values()
+                   if not rss_info.get("fuzzy_match")]
+        # 只保留TMDB信息有变化的
+        rss_movies = self.__filter_tmdb_changed(MediaType.MOVIE, rss_movies)
+        rss_tvs = self.__filter_tmdb_changed(MediaType.TV, rss_tvs)
+        # 并发查询TMDB信息
+        with ThreadPoolExecutor(max_workers=RSS_REFRESH_TMDB_THREAD_NUM,
+                                thread_name_prefix="subscribe_refresh") as executor:
+            movie_results = list(executor.map(self.__get_movie_tmdb_update, rss_movies))
+            tv_results = list(executor.map(self.__get_tv_tmdb_update, rss_tvs))
+        # 查询失败的下次重新刷新
+        self._tmdb_refresh_retry = {
+            (rtype, rss_info.get("id"))
+            for rtype, rss_infos, results in [(MediaType.MOVIE, rss_movies, movie_results),
+                                              (MediaType.TV, rss_tvs, tv_results)]
+            for rss_info, (success, _) in zip(rss_infos, results) if not success
+        }
+        movie_updates = [update for _, update in movie_results if update]
+        tv_updates = [update for _, update in tv_results if update]
+        # 批量更新订阅信息
+        if movie_updates:
+            self.dbhelper.update_rss_movies_tmdb(movie_updates)
+        if tv_updates:
+            self.dbhelper.update_rss_tvs_tmdb(tv_updates)
+        # 清除TMDB缓存
+        for update in movie_updates + tv_updates:
+            self.metahelper.delete_meta_data_by_tmdbid(update.get("tmdbid"))
+        self._tmdb_refresh_time = refresh_time
+        log.info(f"【Subscribe】订阅TMDB信息刷新完成，"
+                 f"共查询 {len(rss_movies) + len(rss_tvs)} 个订阅，"
+                 f"更新 {len(movie_updates) + len(tv_updates)} 个")
+
+    def __filter_tmdb_changed(self, rtype, rss_infos):
+        """
+        根据TMDB的变更列表过滤出需要刷新的订阅，豆瓣订阅及上次查询失败的总是刷新
+        首次刷新或变更列表不可用时全部刷新
+        """
+        tmdb_infos = [rss_info for rss_info in rss_infos
+                      if rss_info.get("tmdbid") and not str(rss_info.get("tmdbid")).startswith("DB:")]
+        if not tmdb_infos:
+            return rss_infos
+        changes = self.media.get_tmdb_changes(mtype=rtype,
+                                              start_time=self._tmdb_refresh_time,
+                                              max_pages=len(tmdb_infos))
+        if changes is None:
+            return rss_infos
+        tmdb_rssids = [rss_info.get("id") for rss_info in tmdb_infos]
+        rss_list = [rss_info for rss_info in rss_infos
+                    if rss_info.get("id") not in tmdb_rssids
+                    or (rtype, rss_info.get("id")) in self._tmdb_refresh_retry
+                    or str(rss_info.get("tmdbid")).isdigit() and int(rss_info.get("tmdbid")) in changes]
+        log.info(f"【Subscribe】{len(rss_infos)} 个{rtype.value}订阅中有 {len(rss_list)} 个需要刷新TMDB信息")
+        return rss_list
+
+    def __get_movie_tmdb_update(self, rss_info):
+        """
+        查询电影订阅的最新TMDB信息
+        :return: 是否查询成功，需要更新的订阅信息
+        """
+        name = rss_info.get("name")
+        try:
             media_info = self.__get_media_info(
-                tmdbid=tmdbid,
+                tmdbid=rss_info.get("tmdbid"),
                 name=name,
-                year=year,
+                year=rss_info.get("year") or "",
                 mtype=MediaType.MOVIE,
                 cache=False,
             )
-            if media_info and media_info.tmdb_id and media_info.title != name:
-                log.info(
-                    f"【Subscribe】检测到TMDB信息变化，更新电影订阅 {name} 为"
-                    f" {media_info.title}"
-                )
-                # 更新订阅信息
-                self.dbhelper.update_rss_movie_tmdb(
-                    rid=rssid,
-                    tmdbid=media_info.tmdb_id,
-                    title=media_info.title,
-                    year=media_info.year,
-                    image=media_info.get_message_image(),
-                    desc=media_info.overview,
-                    note=self.gen_rss_note(media_info),
-                )
-                # 清除TMDB缓存
-                self.metahelper.delete_meta_data_by_tmdbid(media_info.tmdb_id)
+        except Exception as err:
+            log.error(f"【Subscribe】电影 {name} 刷新TMDB信息失败：{str(err)}")
+            return False, None
+        if not media_info or not media_info.tmdb_id:
+            return False, None
+        if media_info.title == name:
+            return True, None
+        log.info(
+            f"【Subscribe】检测到TMDB信息变化，更新电影订阅 {name} 为"
+            f" {media_info.title}"
+        )
+        return True, {
+            "rid": rss_info.get("id"),
+            "tmdbid": media_info.tmdb_id,
+            "title": media_info.title,
+            "year": media_info.year,
+            "image": media_info.get_message_image(),
+            "desc": media_info.overview,
+            "note": self.gen_rss_note(media_info),
+        }
 
-        # 更新电视剧
-        rss_tvs = self.get_subscribe_tvs(state="R")
-        for rid, rss_info in rss_tvs.items():
-            # 跳过模糊匹配的
-            if rss_info.get("fuzzy_match"):
-                continue
-            rssid = rss_info.get("id")
-            name = rss_info.get("name")
-            year = rss_info.get("year") or ""
-            tmdbid = rss_info.get("tmdbid")
-            season = rss_info.get("season") or 1
-            total = rss_info.get("total")
-            total_ep = rss_info.get("total_ep")
-            lack = rss_info.get("lack")
-            # 更新TMDB信息
+    def __get_tv_tmdb_update(self, rss_info):
+        """
+        查询电视剧订阅的最新TMDB信息及总集数
+        :return: 是否查询成功，需要更新的订阅信息
+        """
+        name = rss_info.get("name")
+        season = rss_info.get("season") or 1
+        total = rss_info.get("total")
+        total_ep = rss_info.get("total_ep")
+        lack = rss_info.get("lack")
+        try:
             media_info = self.__get_media_info(
-                tmdbid=tmdbid,
+                tmdbid=rss_info.get("tmdbid"),
                 name=name,
-                year=year,
+                year=rss_info.get("year") or "",
                 mtype=MediaType.TV,
                 cache=False,
             )
-            if media_info and media_info.tmdb_id:
-                # 获取总集数
-                total_episode = self.media.get_tmdb_season_episodes_num(
-                    tv_info=media_info.tmdb_info,
-                    season=int(str(season).replace("S", "")),
-                )
-                # 设置总集数的，不更新集数
-                if total_ep:
-                    total_episode = total_ep
-                if total_episode and (
-                    name != media_info.title or total != total_episode
-                ):
-                    # 新的缺失集数
-                    lack_episode = total_episode - (total - lack)
-                    log.info(
-                        "【Subscribe】检测到TMDB信息变化，更新电视剧订阅"
-                        f" {name} 为 {media_info.title}，"
-                        f"总集数为：{total_episode}"
-                    )
-                    # 更新订阅信息
-                    self.dbhelper.update_rss_tv_tmdb(
-                        rid=rssid,
-                        tmdbid=media_info.tmdb_id,
-                        title=media_info.title,
-                        year=media_info.year,
-                        total=total_episode,
-                        lack=lack_episode,
-                        image=media_info.get_message_image(),
-                        desc=media_info.overview,
-                        note=self.gen_rss_note(media_info),
-                    )
-                    # 更新缺失季集
-                    self.dbhelper.update_rss_tv_episodes(
-                        rid=rssid,
-                        episodes=range(
-                            total_episode - lack_episode + 1, total_episode + 1
-                        ),
-                    )
-                    # 清除TMDB缓存
-                    self.metahelper.delete_meta_data_by_tmdbid(
-                        media_info.tmdb_id
-                    )
-        log.info("【Subscribe】订阅TMDB信息刷新完成")
+        except Exception as err:
+            log.error(f"【Subscribe】电视剧 {name} 刷新TMDB信息失败：{str(err)}")
+            return False, None
+        if not media_info or not media_info.tmdb_id:
+            return False, None
+        # 获取总集数
+        total_episode = self.media.get_tmdb_season_episodes_num(
+            tv_info=media_info.tmdb_info,
+            season=int(str(season).replace("S", "")),
+        )
+        # 设置总集数的，不更新集数
+        if total_ep:
+            total_episode = total_ep
+        if not total_episode or (
+            name == media_info.title and total == total_episode
+        ):
+            return True, None
+        # 新的缺失集数
+        lack_episode = total_episode - (total - lack)
+        log.info(
+            "【Subscribe】检测到TMDB信息变化，更新电视剧订阅"
+            f" {name} 为 {media_info.title}，"
+            f"总集数为：{total_episode}"
+        )
+        return True, {
+            "rid": rss_info.get("id"),
+            "tmdbid": media_info.tmdb_id,
+            "title": media_info.title,
+            "year": media_info.year,
+            "total": total_episode,
+            "lack": lack_episode,
+            "image": media_info.get_message_image(),
+            "desc": media_info.overview,
+            "note": self.gen_rss_note(media_info),
+            # 更新缺失季集
+            "episodes": range(
+                total_episode - lack_episode + 1, total_episode + 1
+            ),
+        }
 
     def __get_media_info(self, tmdbid, name, year, mtype, cache=True):
         """
@@ -811,108 +874,119 @@ class Subscribe:
             rss_movies = self.get_subscribe_movies(rid=rssid)
         else:
             rss_movies = self.get_subscribe_movies(state=state)
+        # 跳过模糊匹配的
+        rss_movies = [rss_info for rss_info in rss_movies.values() if not rss_info.get("fuzzy_match")]
+        # 跳过近期已搜索且没有变化的
+        if not rssid:
+            rss_movies = self.__filter_searched(MediaType.MOVIE, rss_movies)
         if rss_movies:
             log.info(
                 "【Subscribe】共有 %s 个电影订阅需要搜索" % len(rss_movies)
             )
-        for rid, rss_info in rss_movies.items():
-            # 跳过模糊匹配的
-            if rss_info.get("fuzzy_match"):
-                continue
-            # 搜索站点范围
-            rssid = rss_info.get("id")
-            name = rss_info.get("name")
-            year = rss_info.get("year") or ""
-            tmdbid = rss_info.get("tmdbid")
-            over_edition = rss_info.get("over_edition")
-            keyword = rss_info.get("keyword")
+        self.__run_search_tasks(self.__search_movie, rss_movies)
 
-            # 开始搜索
-            self.dbhelper.update_rss_movie_state(rssid=rssid, state="S")
+    def __search_movie(self, rss_info):
+        """
+        搜索单个电影订阅
+        """
+        # 搜索站点范围
+        rssid = rss_info.get("id")
+        name = rss_info.get("name")
+        year = rss_info.get("year") or ""
+        tmdbid = rss_info.get("tmdbid")
+        over_edition = rss_info.get("over_edition")
+        keyword = rss_info.get("keyword")
 
-            try:
-                # 识别
-                media_info = self.__get_media_info(
-                    tmdbid, name, year, MediaType.MOVIE
+        # 开始搜索
+        self.dbhelper.update_rss_movie_state(rssid=rssid, state="S")
+
+        try:
+            # 识别
+            media_info = self.__get_media_info(
+                tmdbid, name, year, MediaType.MOVIE
+            )
+            # 未识别到媒体信息
+            if not media_info or not media_info.tmdb_info:
+                self.dbhelper.update_rss_movie_state(
+                    rssid=rssid, state="R"
                 )
-                # 未识别到媒体信息
-                if not media_info or not media_info.tmdb_info:
-                    self.dbhelper.update_rss_movie_state(
-                        rssid=rssid, state="R"
+                return
+            media_info.set_download_info(
+                download_setting=rss_info.get("download_setting"),
+                save_path=rss_info.get("save_path"),
+            )
+            # 自定义搜索词
+            media_info.keyword = keyword
+            # 非洗版的情况检查是否存在
+            if not over_edition:
+                # 检查是否存在
+                exist_flag, no_exists, _ = (
+                    self.downloader.check_exists_medias(
+                        meta_info=media_info
                     )
-                    continue
-                media_info.set_download_info(
-                    download_setting=rss_info.get("download_setting"),
-                    save_path=rss_info.get("save_path"),
                 )
-                # 自定义搜索词
-                media_info.keyword = keyword
-                # 非洗版的情况检查是否存在
-                if not over_edition:
-                    # 检查是否存在
-                    exist_flag, no_exists, _ = (
-                        self.downloader.check_exists_medias(
-                            meta_info=media_info
-                        )
+                # 已经存在
+                if exist_flag:
+                    log.info(
+                        "【Subscribe】电影 %s 已存在"
+                        % media_info.get_title_string()
                     )
-                    # 已经存在
-                    if exist_flag:
-                        log.info(
-                            "【Subscribe】电影 %s 已存在"
-                            % media_info.get_title_string()
-                        )
-                        self.finish_rss_subscribe(
-                            rssid=rssid, media=media_info
-                        )
-                        continue
-                else:
-                    # 洗版时按缺失来下载
-                    no_exists = {}
-                    # 把洗版标志加入搜索
-                    media_info.over_edition = over_edition
-                    # 将当前的优先级传入搜索
-                    media_info.res_order = (
-                        self.dbhelper.get_rss_overedition_order(
-                            rtype=media_info.type, rssid=rssid
-                        )
+                    self.finish_rss_subscribe(
+                        rssid=rssid, media=media_info
+                    )
+                    return
+            else:
+                # 洗版时按缺失来下载
+                no_exists = {}
+                # 把洗版标志加入搜索
+                media_info.over_edition = over_edition
+                # 将当前的优先级传入搜索
+                media_info.res_order = (
+                    self.dbhelper.get_rss_overedition_order(
+                        rtype=media_info.type, rssid=rssid
                     )
-                # 开始搜索
-                filter_dict = {
-                    "restype": rss_info.get("filter_restype"),
-                    "pix": rss_info.get("filter_pix"),
-                    "team": rss_info.get("filter_team"),
-                    "rule": rss_info.get("filter_rule"),
-                    "include": rss_info.get("filter_include"),
-                    "exclude": rss_info.get("filter_exclude"),
-                    "site": rss_info.get("search_sites"),
-                }
-                search_result, _, _, _ = self.searcher.search_one_media(
-                    media_info=media_info,
-                    in_from=SearchType.RSS,
-                    no_exists=no_exists,
-                    sites=rss_info.get("search_sites"),
-                    filters=filter_dict,
                 )
-                if search_result:
-                    # 洗版
-                    if over_edition:
-                        self.update_subscribe_over_edition(
-                            rtype=search_result.type,
-                            rssid=rssid,
-                            media=search_result,
-                        )
-                    else:
-                        self.finish_rss_subscribe(
-                            rssid=rssid, media=media_info
-                        )
+            # 开始搜索
+            filter_dict = {
+                "restype": rss_info.get("filter_restype"),
+                "pix": rss_info.get("filter_pix"),
+                "team": rss_info.get("filter_team"),
+                "rule": rss_info.get("filter_rule"),
+                "include": rss_info.get("filter_include"),
+                "exclude": rss_info.get("filter_exclude"),
+                "site": rss_info.get("search_sites"),
+            }
+            answered_sites = []
+            search_result, _, _, _ = self.searcher.search_one_media(
+                media_info=media_info,
+                in_from=SearchType.RSS,
+                no_exists=no_exists,
+                sites=rss_info.get("search_sites"),
+                filters=filter_dict,
+                callback=self.__get_answered_callback(rss_info, answered_sites),
+            )
+            if search_result:
+                # 洗版
+                if over_edition:
+                    self.update_subscribe_over_edition(
+                        rtype=search_result.type,
+                        rssid=rssid,
+                        media=search_result,
+                    )
                 else:
-                    self.dbhelper.update_rss_movie_state(
-                        rssid=rssid, state="R"
+                    self.finish_rss_subscribe(
+                        rssid=rssid, media=media_info
                     )
-            except Exception as err:
-                self.dbhelper.update_rss_movie_state(rssid=rssid, state="R")
-                log.error(f"【Subscribe】电影 {name} 订阅搜索失败：{str(err)}")
-                continue
+            else:
+                self.dbhelper.update_rss_movie_state(
+                    rssid=rssid, state="R"
+                )
+            # 有站点返回结果时才记录搜索水位
+            if answered_sites:
+                self.__update_search_watermark(MediaType.MOVIE, rssid)
+        except Exception as err:
+            self.dbhelper.update_rss_movie_state(rssid=rssid, state="R")
+            log.error(f"【Subscribe】电影 {name} 订阅搜索失败：{str(err)}")
 
     def subscribe_search_tv(self, rssid=None, state="D"):
         """
@@ -924,167 +998,269 @@ class Subscribe:
             rss_tvs = self.get_subscribe_tvs(rid=rssid)
         else:
             rss_tvs = self.get_subscribe_tvs(state=state)
+        # 跳过模糊匹配的
+        rss_tvs = [rss_info for rss_info in rss_tvs.values() if not rss_info.get("fuzzy_match")]
+        # 跳过近期已搜索且没有变化的
+        if not rssid:
+            rss_tvs = self.__filter_searched(MediaType.TV, rss_tvs)
         if rss_tvs:
             log.info(
                 "【Subscribe】共有 %s 个电视剧订阅需要检索" % len(rss_tvs)
             )
-        rss_no_exists = {}
-        for rid, rss_info in rss_tvs.items():
-            # 跳过模糊匹配的
-            if rss_info.get("fuzzy_match"):
-                continue
-            rssid = rss_info.get("id")
-            name = rss_info.get("name")
-            year = rss_info.get("year") or ""
-            tmdbid = rss_info.get("tmdbid")
-            over_edition = rss_info.get("over_edition")
-            keyword = rss_info.get("keyword")
+        self.__run_search_tasks(self.__search_tv, rss_tvs)
 
-            # 开始搜索
-            self.dbhelper.update_rss_tv_state(rssid=rssid, state="S")
+    def __search_tv(self, rss_info):
+        """
+        检索单个电视剧订阅
+        """
+        rssid = rss_info.get("id")
+        name = rss_info.get("name")
+        year = rss_info.get("year") or ""
+        tmdbid = rss_info.get("tmdbid")
+        over_edition = rss_info.get("over_edition")
+        keyword = rss_info.get("keyword")
 
-            try:
-                # 识别
-                media_info = self.__get_media_info(
-                    tmdbid, name, year, MediaType.TV
-                )
-                # 未识别到媒体信息
-                if not media_info or not media_info.tmdb_info:
-                    self.dbhelper.update_rss_tv_state(rssid=rssid, state="R")
-                    continue
-                # 取下载设置
-                media_info.set_download_info(
-                    download_setting=rss_info.get("download_setting"),
-                    save_path=rss_info.get("save_path"),
-                )
-                # 从登记薄中获取缺失剧集
-                season = 1
-                if rss_info.get("season"):
-                    season = int(str(rss_info.get("season")).replace("S", ""))
-                # 订阅季
-                media_info.begin_season = season
-                # 订阅ID
-                media_info.rssid = rssid
-                # 自定义集数
-                total_ep = rss_info.get("total")
-                current_ep = rss_info.get("current_ep")
-                # 自定义搜索词
-                media_info.keyword = keyword
-                # 表中记录的剩余订阅集数
-                episodes = self.get_subscribe_tv_episodes(rss_info.get("id"))
-                if episodes is None:
-                    episodes = []
-                    if current_ep:
-                        episodes = list(range(current_ep, total_ep + 1))
-                    rss_no_exists[media_info.tmdb_id] = [
-                        {
-                            "season": season,
-                            "episodes": episodes,
-                            "total_episodes": total_ep,
-                        }
-                    ]
-                else:
-                    rss_no_exists[media_info.tmdb_id] = [
-                        {
-                            "season": season,
-                            "episodes": episodes,
-                            "total_episodes": total_ep,
-                        }
-                    ]
-                # 非洗版时检查本地媒体库情况
-                if not over_edition:
-                    exist_flag, library_no_exists, _ = (
-                        self.downloader.check_exists_medias(
-                            meta_info=media_info, total_ep={season: total_ep}
-                        )
-                    )
-                    # 当前剧集已存在，跳过
-                    if exist_flag:
-                        # 已全部存在
-                        if not library_no_exists or not library_no_exists.get(
-                            media_info.tmdb_id
-                        ):
-                            log.info(
-                                "【Subscribe】电视剧 %s 订阅剧集已全部存在"
-                                % (media_info.get_title_string())
-                            )
-                            # 完成订阅
-                            self.finish_rss_subscribe(
-                                rssid=rss_info.get("id"), media=media_info
-                            )
-                        continue
-                    # 取交集做为缺失集
-                    rss_no_exists = Torrent.get_intersection_episodes(
-                        target=rss_no_exists,
-                        source=library_no_exists,
-                        title=media_info.tmdb_id,
+        # 开始搜索
+        self.dbhelper.update_rss_tv_state(rssid=rssid, state="S")
+
+        try:
+            # 识别
+            media_info = self.__get_media_info(
+                tmdbid, name, year, MediaType.TV
+            )
+            # 未识别到媒体信息
+            if not media_info or not media_info.tmdb_info:
+                self.dbhelper.update_rss_tv_state(rssid=rssid, state="R")
+                return
+            # 取下载设置
+            media_info.set_download_info(
+                download_setting=rss_info.get("download_setting"),
+                save_path=rss_info.get("save_path"),
+            )
+            # 从登记薄中获取缺失剧集
+            season = 1
+            if rss_info.get("season"):
+                season = int(str(rss_info.get("season")).replace("S", ""))
+            # 订阅季
+            media_info.begin_season = season
+            # 订阅ID
+            media_info.rssid = rssid
+            # 自定义集数
+            total_ep = rss_info.get("total")
+            current_ep = rss_info.get("current_ep")
+            # 自定义搜索词
+            media_info.keyword = keyword
+            # 表中记录的剩余订阅集数
+            episodes = self.get_subscribe_tv_episodes(rss_info.get("id"))
+            if episodes is None:
+                episodes = []
+                if current_ep:
+                    episodes = list(range(current_ep, total_ep + 1))
+            rss_no_exists = {
+                media_info.tmdb_id: [
+                    {
+                        "season": season,
+                        "episodes": episodes,
+                        "total_episodes": total_ep,
+                    }
+                ]
+            }
+            # 非洗版时检查本地媒体库情况
+            if not over_edition:
+                exist_flag, library_no_exists, _ = (
+                    self.downloader.check_exists_medias(
+                        meta_info=media_info, total_ep={season: total_ep}
                     )
-                    if rss_no_exists.get(media_info.tmdb_id):
+                )
+                # 当前剧集已存在，跳过
+                if exist_flag:
+                    # 已全部存在
+                    if not library_no_exists or not library_no_exists.get(
+                        media_info.tmdb_id
+                    ):
                         log.info(
-                            "【Subscribe】%s 订阅缺失季集：%s"
-                            % (
-                                media_info.get_title_string(),
-                                rss_no_exists.get(media_info.tmdb_id),
-                            )
+                            "【Subscribe】电视剧 %s 订阅剧集已全部存在"
+                            % (media_info.get_title_string())
                         )
-                else:
-                    # 把洗版标志加入检索
-                    media_info.over_edition = over_edition
-                    # 将当前的优先级传入检索
-                    media_info.res_order = (
-                        self.dbhelper.get_rss_overedition_order(
-                            rtype=MediaType.TV, rssid=rssid
+                        # 完成订阅
+                        self.finish_rss_subscribe(
+                            rssid=rss_info.get("id"), media=media_info
+                        )
+                    return
+                # 取交集做为缺失集
+                rss_no_exists = Torrent.get_intersection_episodes(
+                    target=rss_no_exists,
+                    source=library_no_exists,
+                    title=media_info.tmdb_id,
+                )
+                if rss_no_exists.get(media_info.tmdb_id):
+                    log.info(
+                        "【Subscribe】%s 订阅缺失季集：%s"
+                        % (
+                            media_info.get_title_string(),
+                            rss_no_exists.get(media_info.tmdb_id),
                         )
                     )
-                # 开始检索
-                filter_dict = {
-                    "restype": rss_info.get("filter_restype"),
-                    "pix": rss_info.get("filter_pix"),
-                    "team": rss_info.get("filter_team"),
-                    "rule": rss_info.get("filter_rule"),
-                    "include": rss_info.get("filter_include"),
-                    "exclude": rss_info.get("filter_exclude"),
-                    "site": rss_info.get("search_sites"),
-                }
-                search_result, no_exists, _, _ = (
-                    self.searcher.search_one_media(
-                        media_info=media_info,
-                        in_from=SearchType.RSS,
-                        no_exists=rss_no_exists,
-                        sites=rss_info.get("search_sites"),
-                        filters=filter_dict,
+            else:
+                # 把洗版标志加入检索
+                media_info.over_edition = over_edition
+                # 将当前的优先级传入检索
+                media_info.res_order = (
+                    self.dbhelper.get_rss_overedition_order(
+                        rtype=MediaType.TV, rssid=rssid
                     )
                 )
-                if (
-                    search_result
-                    or not no_exists
-                    or not no_exists.get(media_info.tmdb_id)
-                ):
-                    # 洗版
-                    if over_edition:
-                        self.update_subscribe_over_edition(
-                            rtype=media_info.type,
-                            rssid=rssid,
-                            media=search_result,
-                        )
-                    else:
-                        # 完成订阅
-                        self.finish_rss_subscribe(
-                            rssid=rssid, media=media_info
-                        )
-                elif no_exists:
-                    # 更新状态
-                    self.update_subscribe_tv_lack(
+            # 开始检索
+            filter_dict = {
+                "restype": rss_info.get("filter_restype"),
+                "pix": rss_info.get("filter_pix"),
+                "team": rss_info.get("filter_team"),
+                "rule": rss_info.get("filter_rule"),
+                "include": rss_info.get("filter_include"),
+                "exclude": rss_info.get("filter_exclude"),
+                "site": rss_info.get("search_sites"),
+            }
+            answered_sites = []
+            search_result, no_exists, _, _ = (
+                self.searcher.search_one_media(
+                    media_info=media_info,
+                    in_from=SearchType.RSS,
+                    no_exists=rss_no_exists,
+                    sites=rss_info.get("search_sites"),
+                    filters=filter_dict,
+                    callback=self.__get_answered_callback(rss_info, answered_sites),
+                )
+            )
+            if (
+                search_result
+                or not no_exists
+                or not no_exists.get(media_info.tmdb_id)
+            ):
+                # 洗版
+                if over_edition:
+                    self.update_subscribe_over_edition(
+                        rtype=media_info.type,
                         rssid=rssid,
-                        media_info=media_info,
-                        seasoninfo=no_exists.get(media_info.tmdb_id),
+                        media=search_result,
                     )
-            except Exception as err:
-                log.error(
-                    f"【Subscribe】电视剧 {name} 订阅搜索失败：{str(err)}"
+                else:
+                    # 完成订阅
+                    self.finish_rss_subscribe(
+                        rssid=rssid, media=media_info
+                    )
+            elif no_exists:
+                # 更新状态
+                self.update_subscribe_tv_lack(
+                    rssid=rssid,
+                    media_info=media_info,
+                    seasoninfo=no_exists.get(media_info.tmdb_id),
                 )
-                self.dbhelper.update_rss_tv_state(rssid=rssid, state="R")
-                continue
+            # 有站点返回结果时才记录搜索水位
+            if answered_sites:
+                self.__update_search_watermark(MediaType.TV, rssid)
+        except Exception as err:
+            log.error(
+                f"【Subscribe】电视剧 {name} 订阅搜索失败：{str(err)}"
+            )
+            self.dbhelper.update_rss_tv_state(rssid=rssid, state="R")
+
+    @staticmethod
+    def __run_search_tasks(func, rss_infos):
+        """
+        并发执行订阅搜索，站点请求由索引器按站点限制并发，相同站点及关键字的搜索会合并
+        """
+        if not rss_infos:
+            return
+        if len(rss_infos) == 1:
+            func(rss_infos[0])
+            return
+        with ThreadPoolExecutor(max_workers=min(SUBSCRIBE_SEARCH_THREAD_NUM, len(rss_infos)),
+                                thread_name_prefix="subscribe_search") as executor:
+            wait([executor.submit(func, rss_info) for rss_info in rss_infos])
+
+    def __get_search_sign(self, rtype, rss_info):
+        """
+        计算影响搜索结果的订阅内容签名，签名不变说明订阅没有变化
+        """
+        sign_info = {
+            key: rss_info.get(key) for key in ["name", "year", "season", "tmdbid", "keyword", "search_sites",
+                                               "over_edition", "filter_order", "filter_restype", "filter_pix",
+                                               "filter_team", "filter_rule", "filter_include", "filter_exclude",
+                                               "total", "lack", "total_ep", "current_ep"]
+        }
+        if rtype == MediaType.TV:
+            sign_info["episodes"] = self.get_subscribe_tv_episodes(rss_info.get("id"))
+        return StringUtils.md5_hash(json.dumps(sign_info, sort_keys=True, default=str))
+
+    @staticmethod
+    def __get_answered_callback(rss_info, answered_sites):
+        """
+        生成记录返回了结果的站点的回调，不在订阅搜索范围内的站点不记录
+        """
+        search_sites = rss_info.get("search_sites")
+
+        def callback(indexer, _):
+            if not search_sites or indexer.name in search_sites:
+                answered_sites.append(indexer.name)
+
+        return callback
+
+    @staticmethod
+    def __get_search_skip_seconds():
+        """
+        订阅没有变化时跳过再次搜索的时长（秒），按订阅定时搜索周期计算，未开启定时搜索时为0
+        """
+        search_rss_interval = (Config().get_config('pt') or {}).get('search_rss_interval')
+        try:
+            search_rss_interval = round(float(search_rss_interval or 0))
+        except (TypeError, ValueError):
+            return 0
+        if not search_rss_interval:
+            return 0
+        # 与定时服务一致，周期最小为6小时
+        return max(search_rss_interval, 6) * 3600 * SUBSCRIBE_SEARCH_SKIP_RATIO
+
+    def __filter_searched(self, rtype, rss_infos):
+        """
+        过滤掉近期已搜索过且订阅没有变化的订阅，新加入队列的订阅总是搜索
+        """
+        skip_seconds = self.__get_search_skip_seconds()
+        if not skip_seconds:
+            return rss_infos
+        rss_list = []
+        skip_count = 0
+        now = datetime.datetime.now()
+        for rss_info in rss_infos:
+            last_search = rss_info.get("last_search")
+            if rss_info.get("state") == "R" \
+                    and last_search \
+                    and rss_info.get("search_sign") == self.__get_search_sign(rtype, rss_info):
+                try:
+                    searched = now - datetime.datetime.strptime(last_search, "%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    searched = None
+                if searched and searched.total_seconds() < skip_seconds:
+                    skip_count += 1
+                    continue
+            rss_list.append(rss_info)
+        if skip_count:
+            log.info(f"【Subscribe】{skip_count} 个{rtype.value}订阅近期已搜索且没有变化，跳过")
+        return rss_list
+
+    def __update_search_watermark(self, rtype, rssid):
+        """
+        记录订阅的搜索时间及搜索后的订阅签名，订阅已完成时不处理
+        """
+        if rtype == MediaType.MOVIE:
+            rss_info = self.get_subscribe_movies(rid=rssid).get(str(rssid))
+            if rss_info:
+                self.dbhelper.update_rss_movie_search(rssid=rssid,
+                                                      sign=self.__get_search_sign(rtype, rss_info))
+        else:
+            rss_info = self.get_subscribe_tvs(rid=rssid).get(str(rssid))
+            if rss_info:
+                self.dbhelper.update_rss_tv_search(rssid=rssid,
+                                                   sign=self.__get_search_sign(rtype, rss_info))
 
     def update_rss_state(self, rtype, rssid, state):
         """
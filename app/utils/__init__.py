@@ -8,10 +8,12 @@ from .string_utils import StringUtils
 from .system_utils import SystemUtils
 from .tokens import Tokens
 from .torrent import Torrent
-from .cache_manager import cacheman, TokenCache, ConfigLoadCache, CategoryLoadCache, OpenAISessionCache
+from .cache_manager import cacheman, TokenCache, ConfigLoadCache, CategoryLoadCache, OpenAISessionCache, \
+    RssValidatorCache, MetaInfoCache, SearchResultCache, TmdbSeasonsCache, TvEpisodesCache
 from .exception_utils import ExceptionUtils
 from .rsstitle_utils import RssTitleUtils
 from .nfo_reader import NfoReader
 from .ip_utils import IpUtils
 from .image_utils import ImageUtils
 from .scheduler_utils import SchedulerUtils
+from .encoding_utils import EncodingUtils
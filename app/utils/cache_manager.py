@@ -16,3 +16,13 @@ ConfigLoadCache = Cache(maxsize=1, ttl=10, timer=time.time, default=None)
 CategoryLoadCache = Cache(maxsize=2, ttl=3, timer=time.time, default=None)
 
 OpenAISessionCache = Cache(maxsize=100, ttl=3600, timer=time.time, default=None)
+
+RssValidatorCache = Cache(maxsize=2000, ttl=24*3600, timer=time.time, default=None)
+
+MetaInfoCache = LRUCache(maxsize=4096, default=None)
+
+SearchResultCache = Cache(maxsize=500, ttl=600, timer=time.time, default=None)
+
+TmdbSeasonsCache = Cache(maxsize=2000, ttl=6*3600, timer=time.time, default=None)
+
+TvEpisodesCache = Cache(maxsize=1000, ttl=600, timer=time.time, default=None)
@@ -58,3 +58,54 @@ def retry(ExceptionToCheck, tries=3, delay=3, backoff=2, logger=None):
         return f_retry
 
     return deco_retry
+
+
+# 相同请求合并执行
+class SingleFlight(object):
+    """
+    相同键的并发调用只执行一次，其余调用等待并共享结果
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 键 -> [完成事件, 结果, 异常]
+        self._calls = {}
+        # 执行次数、合并次数
+        self._statistics = {"executed": 0, "shared": 0}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        执行函数，如已有相同键的调用在执行中则等待其结果
+        :return: 函数结果
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = [threading.Event(), None, None]
+                self._calls[key] = call
+                self._statistics["executed"] += 1
+            else:
+                self._statistics["shared"] += 1
+        if not leader:
+            call[0].wait()
+            if call[2]:
+                raise call[2]
+            return call[1]
+        try:
+            call[1] = func(*args, **kwargs)
+            return call[1]
+        except Exception as err:
+            call[2] = err
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call[0].set()
+
+    def get_statistics(self):
+        """
+        获取执行及合并次数统计
+        """
+        with self._lock:
+            return dict(self._statistics)
@@ -0,0 +1,119 @@
+import codecs
+import re
+
+from requests.compat import chardet
+
+from app.utils.string_utils import StringUtils
+
+# XML声明中的编码
+_XML_ENCODING_RE = re.compile(rb'^\s*<\?xml[^>]*?encoding\s*=\s*["\']([\w.:-]+)["\']', re.I)
+# HTML meta中的编码
+_HTML_CHARSET_RE = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?([\w.:-]+)', re.I)
+# Content-Type中的编码
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+# 查找声明编码的范围
+_DECLARE_SIZE = 2048
+# 探测编码时取样的大小
+_SAMPLE_SIZE = 8192
+# 声明的编码 -> 实际使用的超集编码
+_ENCODING_ALIASES = {
+    "gb2312": "gb18030",
+    "gbk": "gb18030",
+    "ascii": "utf-8"
+}
+# 不可信的声明编码，多为服务端默认值
+_UNTRUSTED_ENCODINGS = ["iso8859-1", "cp1252"]
+# 繁体中文编码，PT站点多为简体，GBK报文常被误判为此类编码
+_TRADITIONAL_ENCODINGS = ["big5", "big5hkscs", "cp950"]
+
+
+class EncodingUtils:
+    # 站点域名 -> 探测得到的编码
+    _site_encodings = {}
+
+    @staticmethod
+    def get_encoding(content, content_type=None, url=None):
+        """
+        判断报文的编码，依次使用BOM、XML声明、Content-Type、HTML meta、站点历史编码，最后取样探测
+        :param content: 报文字节
+        :param content_type: 响应头的Content-Type
+        :param url: 请求地址，用于记住站点的编码
+        :return: 编码名称
+        """
+        if not content:
+            return "utf-8"
+        if content.startswith(codecs.BOM_UTF8):
+            return "utf-8-sig"
+        if content.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return "utf-16"
+        head = content[:_DECLARE_SIZE]
+        # 声明的编码
+        match = _XML_ENCODING_RE.search(head)
+        encoding = EncodingUtils.__normalize(match.group(1).decode("ascii")) if match else None
+        if not encoding and content_type:
+            match = _HEADER_CHARSET_RE.search(content_type)
+            encoding = EncodingUtils.__normalize(match.group(1)) if match else None
+        if not encoding or encoding in _UNTRUSTED_ENCODINGS:
+            match = _HTML_CHARSET_RE.search(head)
+            encoding = EncodingUtils.__normalize(match.group(1).decode("ascii")) if match else None
+        if encoding and encoding not in _UNTRUSTED_ENCODINGS:
+            return encoding
+        # 没有声明编码，UTF-8校验通过时直接使用
+        try:
+            content.decode("utf-8")
+            return "utf-8"
+        except UnicodeDecodeError:
+            pass
+        # 使用站点上次探测的编码，全文能够严格解码时才使用
+        site = StringUtils.get_url_domain(url) if url else None
+        encoding = EncodingUtils._site_encodings.get(site) if site else None
+        if encoding and EncodingUtils.__can_decode(content, encoding):
+            return encoding
+        # 只取样探测，繁体编码的猜测优先尝试GB18030
+        guess = EncodingUtils.__normalize(chardet.detect(content[:_SAMPLE_SIZE]).get("encoding")) or "utf-8"
+        candidates = ["gb18030", guess] if guess in _TRADITIONAL_ENCODINGS else [guess]
+        for encoding in candidates:
+            if EncodingUtils.__can_decode(content, encoding):
+                # 全文严格解码通过才记住站点的编码
+                if site:
+                    EncodingUtils._site_encodings[site] = encoding
+                return encoding
+        if site:
+            EncodingUtils._site_encodings.pop(site, None)
+        return guess
+
+    @staticmethod
+    def set_encoding(res):
+        """
+        判断响应的编码并设置，替代res.apparent_encoding对全文的探测
+        :param res: requests的响应
+        :return: 编码名称
+        """
+        res.encoding = EncodingUtils.get_encoding(res.content,
+                                                  content_type=res.headers.get("Content-Type"),
+                                                  url=res.url)
+        return res.encoding
+
+    @staticmethod
+    def __can_decode(content, encoding):
+        """
+        报文全文能否使用该编码严格解码
+        """
+        try:
+            content.decode(encoding)
+            return True
+        except (UnicodeDecodeError, LookupError):
+            return False
+
+    @staticmethod
+    def __normalize(encoding):
+        """
+        校验编码名称，并将常见的子集编码替换为超集
+        """
+        if not encoding:
+            return None
+        try:
+            name = codecs.lookup(encoding).name
+        except LookupError:
+            return None
+        return _ENCODING_ALIASES.get(encoding.lower()) or _ENCODING_ALIASES.get(name) or name
@@ -1,7 +1,12 @@
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
 from urllib3.exceptions import InsecureRequestWarning
-from config import Config
+from urllib3.util.retry import Retry
+from config import Config, HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_RETRY_TOTAL, HTTP_RETRY_BACKOFF
 
 urllib3.disable_warnings(InsecureRequestWarning)
 
@@ -12,6 +17,9 @@ class RequestUtils:
     _proxies = None
     _timeout = 20
     _session = None
+    # 共享的连接池会话，按(代理, 证书校验)区分
+    _pooled_sessions = {}
+    _pooled_lock = threading.Lock()
 
     def __init__(self,
                  headers=None,
@@ -52,103 +60,121 @@ class RequestUtils:
             self._proxies = proxies
         if session:
             self._session = session
+        else:
+            self._session = self.get_pooled_session(proxies=self._proxies)
         if timeout:
             self._timeout = timeout
 
+    @classmethod
+    def get_pooled_session(cls, proxies=None, verify=False):
+        """
+        获取共享的连接池会话，同一主机的请求复用已建立的连接
+        会话不保存响应中的Cookie，避免不同调用方之间互相影响
+        """
+        key = (str(sorted(proxies.items())) if proxies else None, verify)
+        session = cls._pooled_sessions.get(key)
+        if session:
+            return session
+        with cls._pooled_lock:
+            session = cls._pooled_sessions.get(key)
+            if not session:
+                session = requests.Session()
+                session.verify = verify
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                # 仅网关错误时退避重试，连接及读取超时不重试，不按Retry-After等待，避免单个请求耗时成倍超过调用方的超时时间
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS,
+                                      pool_maxsize=HTTP_POOL_MAXSIZE,
+                                      max_retries=Retry(total=HTTP_RETRY_TOTAL,
+                                                        connect=0,
+                                                        read=0,
+                                                        backoff_factor=HTTP_RETRY_BACKOFF,
+                                                        status_forcelist=[502, 503, 504],
+                                                        allowed_methods=["HEAD", "GET", "OPTIONS"],
+                                                        raise_on_status=False,
+                                                        respect_retry_after_header=False))
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls._pooled_sessions[key] = session
+            return session
+
+    @classmethod
+    def get_pool_statistics(cls):
+        """
+        获取连接池统计：各主机新建连接（握手）次数、请求数及复用连接的请求数
+        """
+        statistics = {}
+        with cls._pooled_lock:
+            sessions = list(cls._pooled_sessions.values())
+        for session in sessions:
+            for adapter in set(session.adapters.values()):
+                poolmanager = getattr(adapter, "poolmanager", None)
+                if not poolmanager:
+                    continue
+                for pool_key in list(poolmanager.pools.keys()):
+                    pool = poolmanager.pools.get(pool_key)
+                    if not pool:
+                        continue
+                    host = f"{pool.scheme}://{pool.host}:{pool.port}"
+                    statistic = statistics.setdefault(host, {"connections": 0, "requests": 0, "reused": 0})
+                    statistic["connections"] += pool.num_connections
+                    statistic["requests"] += pool.num_requests
+                    statistic["reused"] += max(pool.num_requests - pool.num_connections, 0)
+        return statistics
+
     def post(self, url, data=None, json=None):
         if json is None:
             json = {}
         try:
-            if self._session:
-                return self._session.post(url,
-                                          data=data,
-                                          verify=False,
-                                          headers=self._headers,
-                                          proxies=self._proxies,
-                                          timeout=self._timeout,
-                                          json=json)
-            else:
-                return requests.post(url,
-                                     data=data,
-                                     verify=False,
-                                     headers=self._headers,
-                                     proxies=self._proxies,
-                                     timeout=self._timeout,
-                                     json=json)
-        except requests.exceptions.RequestException:
-            return None
-
-    def get(self, url, params=None):
-        try:
-            if self._session:
-                r = self._session.get(url,
+            return self._session.post(url,
+                                      data=data,
                                       verify=False,
                                       headers=self._headers,
                                       proxies=self._proxies,
                                       timeout=self._timeout,
-                                      params=params)
-            else:
-                r = requests.get(url,
-                                 verify=False,
-                                 headers=self._headers,
-                                 proxies=self._proxies,
-                                 timeout=self._timeout,
-                                 params=params)
-            return str(r.content, 'utf-8')
+                                      json=json)
         except requests.exceptions.RequestException:
             return None
 
-    def get_res(self, url, params=None, allow_redirects=True, raise_exception=False):
+    def get(self, url, params=None):
         try:
-            if self._session:
-                return self._session.get(url,
-                                         params=params,
-                                         verify=False,
-                                         headers=self._headers,
-                                         proxies=self._proxies,
-                                         cookies=self._cookies,
-                                         timeout=self._timeout,
-                                         allow_redirects=allow_redirects)
-            else:
-                return requests.get(url,
-                                    params=params,
-                                    verify=False,
-                                    headers=self._headers,
-                                    proxies=self._proxies,
-                                    cookies=self._cookies,
-                                    timeout=self._timeout,
-                                    allow_redirects=allow_redirects)
+            r = self._session.get(url,
+                                  verify=False,
+                                  headers=self._headers,
+                                  proxies=self._proxies,
+                                  timeout=self._timeout,
+                                  params=params)
+            return str(r.content, 'utf-8')
         except requests.exceptions.RequestException:
-            if raise_exception:
-                raise requests.exceptions.RequestException
             return None
 
-    def post_res(self, url, data=None, params=None, allow_redirects=True, files=None, json=None):
+    def get_res(self, url, params=None, allow_redirects=True, raise_exception=False):
         try:
-            if self._session:
-                return self._session.post(url,
-                                          data=data,
-                                          params=params,
-                                          verify=False,
-                                          headers=self._headers,
-                                          proxies=self._proxies,
-                                          cookies=self._cookies,
-                                          timeout=self._timeout,
-                                          allow_redirects=allow_redirects,
-                                          files=files,
-                                          json=json)
-            else:
-                return requests.post(url,
-                                     data=data,
+            return self._session.get(url,
                                      params=params,
                                      verify=False,
                                      headers=self._headers,
                                      proxies=self._proxies,
                                      cookies=self._cookies,
                                      timeout=self._timeout,
-                                     allow_redirects=allow_redirects,
-                                     files=files,
-                                     json=json)
+                                     allow_redirects=allow_redirects)
+        except requests.exceptions.RequestException:
+            if raise_exception:
+                raise requests.exceptions.RequestException
+            return None
+
+    def post_res(self, url, data=None, params=None, allow_redirects=True, files=None, json=None):
+        try:
+            return self._session.post(url,
+                                      data=data,
+                                      params=params,
+                                      verify=False,
+                                      headers=self._headers,
+                                      proxies=self._proxies,
+                                      cookies=self._cookies,
+                                      timeout=self._timeout,
+                                      allow_redirects=allow_redirects,
+                                      files=files,
+                                      json=json)
         except requests.exceptions.RequestException:
             return None
 
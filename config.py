@@ -34,8 +34,57 @@ METAINFO_SAVE_INTERVAL = 600
 SYNC_TRANSFER_INTERVAL = 60
 # RSS队列中处理时间间隔
 RSS_CHECK_INTERVAL = 300
+# RSS并发下载的最大线程数
+RSS_FETCH_THREAD_NUM = 10
+# 单个站点RSS下载超时时间（秒）
+RSS_FETCH_TIMEOUT = 30
 # 刷新订阅TMDB数据的时间间隔（小时）
 RSS_REFRESH_TMDB_INTERVAL = 6
+# 刷新订阅TMDB数据的并发数
+RSS_REFRESH_TMDB_THREAD_NUM = 5
+# TMDB变更列表可查询的最大天数
+TMDB_CHANGES_MAX_DAYS = 14
+# 单个索引站点搜索的默认超时时间（秒）
+INDEXER_SEARCH_TIMEOUT = 30
+# 多站点并行搜索的整体超时时间（秒），超时后返回已完成站点的结果
+INDEXER_SEARCH_DEADLINE = 90
+# 全局共享的站点搜索线程数
+INDEXER_SEARCH_THREAD_NUM = 30
+# 单个站点同时进行的搜索数
+INDEXER_SITE_THREAD_NUM = 2
+# 搜索结果并发识别媒体信息的线程数
+MEDIA_RECOGNIZE_THREAD_NUM = 5
+# 媒体库同步时并发查询剧集信息的线程数
+MEDIASYNC_THREAD_NUM = 10
+# 磁盘空间释放插件同时计算哈希的磁盘数
+DISKSPACE_HASH_THREAD_NUM = 4
+# 文件转移时各转移方式在同一目的地上的最大并发数，0为不限制
+RMT_TRANSFER_LIMITS = {
+    "LINK": 0,
+    "SOFTLINK": 0,
+    "COPY": 2,
+    "MOVE": 2,
+    "RCLONECOPY": 1,
+    "RCLONE": 1,
+    "MINIOCOPY": 1,
+    "MINIO": 1
+}
+# 订阅搜索的并发数
+SUBSCRIBE_SEARCH_THREAD_NUM = 5
+# 订阅没有变化时跳过再次搜索的时间占订阅定时搜索周期的比例，未开启定时搜索时不跳过
+SUBSCRIBE_SEARCH_SKIP_RATIO = 0.5
+# HTTP连接池缓存的主机数
+HTTP_POOL_CONNECTIONS = 32
+# 单个主机的最大连接数
+HTTP_POOL_MAXSIZE = 10
+# HTTP请求失败（连接错误、502/503/504）的重试次数，仅对GET等幂等请求生效
+HTTP_RETRY_TOTAL = 2
+# HTTP请求重试的退避系数（秒）
+HTTP_RETRY_BACKOFF = 0.5
+# 图片缓存的最大占用空间（字节）
+IMAGE_CACHE_MAX_SIZE = 500 * 1024 * 1024
+# 浏览器缓存图片的时间（秒）
+IMAGE_CACHE_MAX_AGE = 7 * 24 * 3600
 # 刷流删除的检查时间间隔
 BRUSH_REMOVE_TORRENTS_INTERVAL = 300
 # 定时清除未识别的缓存时间间隔（小时）
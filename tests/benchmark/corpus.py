@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import random
+
+from tests.cases.meta_cases import meta_cases
+
+# 常见的制作组/字幕组，用于拼装测试标题
+_release_groups = ["FLUX", "CMCT", "FRDS", "HDSky", "CHDWEB", "MTeam", "OurTV", "PTerWEB", "HHWEB", "ADWeb",
+                   "WiKi", "TTG", "beAst", "NTb", "LoliHouse", "NoGroup", "UnknownGroup", "Lilith-Raws"]
+_resolutions = ["2160p", "1080p", "720p", "1080i", "4K"]
+_sources = ["WEB-DL", "BluRay", "HDTV", "WEBRip", "UHD.BluRay.REMUX", "BDRip"]
+_codecs = ["H.265", "x265", "H.264", "x264", "HEVC", "AVC"]
+_audios = ["DDP5.1", "AAC", "TrueHD.Atmos", "DTS-HD.MA.5.1", "FLAC", "AC3"]
+
+
+def build_title_corpus(count=10000, seed=20230501):
+    """
+    生成测试用的种子标题语料：测试用例中的真实标题加上按真实命名规则随机拼装的标题
+    """
+    rand = random.Random(seed)
+    titles = [case.get("title") for case in meta_cases if case.get("title")]
+    names = [title.split(".")[0] for title in titles if "." in title] or ["Movie"]
+    while len(titles) < count:
+        name = rand.choice(names)
+        if rand.random() < 0.5:
+            season = "S%02dE%02d" % (rand.randint(1, 10), rand.randint(1, 24))
+        else:
+            season = str(rand.randint(1980, 2023))
+        titles.append(".".join([name,
+                                season,
+                                rand.choice(_resolutions),
+                                rand.choice(_sources),
+                                rand.choice(_audios),
+                                rand.choice(_codecs)]) + "-" + rand.choice(_release_groups))
+    return titles[:count]
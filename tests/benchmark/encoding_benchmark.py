@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import random
+import time
+
+from requests import Response
+
+from app.utils import EncodingUtils
+from tests.benchmark.corpus import build_title_corpus
+
+_words = ["种子", "下载", "上传", "魔力值", "分享率", "电影", "剧集", "高清", "字幕", "做种", "用户", "等级", "站点", "公告"]
+
+
+def _build_rss(titles, declare=True):
+    """
+    拼装RSS报文，与站点RSS的结构一致
+    """
+    items = "".join(f"<item><title>{title}</title>"
+                    f"<description>{'，'.join(_words)}</description>"
+                    f"<link>https://pt.example.com/details.php?id={i}</link>"
+                    f"<enclosure url=\"https://pt.example.com/download.php?id={i}\" length=\"{i * 1024}\"/>"
+                    f"<pubDate>Mon, 01 May 2023 08:00:00 +0800</pubDate></item>"
+                    for i, title in enumerate(titles))
+    prolog = '<?xml version="1.0" encoding="utf-8"?>' if declare else ""
+    return f"{prolog}<rss version=\"2.0\"><channel><title>站点RSS</title>{items}</channel></rss>"
+
+
+def _build_html(rand, rows):
+    """
+    拼装没有声明编码的GBK站点页面
+    """
+    body = "".join(f"<tr><td>{''.join(rand.choice(_words) for _ in range(6))}</td>"
+                   f"<td>{rand.randint(1, 999)} GB</td></tr>" for _ in range(rows))
+    return f"<html><head><title>站点首页</title></head><body><table>{body}</table></body></html>"
+
+
+def _build_response(content, content_type, url):
+    res = Response()
+    res._content = content
+    res.headers["Content-Type"] = content_type
+    res.url = url
+    res.status_code = 200
+    return res
+
+
+def _measure(responses, func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for res in responses:
+            res.encoding = func(res)
+            _ = res.text
+    return (time.perf_counter() - start) / rounds
+
+
+def run(items=100, rounds=5, seed=20230501):
+    rand = random.Random(seed)
+    titles = build_title_corpus(items * 3)
+    html = _build_html(rand, items * 2)
+    feeds = {
+        "RSS（XML声明UTF-8）": (_build_rss(titles[:items]), "utf-8",
+                            "application/xml", "https://pt1.example.com/torrentrss.php"),
+        "RSS（仅响应头声明）": (_build_rss(titles[items:items * 2], declare=False), "utf-8",
+                        "application/rss+xml; charset=utf-8", "https://pt2.example.com/torrentrss.php"),
+        "RSS（无声明UTF-8）": (_build_rss(titles[items * 2:], declare=False), "utf-8",
+                          "text/xml", "https://pt3.example.com/torrentrss.php"),
+        "页面（无声明GBK）": (html, "gbk", "text/html", "https://pt4.example.com/index.php"),
+    }
+    print(f"每个报文 {items} 条，重复 {rounds} 轮取平均")
+    apparent_total = fast_total = 0
+    for name, (text, encoding, content_type, url) in feeds.items():
+        res = _build_response(text.encode(encoding), content_type, url)
+        apparent_seconds = _measure([res], lambda r: r.apparent_encoding, rounds)
+        fast_seconds = _measure([res], EncodingUtils.set_encoding, rounds)
+        # 解码结果必须与原文一致，乱码的结果不计入对比
+        assert res.text == text, f"{name} 使用 {res.encoding} 解码结果与原文不一致"
+        apparent_total += apparent_seconds
+        fast_total += fast_seconds
+        print(f"{name}：{len(res.content) / 1024:.0f} KB，"
+              f"apparent_encoding {apparent_seconds * 1000:.2f} 毫秒，"
+              f"EncodingUtils {fast_seconds * 1000:.2f} 毫秒（{res.encoding}）")
+    print(f"每轮轮询合计：apparent_encoding {apparent_total * 1000:.2f} 毫秒，"
+          f"EncodingUtils {fast_total * 1000:.2f} 毫秒，节省 {(1 - fast_total / apparent_total) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    run()
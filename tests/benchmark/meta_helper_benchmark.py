@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from threading import RLock
+
+# 使用临时配置目录，避免读写用户的TMDB缓存，需在导入app之前设置
+_CONFIG_DIR = tempfile.mkdtemp(prefix="nastool_benchmark_")
+os.environ["NASTOOL_CONFIG"] = os.path.join(_CONFIG_DIR, "config.yaml")
+
+from app.helper import MetaHelper
+from app.helper.meta_helper import CACHE_EXPIRE_TIMESTAMP_STR, EXPIRE_TIMESTAMP
+from app.utils.types import MediaType
+
+
+class _GlobalLockMetaHelper(object):
+    """
+    原实现的读取路径：每次读取都持有全局锁，并在命中时重写过期时间
+    """
+    _lock = RLock()
+
+    def __init__(self, meta_data):
+        self._meta_data = dict(meta_data)
+
+    def get_meta_data_by_key(self, key):
+        with self._lock:
+            info: dict = self._meta_data.get(key)
+            if info:
+                expire = info.get(CACHE_EXPIRE_TIMESTAMP_STR)
+                if not expire or int(time.time()) < expire:
+                    info[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
+                    self.update_meta_data({key: info})
+            return info or {}
+
+    def update_meta_data(self, meta_data):
+        with self._lock:
+            for key, item in meta_data.items():
+                if not self._meta_data.get(key):
+                    item[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
+                    self._meta_data[key] = item
+
+
+def _run_readers(helper, keys, threads, reads):
+    """
+    多线程并发读取，返回总耗时
+    """
+    barrier = threading.Barrier(threads + 1)
+
+    def __reader(seed):
+        rand = random.Random(seed)
+        samples = [rand.choice(keys) for _ in range(reads)]
+        barrier.wait()
+        for key in samples:
+            helper.get_meta_data_by_key(key)
+
+    workers = [threading.Thread(target=__reader, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def run(count=10000, threads=32, reads=20000):
+    meta_data = {
+        f"[电影]Benchmark{i}-{2000 + i % 24}-None": {
+            "id": 100000 + i,
+            "title": f"Benchmark{i}",
+            "year": str(2000 + i % 24),
+            "type": MediaType.MOVIE
+        } for i in range(count)
+    }
+    keys = list(meta_data.keys())
+
+    baseline = _GlobalLockMetaHelper({key: dict(value) for key, value in meta_data.items()})
+    helper = MetaHelper()
+    if not os.path.abspath(helper.get_meta_data_path()).startswith(_CONFIG_DIR):
+        raise RuntimeError(f"缓存路径不在临时目录中，停止测试：{helper.get_meta_data_path()}")
+    helper.update_meta_data({key: dict(value) for key, value in meta_data.items()})
+    # 预热，使条目都已加载到内存
+    for key in keys:
+        helper.get_meta_data_by_key(key)
+
+    baseline_seconds = _run_readers(baseline, keys, threads, reads)
+    striped_seconds = _run_readers(helper, keys, threads, reads)
+    total = threads * reads
+
+    print(f"缓存条目：{count}，并发线程：{threads}，总读取次数：{total}")
+    print(f"原实现（全局锁，每次命中都写回）：{baseline_seconds:.3f} 秒，"
+          f"{total / baseline_seconds:,.0f} 次/秒")
+    print(f"无锁读取（延迟批量刷新过期时间）：{striped_seconds:.3f} 秒，"
+          f"{total / striped_seconds:,.0f} 次/秒")
+    print(f"吞吐提升：{baseline_seconds / striped_seconds:.2f} 倍")
+
+
+if __name__ == "__main__":
+    try:
+        run()
+    finally:
+        shutil.rmtree(_CONFIG_DIR, ignore_errors=True)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import time
+
+import regex as re
+
+from app.media.meta import ReleaseGroupsMatcher
+from tests.benchmark.corpus import build_title_corpus
+
+
+def _match_without_cache(matcher, title):
+    """
+    原实现：每次调用都拼装并编译制作组正则，依赖regex模块的内部缓存
+    """
+    groups = "|".join(group for site_groups in matcher.RELEASE_GROUPS.values() for group in site_groups)
+    groups_re = re.compile(r"(?<=[-@\[￡【&])(?:%s)(?=[@.\s\]\[】&])" % groups, re.I)
+    unique_groups = []
+    for item in re.findall(groups_re, f"{title} "):
+        if item not in unique_groups:
+            unique_groups.append(item)
+    return "@".join(unique_groups)
+
+
+def run(count=10000, evicted_samples=200):
+    titles = build_title_corpus(count)
+    matcher = ReleaseGroupsMatcher()
+
+    start = time.perf_counter()
+    cached = [matcher.match(title=title) for title in titles]
+    cached_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    uncached = [_match_without_cache(matcher, title) for title in titles]
+    uncached_seconds = time.perf_counter() - start
+
+    # 其它正则挤出regex模块缓存的情况，每次都要重新编译，耗时较长只取部分样本
+    samples = titles[:evicted_samples]
+    start = time.perf_counter()
+    for title in samples:
+        re.purge()
+        _match_without_cache(matcher, title)
+    evicted_seconds = time.perf_counter() - start
+
+    assert cached == uncached
+    print(f"标题数：{len(titles)}")
+    print(f"预编译正则：{cached_seconds:.3f} 秒，"
+          f"平均 {cached_seconds / len(titles) * 1000:.3f} 毫秒")
+    print(f"原实现（命中regex缓存）：{uncached_seconds:.3f} 秒，"
+          f"平均 {uncached_seconds / len(titles) * 1000:.3f} 毫秒")
+    print(f"原实现（regex缓存被挤出，{len(samples)} 个样本）：{evicted_seconds:.3f} 秒，"
+          f"平均 {evicted_seconds / len(samples) * 1000:.3f} 毫秒")
+
+
+if __name__ == "__main__":
+    run()
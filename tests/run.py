@@ -1,11 +1,15 @@
 import unittest
 
 from tests.test_metainfo import MetaInfoTest
+from tests.test_rss_helper import RssHelperTest
 
 if __name__ == "__main__":
     suite = unittest.TestSuite()
     # 测试名称识别
     suite.addTest(MetaInfoTest("test_metainfo"))
+    # 测试RSS解析
+    suite.addTest(RssHelperTest("test_parse_rssxml"))
+    suite.addTest(RssHelperTest("test_parse_namespaced_rssxml"))
 
     # 运行测试
     runner = unittest.TextTestRunner()
@@ -2,7 +2,7 @@
 
 from unittest import TestCase
 
-from app.media.meta import MetaInfo
+from app.media.meta import MetaInfo, get_meta_cache_statistics
 from tests.cases.meta_cases import meta_cases
 
 
@@ -34,3 +34,16 @@ class MetaInfoTest(TestCase):
                 "audio_codec": meta_info.audio_encode or "",
             }
             self.assertEqual(target, info.get("target"))
+
+    def test_metainfo_cache(self):
+        title = "The.Mandalorian.S03E01.2160p.DSNP.WEB-DL.DDP5.1.Atmos.DV.H.265-FLUX"
+        meta_info = MetaInfo(title=title)
+        meta_info.set_torrent_info(site="test", size=1024)
+        meta_info.tmdb_id = 82856
+        cached_info = MetaInfo(title=title)
+        self.assertIsNot(meta_info, cached_info)
+        self.assertIsNone(cached_info.site)
+        self.assertEqual(cached_info.tmdb_id, 0)
+        self.assertEqual(cached_info.get_season_episode_string(),
+                         meta_info.get_season_episode_string())
+        self.assertGreater(get_meta_cache_statistics().get("hit"), 0)
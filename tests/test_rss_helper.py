@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from app.helper import RssHelper
+
+ITEM_XML = """
+<item>
+  <title>The.Mandalorian.S03E01.2160p.WEB-DL-FLUX</title>
+  <link>https://example.com/details.php?id=1</link>
+  <description>desc</description>
+  <enclosure url="https://example.com/download.php?id=1" length="1024" type="application/x-bittorrent"/>
+  <pubDate>Wed, 01 Mar 2023 08:00:00 +0800</pubDate>
+</item>
+"""
+
+RSS_XML = """<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0"><channel><title>test</title>%s</channel></rss>
+""" % ITEM_XML
+
+NS_RSS_XML = """<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0" xmlns="http://example.com/ns"><channel><title>test</title>%s</channel></rss>
+""" % ITEM_XML
+
+RDF_XML = """<?xml version="1.0" encoding="utf-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://purl.org/rss/1.0/">
+  <channel rdf:about="https://example.com/"><title>test</title></channel>
+  <item rdf:about="https://example.com/details.php?id=1">
+    <title>The.Mandalorian.S03E01.2160p.WEB-DL-FLUX</title>
+    <link>https://example.com/download.php?id=1</link>
+  </item>
+</rdf:RDF>
+"""
+
+
+class RssHelperTest(TestCase):
+    def test_parse_rssxml(self):
+        items = list(RssHelper.iter_rssxml(RSS_XML))
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0].get("title"), "The.Mandalorian.S03E01.2160p.WEB-DL-FLUX")
+        self.assertEqual(items[0].get("enclosure"), "https://example.com/download.php?id=1")
+        self.assertEqual(items[0].get("size"), 1024)
+
+    def test_parse_namespaced_rssxml(self):
+        items = list(RssHelper.iter_rssxml(NS_RSS_XML))
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0].get("title"), "The.Mandalorian.S03E01.2160p.WEB-DL-FLUX")
+        self.assertEqual(items[0].get("enclosure"), "https://example.com/download.php?id=1")
+        self.assertEqual(items[0].get("size"), 1024)
+        # RSS 1.0/RDF
+        items = list(RssHelper.iter_rssxml(RDF_XML))
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0].get("title"), "The.Mandalorian.S03E01.2160p.WEB-DL-FLUX")
+        self.assertEqual(items[0].get("enclosure"), "https://example.com/download.php?id=1")
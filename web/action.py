@@ -605,6 +605,7 @@ class WebAction:
                 filters=filters,
                 tmdbid=tmdbid,
                 media_type=media_type,
+                refresh=True if data.get("refresh") else False,
             )
             if ret != 0:
                 return {"code": ret, "msg": ret_msg}
@@ -2846,7 +2847,6 @@ class WebAction:
         """
         try:
             MetaHelper().clear_meta_data()
-            os.remove(MetaHelper().get_meta_data_path())
         except Exception as e:
             ExceptionUtils.exception_traceback(e)
             return {"code": 0, "msg": str(e)}
@@ -2916,7 +2916,8 @@ class WebAction:
         """
         librarys = data.get("librarys") or []
         SystemConfig().set(key=SystemConfigKey.SyncLibrary, value=librarys)
-        ThreadHelper().start_thread(MediaServer().sync_mediaserver, ())
+        # 手动同步时全量同步
+        ThreadHelper().start_thread(MediaServer().sync_mediaserver, (False,))
         return {"code": 0}
 
     @staticmethod
@@ -3131,6 +3132,7 @@ class WebAction:
             index_id=data.get("id"),
             page=data.get("page"),
             keyword=data.get("keyword"),
+            refresh=data.get("refresh"),
         )
         if not resources:
             return {"code": 1, "msg": "获取站点资源出现错误，无法连接到站点！"}
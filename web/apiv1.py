@@ -424,6 +424,7 @@ class SiteResources(ClientResource):
     parser.add_argument('id', type=str, help='站点索引ID', location='form', required=True)
     parser.add_argument('page', type=int, help='页码', location='form')
     parser.add_argument('keyword', type=str, help='站点名称', location='form')
+    parser.add_argument('refresh', type=int, help='忽略缓存（0-否/1-是）', location='form')
 
     @site.doc(parser=parser)
     def post(self):
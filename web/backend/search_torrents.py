@@ -20,7 +20,7 @@ SEARCH_MEDIA_CACHE = {}
 SEARCH_MEDIA_TYPE = {}
 
 
-def search_medias_for_web(content, ident_flag=True, filters=None, tmdbid=None, media_type=None):
+def search_medias_for_web(content, ident_flag=True, filters=None, tmdbid=None, media_type=None, refresh=False):
     """
     WEB资源搜索
     :param content: 关键字文本，可以包括 类型、标题、季、集、年份等信息，使用 空格分隔，也支持种子的命名格式
@@ -28,6 +28,7 @@ def search_medias_for_web(content, ident_flag=True, filters=None, tmdbid=None, m
     :param filters: 其它过滤条件
     :param tmdbid: TMDBID或DB:豆瓣ID
     :param media_type: 媒体类型，配合tmdbid传入
+    :param refresh: 是否忽略搜索结果缓存重新搜索站点
     :return: 错误码，错误原因，成功时直接插入数据库
     """
     mtype, key_word, season_num, episode_num, year, content = StringUtils.get_keyword_from_string(content)
@@ -130,12 +131,27 @@ def search_medias_for_web(content, ident_flag=True, filters=None, tmdbid=None, m
     # 整合高级查询条件
     if filters:
         filter_args.update(filters)
+    # 清空缓存结果
+    _searcher.delete_all_search_torrents()
+
+    def __insert_results(_indexer, _media_list):
+        """
+        每个站点搜索完成后立即插入数据库，搜索页面可渐进展示结果
+        """
+        if not _media_list:
+            return
+        _searcher.insert_search_results(media_items=_media_list,
+                                        ident_flag=ident_flag,
+                                        title=content)
+
     # 开始搜索
     log.info("【Web】开始搜索 %s ..." % content)
     media_list = _searcher.search_medias(key_word=first_search_name,
                                          filter_args=filter_args,
                                          match_media=media_info,
-                                         in_from=SearchType.WEB)
+                                         in_from=SearchType.WEB,
+                                         callback=__insert_results,
+                                         refresh=refresh)
     # 使用第二名称重新搜索
     if ident_flag \
             and len(media_list) == 0 \
@@ -149,9 +165,9 @@ def search_medias_for_web(content, ident_flag=True, filters=None, tmdbid=None, m
         media_list = _searcher.search_medias(key_word=second_search_name,
                                              filter_args=filter_args,
                                              match_media=media_info,
-                                             in_from=SearchType.WEB)
-    # 清空缓存结果
-    _searcher.delete_all_search_torrents()
+                                             in_from=SearchType.WEB,
+                                             callback=__insert_results,
+                                             refresh=refresh)
     # 结束进度
     _process.end(ProgressKey.Search)
     if len(media_list) == 0:
@@ -159,13 +175,6 @@ def search_medias_for_web(content, ident_flag=True, filters=None, tmdbid=None, m
         return 1, "%s 未搜索到任何资源" % content
     else:
         log.info("【Web】共搜索到 %s 个有效资源" % len(media_list))
-        # 插入数据库
-        media_list = sorted(media_list, key=lambda x: "%s%s%s" % (str(x.res_order).rjust(3, '0'),
-                                                                  str(x.site_order).rjust(3, '0'),
-                                                                  str(x.seeders).rjust(10, '0')), reverse=True)
-        _searcher.insert_search_results(media_items=media_list,
-                                        ident_flag=ident_flag,
-                                        title=content)
         return 0, ""
 
 
@@ -1,9 +1,8 @@
-from functools import lru_cache
-
 # from urllib.parse import quote
 
 import cn2an
 
+from app.helper import ImageCacheHelper
 from app.media import Media, Bangumi, DouBan
 from app.media.meta import MetaInfo
 from app.utils import (
@@ -244,12 +243,10 @@ class WebUtils:
         return range(StartPage, EndPage + 1)
 
     @staticmethod
-    @lru_cache(maxsize=128)
     def request_cache(url):
         """
-        带缓存的请求
+        带缓存的图片请求
+        :param url: 图片地址
+        :return: 缓存文件路径，下载失败时返回None
         """
-        ret = RequestUtils().get_res(url)
-        if ret:
-            return ret.content
-        return None
+        return ImageCacheHelper().get_image(url)
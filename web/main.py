@@ -39,7 +39,7 @@ from app.brushtask import BrushTask
 from app.conf import ModuleConf, SystemConfig
 from app.downloader import Downloader
 from app.filter import Filter
-from app.helper import SecurityHelper, MetaHelper, ChromeHelper, ThreadHelper
+from app.helper import SecurityHelper, MetaHelper, ChromeHelper, ThreadHelper, ImageCacheHelper
 from app.indexer import Indexer
 from app.media.meta import MetaInfo
 from app.mediaserver import MediaServer
@@ -60,7 +60,7 @@ from app.utils.types import (
     MediaType,
     RssType,
 )
-from config import PT_TRANSFER_INTERVAL, Config, TMDB_API_DOMAINS
+from config import PT_TRANSFER_INTERVAL, Config, TMDB_API_DOMAINS, IMAGE_CACHE_MAX_AGE
 from web.action import WebAction
 from web.apiv1 import apiv1_bp
 from web.backend.WXBizMsgCrypt3 import WXBizMsgCrypt
@@ -352,6 +352,7 @@ def search():
         UserPris=str(pris).split(","),
         Count=Count,
         Results=SearchResults,
+        SearchWord=request.args.get("s") or "",
         SiteDict=Indexer().get_indexer_hash_dict(),
         UPCHAR=chr(8593),
     )
@@ -474,9 +475,10 @@ def resources():
     site_name = request.args.get("title")
     page = request.args.get("page") or 0
     keyword = request.args.get("keyword")
+    refresh = request.args.get("refresh") == "1"
     Results = (
         WebAction()
-        .list_site_resources({"id": site_id, "page": page, "keyword": keyword})
+        .list_site_resources({"id": site_id, "page": page, "keyword": keyword, "refresh": refresh})
         .get("data")
         or []
     )
@@ -1902,12 +1904,26 @@ def Img():
     etag = hashlib.sha256(url.encode("utf-8")).hexdigest()
     # 检查协商缓存
     if_none_match = request.headers.get("If-None-Match")
-    if if_none_match and if_none_match == etag:
+    if if_none_match and if_none_match.strip('"') == etag:
         return make_response("", 304)
-    # 获取图片数据
-    response = Response(WebUtils.request_cache(url), mimetype="image/jpeg")
-    response.headers.set("Cache-Control", "max-age=604800")
-    response.headers.set("Etag", etag)
+    # 获取图片缓存文件
+    image_file = WebUtils.request_cache(url)
+    if not image_file:
+        return make_response("图片获取失败", 404)
+    mimetype = ImageCacheHelper().get_mimetype(image_file)
+    if not mimetype:
+        return make_response("图片获取失败", 404)
+    try:
+        response = send_file(image_file,
+                             mimetype=mimetype,
+                             etag=etag,
+                             max_age=IMAGE_CACHE_MAX_AGE,
+                             conditional=True)
+    except FileNotFoundError:
+        return make_response("图片获取失败", 404)
+    # 禁止浏览器猜测类型及执行脚本
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["Content-Security-Policy"] = "default-src 'none'; img-src 'self'; sandbox"
     return response
 
 
@@ -28,6 +28,8 @@ let LoggingES;
 let OldMessageFlag = true;
 // 消息WebSocket
 let MessageWS;
+// 最近一次搜索的参数，用于忽略缓存重新搜索
+let LastSearchParam;
 // 当前协议
 let WSProtocol = "ws://";
 if (window.location.protocol === "https:") {
@@ -100,6 +102,7 @@ function navmenu(page, newflag = false) {
 // 搜索
 function media_search(tmdbid, title, type) {
   const param = { tmdbid: tmdbid, search_word: title, media_type: type };
+  LastSearchParam = param;
   show_refresh_progress("正在搜索 " + title + " ...", "search");
   ajax_post(
     "search",
@@ -117,6 +120,30 @@ function media_search(tmdbid, title, type) {
   );
 }
 
+// 忽略搜索结果缓存，重新搜索上一次的内容
+function media_search_refresh(keyword) {
+  const param = Object.assign({}, LastSearchParam || { search_word: keyword }, { refresh: true });
+  if (!param.search_word) {
+    show_fail_modal("没有可以重新搜索的内容！");
+    return;
+  }
+  show_refresh_progress("正在重新搜索 " + param.search_word + " ...", "search");
+  ajax_post(
+    "search",
+    param,
+    function (ret) {
+      hide_refresh_process();
+      if (ret.code === 0) {
+        navmenu("search?s=" + param.search_word);
+      } else {
+        show_fail_modal(ret.msg);
+      }
+    },
+    true,
+    false
+  );
+}
+
 // 显示全局加载蒙版
 function show_wait_modal(blur) {
   if (blur) {
@@ -878,6 +905,7 @@ function show_rss_seasons_modal(name, year, type, mediaid, seasons, func) {
 function search_mediainfo_media(tmdbid, title, typestr) {
   hide_mediainfo_modal();
   const param = { tmdbid: tmdbid, search_word: title, media_type: typestr };
+  LastSearchParam = param;
   show_refresh_progress("正在搜索 " + title + " ...", "search");
   ajax_post(
     "search",
@@ -1661,6 +1689,7 @@ function search_media_advanced() {
     rule: search_rule,
   };
   const param = { search_word: keyword, filters: filters, unident: true };
+  LastSearchParam = param;
   $("#modal-search-advanced").modal("hide");
   show_refresh_progress(`正在搜索 ${keyword} ...`, "search");
   ajax_post(